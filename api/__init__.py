@@ -1,7 +1,10 @@
-from . import recommendation
-from . import extraction
-from . import components
-from . import config
-from . import filters
-from . import utils
+import importlib
 
+# submodules are imported on first access rather than all up front, so that e.g. `from api import catalog`
+# doesn't pull in the LLM clients as well
+SUBMODULES = ("recommendation", "extraction", "components", "config", "catalog", "filters", "search", "rules", "similarity", "pareto", "builds", "etl", "utils")
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,203 @@
+'''
+Whole-build optimiser: the k best complete builds, one part from each table, whose total price is within a budget.
+
+A build scores the sum of its parts' requirement-weighted scores (see api/scoring.py), each scaled to [0, 1]
+so that every part counts the same however many features its requirements weigh. CPUs must fit the board's
+socket and memory kits the board's slots, capacity and generation; the cooler and the drive fit anything.
+
+Parts that could not fit the budget even with the cheapest of everything else are dropped first, then any part
+that a part which costs no more, scores at least as high and fits the same other parts can stand in for,
+unless it is one of the best scoring few. The search then runs in two halves. Every cooler and drive pair is
+enumerated at once as arrays, and sorted by price, so the best pair that fits what a CPU, board and memory kit
+leave of the budget is one lookup, which bounds the best build that triple can make. Compatible triples are
+enumerated in chunks, boards that fit the same parts at a time, best boards first. Within each chunk, triples
+are expanded best bound first, each into its best builds, until none left can beat the k builds already found
+(branch and bound); a chunk none of whose triples can is dropped whole.
+'''
+import heapq
+import numpy as np
+
+# how much each part's score counts towards a build's
+COMPONENT_WEIGHTS = {"cpu": 1.0, "cooler": 1.0, "storage": 1.0, "memory": 1.0, "motherboard": 1.0}
+
+# compatible cpu/board/kit triples enumerated at a time, so memory stays bounded however many there are
+TRIPLE_CHUNK = 1 << 16
+
+def part_scores(catalog, name: str, requirements: dict = None, rows: np.ndarray = None) -> np.ndarray:
+    '''
+    Every row's (or just the given rows') score against requirements, scaled to [0, 1] and by the part's weight.
+    Rows that can't be bought score -inf.
+    '''
+    scorer = catalog.scorers[name]
+    total = sum(scorer.weights(requirements).values())
+    return scorer.score(requirements, rows) * np.float32(COMPONENT_WEIGHTS[name] / total if total else 0)
+
+def affordable(rows: dict, prices: dict, budget: float) -> dict:
+    '''
+    Drops every row priced above what the budget leaves once the cheapest row of each other table is paid for,
+    repeating until nothing more drops, since dropping a table's cheapest row raises what the others must leave.
+    '''
+    while np.isfinite(budget) and all(len(r) for r in rows.values()):
+        cheapest = {name: prices[name][r].min() for name, r in rows.items()}
+        total = sum(cheapest.values())
+        kept = {name: r[prices[name][r] <= budget - (total - cheapest[name])] for name, r in rows.items()}
+        if all(len(kept[name]) == len(rows[name]) for name in rows):
+            break
+        rows = kept
+    return rows
+
+def row_prices(catalog, name: str, rows: np.ndarray = None) -> np.ndarray:
+    '''
+    Every row's (or just the given rows') price, with rows that have none (and can't be bought) priced at infinity.
+    '''
+    prices = catalog[name]["price"].to_numpy()
+    return np.nan_to_num((prices if rows is None else prices[rows]).astype(np.float64), nan=np.inf)
+
+def numbered(keys: np.ndarray) -> np.ndarray:
+    '''
+    A number for every row of keys, the same for identical rows.
+    '''
+    # each row's bytes as one value, which sorts much faster than rows of columns
+    keys = np.ascontiguousarray(keys.reshape(len(keys), -1))
+    return np.unique(keys.view(f"V{keys.itemsize * keys.shape[1]}").ravel(), return_inverse=True)[1].reshape(-1)
+
+def board_fits(compatibility, boards: np.ndarray) -> np.ndarray:
+    '''
+    A number for every board, the same for boards with the same sockets that take the same kits.
+    '''
+    return numbered(np.column_stack([compatibility.board_sockets[boards].astype(np.int64), compatibility.board_groups[boards]]))
+
+def fit_groups(compatibility, rows: dict) -> dict:
+    '''
+    A number for every row of each table, the same for rows that fit exactly the same other rows:
+    CPUs by their sockets, boards by their sockets and the kits they take, kits by the boards that take them.
+    '''
+    boards = rows["motherboard"]
+    groups = {name: np.zeros(len(r), dtype=np.int64) for name, r in rows.items()}
+    groups["cpu"] = numbered(compatibility.cpu_sockets[rows["cpu"]])
+    groups["motherboard"] = board_fits(compatibility, boards)
+    kits = [compatibility.kits(g)[rows["memory"]] for g in np.unique(compatibility.board_groups[boards])]
+    if kits:
+        groups["memory"] = numbered(np.packbits(np.column_stack(kits), axis=1))
+    return groups
+
+def staircase(prices: np.ndarray, scores: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    '''
+    Whether each row scores higher than every row of its group that costs no more. Any other row can be swapped
+    for one that does without the build costing more, scoring less or no longer fitting together.
+    '''
+    if len(scores) == 0:
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort((-scores, prices, groups))
+    # each group's scores lifted above the last group's, so one running maximum serves every group
+    lifted = scores[order] + groups[order] * (scores.max() - scores.min() + 1)
+    best_before = np.maximum.accumulate(lifted)
+    best_before = np.concatenate([[-np.inf], best_before[:-1]])
+    best_before[np.flatnonzero(np.diff(groups[order])) + 1] = -np.inf
+    keep = np.zeros(len(order), dtype=bool)
+    keep[order] = lifted > best_before
+    return keep
+
+def triples(compatibility, cpus: np.ndarray, boards: np.ndarray, kits: np.ndarray, chunk: int = TRIPLE_CHUNK):
+    '''
+    Yields every compatible (cpu, board, kit) of the given rows, as three aligned arrays of row positions,
+    about chunk of them at a time. Boards that fit the same CPUs and kits are taken together, so only
+    compatible triples are ever built, in the order the boards are given (of each group's first board).
+    '''
+    fits = board_fits(compatibility, boards)
+    _, first = np.unique(fits, return_index=True)
+    for group in fits[np.sort(first)]:
+        group_boards = boards[fits == group]
+        board = group_boards[0]
+        fit_cpus = cpus[compatibility.board_sockets[board] & compatibility.cpu_sockets[cpus] != 0]
+        fit_kits = kits[compatibility.kits(compatibility.board_groups[board])[kits]]
+        if len(fit_cpus) == 0 or len(fit_kits) == 0:
+            continue
+        # as many boards as fit in a chunk with all their triples, or one board and as many CPUs as fit
+        cpu_step = max(1, min(len(fit_cpus), chunk // len(fit_kits)))
+        board_step = max(1, chunk // (len(fit_cpus) * len(fit_kits)))
+        for b in range(0, len(group_boards), board_step):
+            chunk_boards = group_boards[b:b + board_step]
+            for c in range(0, len(fit_cpus), cpu_step):
+                chunk_cpus = fit_cpus[c:c + cpu_step]
+                per_board = len(chunk_cpus) * len(fit_kits)
+                yield (
+                    np.tile(np.repeat(chunk_cpus, len(fit_kits)), len(chunk_boards)),
+                    np.repeat(chunk_boards, per_board),
+                    np.tile(fit_kits, len(chunk_boards) * len(chunk_cpus)),
+                )
+
+def best_builds(catalog, rows: dict, requirements: dict, budget: float = None, k: int = 5, pool: int = 40) -> list:
+    '''
+    Input:
+    - rows: row positions of each table to build from, e.g. the filtered candidates
+    - requirements: the requirements of each component, which weigh the scores
+    - budget: the most the whole build may cost (None for no limit)
+    - k: the number of builds to return
+    - pool: how many of the best scoring rows of each table are searched, besides its staircase (see staircase),
+      which alone always holds the best build; the others only make room for more of the next best
+
+    Output:
+    - up to k builds, best first, each as (score, total price, {table: row position})
+    '''
+    budget = np.inf if budget is None else budget
+    rows = {name: np.asarray(r, dtype=np.int64) for name, r in rows.items()}
+    # looked up by row position, but only the given rows are priced and scored
+    prices, scores = {}, {}
+    for name, r in rows.items():
+        prices[name] = np.full(len(catalog[name]), np.inf)
+        prices[name][r] = row_prices(catalog, name, r)
+        scores[name] = np.full(len(catalog[name]), -np.inf)
+        scores[name][r] = part_scores(catalog, name, requirements.get(name), r)
+    # parts without a price can't be bought
+    rows = affordable({name: r[np.isfinite(prices[name][r]) & np.isfinite(scores[name][r])] for name, r in rows.items()}, prices, budget)
+    if any(len(r) == 0 for r in rows.values()):
+        return []
+    groups = fit_groups(catalog.compatibility, rows)
+    for name, r in rows.items():
+        keep = staircase(prices[name][r], scores[name][r], groups[name])
+        if len(r) > pool:
+            keep[np.argpartition(-scores[name][r], pool - 1)[:pool]] = True
+        else:
+            keep[:] = True
+        rows[name] = r[keep]
+
+    coolers, drives = np.meshgrid(rows["cooler"], rows["storage"], indexing="ij")
+    coolers, drives = coolers.ravel(), drives.ravel()
+    pair_price = prices["cooler"][coolers] + prices["storage"][drives]
+    pair_score = scores["cooler"][coolers] + scores["storage"][drives]
+    order = np.argsort(pair_price, kind="stable")
+    coolers, drives, pair_price, pair_score = coolers[order], drives[order], pair_price[order], pair_score[order]
+    # best pair score among the pairs costing at most each pair's price
+    best_pair = np.maximum.accumulate(pair_score)
+
+    # min-heap of the best k builds so far, as (score, -price, sequence, cpu, board, kit, pair)
+    found, sequence = [], 0
+    # best boards first, so the heap fills with good builds early and later chunks are mostly cut off whole
+    boards = rows["motherboard"][np.argsort(-scores["motherboard"][rows["motherboard"]], kind="stable")]
+    for cpu, board, kit in triples(catalog.compatibility, rows["cpu"], boards, rows["memory"]):
+        triple_price = prices["cpu"][cpu] + prices["motherboard"][board] + prices["memory"][kit]
+        triple_score = scores["cpu"][cpu] + scores["motherboard"][board] + scores["memory"][kit]
+        # pairs each triple can afford are a prefix of the sorted pairs, and the best of them bounds the triple's builds
+        affordable_pairs = np.searchsorted(pair_price, budget - triple_price, side="right")
+        bound = np.where(affordable_pairs > 0, triple_score + best_pair[np.maximum(affordable_pairs - 1, 0)], -np.inf)
+        live = np.flatnonzero(bound > (found[0][0] if len(found) == k else -np.inf))
+
+        for t in live[np.argsort(-bound[live], kind="stable")]:
+            if len(found) == k and bound[t] <= found[0][0]:
+                break
+            build_scores = triple_score[t] + pair_score[:affordable_pairs[t]]
+            top = np.argpartition(-build_scores, k - 1)[:k] if len(build_scores) > k else np.arange(len(build_scores))
+            for p in top:
+                item = (float(build_scores[p]), -float(triple_price[t] + pair_price[p]), -sequence, int(cpu[t]), int(board[t]), int(kit[t]), int(p))
+                sequence += 1
+                if len(found) < k:
+                    heapq.heappush(found, item)
+                elif item > found[0]:
+                    heapq.heapreplace(found, item)
+
+    builds = []
+    for score, price, _, c, b, m, p in sorted(found, reverse=True):
+        parts = {"cpu": c, "cooler": coolers[p], "storage": drives[p], "memory": m, "motherboard": b}
+        builds.append((round(score, 4), round(-price, 2), {name: int(row) for name, row in parts.items()}))
+    return builds
@@ -0,0 +1,110 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+def make_key(*parts) -> str:
+    '''
+    Hashes any JSON-serialisable parts into a fixed-length cache key.
+    '''
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+class LRUCache:
+    '''
+    Thread-safe, size-bounded cache with least-recently-used eviction and an optional time-to-live.
+
+    If a path is given, entries are also written to a SQLite database there, so that they survive restarts
+    and can be shared between worker processes. Values are stored in the database as the string
+    returned by encode, and turned back into values with decode. The database is pruned on every write to the
+    maxsize most recently written entries, dropping any that have expired.
+    '''
+    def __init__(self, maxsize=1024, ttl=None, path=None, encode=json.dumps, decode=json.loads):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.encode = encode
+        self.decode = decode
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache (created)")
+            self.db.commit()
+
+    def expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key: str):
+        '''
+        Returns the cached value for key, or None if it is missing or has expired.
+        '''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.expired(entry[1]):
+                del self.entries[key]
+                entry = None
+
+            if entry is None and self.db is not None:
+                row = self.db.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.expired(row[1]):
+                    self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self.db.commit()
+                elif row is not None:
+                    entry = (self.decode(row[0]), row[1])
+                    self.store(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value):
+        with self.lock:
+            entry = (value, time.time())
+            self.store(key, entry)
+            if self.db is not None:
+                self.db.execute("INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)", (key, self.encode(value), entry[1]))
+                self.prune(entry[1])
+                self.db.commit()
+
+    def prune(self, now: float):
+        '''
+        Deletes the rows that have expired, then all but the maxsize newest.
+        '''
+        if self.ttl is not None:
+            self.db.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        self.db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY created DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def store(self, key: str, entry: tuple):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM cache")
+                self.db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
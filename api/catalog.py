@@ -0,0 +1,419 @@
+import io
+import json
+import time
+import fcntl
+import shutil
+import threading
+import contextlib
+import hashlib
+import functools
+import numpy as np
+import pandas as pd
+from contextvars import ContextVar
+from .query import TableIndex
+from .compatibility import CompatibilityIndex
+from .scoring import TableScorer
+from .search import TitleIndex
+from .pareto import pareto_levels
+from .config import data_path, SNAPSHOT_PATH, PARETO_LEVELS
+
+TABLES = ("cpu", "cooler", "storage", "memory", "motherboard")
+
+# dtypes fixed at load time, so that filters never need to cast per request
+SCHEMA = {
+    "cpu": {
+        "core_count": "int16",
+        "performance_core_clock": "float32",
+        "performance_core_boost_clock": "float32",
+        "microarchitecture": "category",
+        "tdp": "int16",
+        "integrated_graphics": "category",
+        "rating": "float32",
+        "price": "float32",
+    },
+    "cooler": {
+        "rating": "float32",
+        "price": "float32",
+        "radiator_size": "float32",
+        "average_noise_level": "float32",
+        "average_fan_rpm": "float32",
+    },
+    "storage": {
+        "rating": "float32",
+        "price": "float32",
+        "price_per_gb": "float32",
+        "type": "category",
+        "form_factor": "category",
+        "interface": "category",
+        "cache_gb": "float32",
+        "capacity_gb": "float32",
+    },
+    "memory": {
+        "rating": "float32",
+        "price": "float32",
+        "price_per_gb": "float32",
+        "cas_latency": "float32",
+        "module_count": "int16",
+        "gb_per_module": "float32",
+        "total_ram": "float32",
+        "speed_mhz": "float32",
+    },
+    "motherboard": {
+        "rating": "float32",
+        "price": "float32",
+        "cpu_socket": "category",
+        "form_factor": "category",
+        "memory_slots": "int16",
+        "max_memory_gb": "float32",
+    },
+}
+
+# value list -> (table, column) it is drawn from; the requirement enums are built from these lists
+ENUM_COLUMNS = {
+    "cpu_microarchitectures": ("cpu", "microarchitecture"),
+    "cpu_graphics": ("cpu", "integrated_graphics"),
+    "cooler_colours": ("cooler", "color"),
+    "storage_types": ("storage", "type"),
+    "storage_form_factors": ("storage", "form_factor"),
+    "storage_interfaces": ("storage", "interface"),
+    "memory_colours": ("memory", "color"),
+    "motherboard_sockets": ("motherboard", "cpu_socket"),
+    "motherboard_form_factors": ("motherboard", "form_factor"),
+    "motherboard_colours": ("motherboard", "color"),
+}
+
+# bump whenever the snapshot layout changes, so old snapshots are ignored rather than misread
+SNAPSHOT_FORMAT = 5
+
+@contextlib.contextmanager
+def snapshot_lock(path=SNAPSHOT_PATH):
+    '''
+    Holds an exclusive lock on a file next to the snapshot at path, for as long as it is being written.
+    '''
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+class Catalog:
+    '''
+    Typed, in-memory copy of every component table in data/.
+    Loaded once per process and shared by the filters, the enum builders and the recommender.
+    Tables are read-only: callers should select from them, never modify them in place.
+    '''
+    def __init__(self, tables: dict, version: str = None, enum_values: dict = None, orders: dict = None, sorted_values: dict = None, titles: dict = None, levels: dict = None):
+        self.tables = tables
+        self.version = version
+        for name, df in tables.items():
+            setattr(self, name, df)
+
+        # sorted unique values of every enum column
+        if enum_values is None:
+            enum_values = {key: sorted(tables[name][col].dropna().unique().tolist()) for key, (name, col) in ENUM_COLUMNS.items()}
+        self.enum_values = enum_values
+
+        # build the range and enum indexes of every table up front
+        self.indexes = {name: TableIndex(df).build((orders or {}).get(name), (sorted_values or {}).get(name)) for name, df in tables.items()}
+        self.compatibility = CompatibilityIndex(self.cpu, self.motherboard, self.memory)
+        self.scorers = {name: TableScorer(name, df) for name, df in tables.items()}
+        self.titles = titles or {name: TitleIndex(df["title"]) for name, df in tables.items()}
+        # Pareto frontier level of every row, see api/pareto.py
+        self.levels = levels or {name: pareto_levels(name, df) for name, df in tables.items()}
+        self.frontiers = {}
+
+    @classmethod
+    def load(cls, path=data_path, snapshot=SNAPSHOT_PATH):
+        '''
+        Loads every table from the CSVs in path.
+        The catalog's version is a hash of their contents, so it changes whenever any of the data does.
+
+        With a snapshot path, the catalog is served from a snapshot of that same version, which is written
+        first if it is missing or out of date. Its arrays are memory-mapped read-only, so every process
+        loading it (e.g. each uvicorn worker) shares one copy of them in the page cache instead of holding its own.
+        '''
+        raw, digest = {}, hashlib.sha256()
+        for name in TABLES:
+            raw[name] = (path / f"{name}.csv").read_bytes()
+            digest.update(raw[name])
+        version = digest.hexdigest()[:12]
+
+        if snapshot is not None:
+            catalog = cls.load_snapshot(snapshot, version)
+            if catalog is not None:
+                return catalog
+            catalog = cls.load_shared(raw, version, snapshot)
+            if catalog is not None:
+                return catalog
+
+        return cls.parse(raw, version)
+
+    @classmethod
+    def parse(cls, raw: dict, version: str):
+        tables = {name: pd.read_csv(io.BytesIO(raw[name]), dtype=SCHEMA[name]) for name in TABLES}
+        return cls(tables, version=version)
+
+    @classmethod
+    def load_shared(cls, raw: dict, version: str, snapshot=SNAPSHOT_PATH):
+        '''
+        Writes the snapshot of a catalog version and maps it. Writers take a lock next to the snapshot,
+        so when several workers start at once, the first one writes it and the rest map what it wrote.
+        Returns None if the snapshot can't be written, e.g. on a read-only disk.
+        '''
+        try:
+            with snapshot_lock(snapshot):
+                # another process may have written it while this one waited
+                catalog = cls.load_snapshot(snapshot, version)
+                if catalog is None:
+                    start = time.perf_counter()
+                    cls.parse(raw, version).save(snapshot)
+                    print(f"Wrote catalog snapshot {version} to {snapshot} in {time.perf_counter() - start:.2f}s")
+                    catalog = cls.load_snapshot(snapshot, version)
+                return catalog
+        except OSError as e:
+            print(f"Could not write catalog snapshot to {snapshot} ({e}), loading the CSVs instead")
+            return None
+
+    def save(self, path=SNAPSHOT_PATH):
+        '''
+        Writes a binary snapshot of the catalog to the directory path. Hold snapshot_lock(path) around it
+        if any other process may be writing the same snapshot.
+        Numeric columns, category codes, the presorted order and values of every numeric column, the
+        arrays of every title index and the Pareto levels of every table are stored as .npy files, so they can be memory-mapped on load.
+        String columns are stored the same way as categories, as codes into their distinct values.
+        The manifest holds the version, the column layout, category and string values, title vocabularies
+        and enum value lists.
+        '''
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        manifest = {"format": SNAPSHOT_FORMAT, "version": self.version, "enum_values": self.enum_values, "tables": {}}
+        for name, df in self.tables.items():
+            columns = {}
+            for col in df.columns:
+                series = df[col]
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    np.save(tmp / f"{name}.{col}.npy", series.cat.codes.to_numpy())
+                    columns[col] = {"kind": "category", "categories": series.cat.categories.tolist()}
+                elif pd.api.types.is_numeric_dtype(series.dtype):
+                    np.save(tmp / f"{name}.{col}.npy", series.to_numpy())
+                    index = self.indexes[name].range(col)
+                    np.save(tmp / f"{name}.{col}.order.npy", index.order)
+                    np.save(tmp / f"{name}.{col}.sorted.npy", index.sorted)
+                    columns[col] = {"kind": "numeric"}
+                else:
+                    codes, values = pd.factorize(series)
+                    np.save(tmp / f"{name}.{col}.npy", codes.astype(np.int32))
+                    columns[col] = {"kind": "str", "values": values.tolist()}
+            np.save(tmp / f"{name}.pareto.npy", self.levels[name])
+            titles = self.titles[name]
+            for attr in TitleIndex.ARRAYS:
+                np.save(tmp / f"{name}.title.{attr}.npy", getattr(titles, attr))
+            manifest["tables"][name] = {"columns": columns, "vocabulary": list(titles.vocabulary)}
+        (tmp / "manifest.json").write_text(json.dumps(manifest))
+
+        # swap the finished snapshot in whole
+        shutil.rmtree(path, ignore_errors=True)
+        tmp.rename(path)
+
+    @classmethod
+    def load_snapshot(cls, path=SNAPSHOT_PATH, version: str = None):
+        '''
+        Loads a snapshot written by save, memory-mapping its arrays rather than reading them in.
+        Returns None if there is no snapshot at path, or if it is of another format or catalog version.
+        '''
+        if not (path / "manifest.json").exists():
+            return None
+        manifest = json.loads((path / "manifest.json").read_text())
+        if manifest["format"] != SNAPSHOT_FORMAT or (version is not None and manifest["version"] != version):
+            return None
+
+        # plain read-only views of the mapped files, which the OS pages in on first touch
+        load = lambda file: np.load(path / f"{file}.npy", mmap_mode="r").view(np.ndarray)
+
+        tables, orders, sorted_values, titles, levels = {}, {}, {}, {}, {}
+        for name, table in manifest["tables"].items():
+            columns, orders[name], sorted_values[name] = {}, {}, {}
+            for col, meta in table["columns"].items():
+                values = load(f"{name}.{col}")
+                if meta["kind"] == "str":
+                    # strings are objects private to each process, but repeated ones are at least only held once
+                    strings = np.array(meta["values"] + [None], dtype=object)
+                    columns[col] = pd.array(strings[values], dtype="str")
+                elif meta["kind"] == "category":
+                    # the codes were valid when saved, and checking them would copy them out of the mapping
+                    columns[col] = pd.Categorical.from_codes(values, pd.Index(meta["categories"], dtype="str"), validate=False)
+                else:
+                    columns[col] = values
+                    orders[name][col] = load(f"{name}.{col}.order")
+                    sorted_values[name][col] = load(f"{name}.{col}.sorted")
+            tables[name] = pd.DataFrame(columns, copy=False)
+            levels[name] = load(f"{name}.pareto")
+            titles[name] = TitleIndex.from_arrays({attr: load(f"{name}.title.{attr}") for attr in TitleIndex.ARRAYS}, table["vocabulary"])
+        return cls(
+            tables, version=manifest["version"], enum_values=manifest["enum_values"],
+            orders=orders, sorted_values=sorted_values, titles=titles, levels=levels,
+        )
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        return self.tables[name]
+
+    def memory_usage(self) -> dict:
+        '''
+        Returns the deep memory footprint of each table in bytes, along with the total.
+        '''
+        usage = {name: int(df.memory_usage(deep=True).sum()) for name, df in self.tables.items()}
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def frontier(self, name: str, rows: np.ndarray = None, depth: int = PARETO_LEVELS) -> np.ndarray:
+        '''
+        The rows (by default every row of the table) on the first depth Pareto frontiers of the table,
+        in the order given. A depth of 0 keeps every row.
+        '''
+        if rows is None:
+            # the whole table's frontier is the same for every request, so it is only worked out once
+            if (name, depth) not in self.frontiers:
+                self.frontiers[name, depth] = self.frontier(name, np.arange(len(self.tables[name])), depth)
+            return self.frontiers[name, depth]
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[self.levels[name][rows] < depth] if depth > 0 else rows
+
+    def index(self, df: pd.DataFrame) -> TableIndex:
+        '''
+        Returns the prebuilt index of df if it is one of the catalog's tables,
+        otherwise a fresh index that builds its columns on first use.
+        '''
+        for name, table in self.tables.items():
+            if table is df:
+                return self.indexes[name]
+        return TableIndex(df)
+
+# the catalog new requests are served from, loaded on first use (so the ETL can import this module before
+# there is any data to load); reload swaps in a new one whole
+catalog = None
+
+# the catalog a request started with, so that it sees one version throughout even if a reload lands midway
+pinned_catalog = ContextVar("pinned_catalog", default=None)
+
+reload_lock = threading.Lock()
+reload_hooks = []
+
+def current() -> Catalog:
+    '''
+    The catalog to serve from: the one pinned for the current request, else the latest one.
+    '''
+    return pinned_catalog.get() or catalog or latest()
+
+def latest() -> Catalog:
+    '''
+    The catalog new requests are served from, loading it if nothing has yet.
+    '''
+    global catalog
+    if catalog is None:
+        with reload_lock:
+            if catalog is None:
+                catalog = Catalog.load()
+    return catalog
+
+@contextlib.contextmanager
+def pinned(pin: Catalog = None):
+    '''
+    Pins a catalog (by default the current one) for everything run inside the block.
+    '''
+    token = pinned_catalog.set(pin or current())
+    try:
+        yield pinned_catalog.get()
+    finally:
+        pinned_catalog.reset(token)
+
+def on_reload(hook):
+    '''
+    Registers hook(new_catalog) to run whenever a new catalog has been loaded, before it is swapped in,
+    so that anything derived from it is built before the first request sees it.
+    '''
+    reload_hooks.append(hook)
+    return hook
+
+class PerCatalog:
+    '''
+    Something derived from a catalog by build(catalog). It is built for each new catalog in a reload hook, and kept
+    only for the catalog being served and, during a reload, the one replacing it. A request still pinned to an
+    older catalog gets one built for it that is not kept.
+    '''
+    def __init__(self, build):
+        self.build = build
+        self.built = {}
+        functools.update_wrapper(self, build)
+        on_reload(self.load)
+
+    def load(self, new: Catalog):
+        built = {version: value for version, value in self.built.items() if catalog is not None and version == catalog.version}
+        built[new.version] = self.build(new)
+        # swapped in whole, so a reader never sees it half pruned
+        self.built = built
+
+    def __call__(self, of: Catalog = None):
+        of = of or current()
+        built = self.built
+        if of.version in built:
+            return built[of.version]
+        value = self.build(of)
+        # the first catalog is loaded without a reload, so its value is kept when first asked for
+        if of is catalog:
+            built[of.version] = value
+        return value
+
+def per_catalog(build):
+    '''
+    Decorator making build(catalog) a PerCatalog, called with a catalog (by default the current one).
+    '''
+    return PerCatalog(build)
+
+def reload(path=data_path, snapshot=SNAPSHOT_PATH) -> Catalog:
+    '''
+    Loads the catalog again and, if its data changed, swaps it in for new requests.
+    Requests already running keep the catalog they pinned. Returns the catalog now being served.
+    '''
+    global catalog
+    with reload_lock:
+        new = Catalog.load(path, snapshot)
+        if catalog is not None and new.version == catalog.version:
+            return catalog
+        for hook in reload_hooks:
+            hook(new)
+        # a single reference assignment, so a reader sees either the old catalog or the new one, never a mix
+        catalog = new
+        print(f"Reloaded catalog {new.version}")
+        return new
+
+def data_state(path=data_path) -> tuple:
+    return tuple((stat.st_mtime_ns, stat.st_size) for stat in ((path / f"{name}.csv").stat() for name in TABLES))
+
+def watch(interval: float, path=data_path):
+    '''
+    Starts a background thread that reloads the catalog whenever any of the CSVs in path changes,
+    checking their modification times and sizes every interval seconds.
+    Replace the CSVs by renaming finished files into place, so a half-written file is never loaded.
+    '''
+    def run():
+        state = data_state(path)
+        while True:
+            time.sleep(interval)
+            try:
+                latest = data_state(path)
+                if latest != state:
+                    reload(path)
+                    state = latest
+            except Exception as e:
+                print(f"Could not reload catalog: {e!r}")
+
+    threading.Thread(target=run, name="catalog-watcher", daemon=True).start()
+
+if __name__ == "__main__":
+    untyped = sum(int(pd.read_csv(data_path / f"{name}.csv").memory_usage(deep=True).sum()) for name in TABLES)
+    usage = latest().memory_usage()
+
+    for name in TABLES:
+        print(f"{name}: {usage[name] / 1024:.1f} KiB")
+    print(f"total: {usage['total'] / 1024:.1f} KiB (untyped load: {untyped / 1024:.1f} KiB per copy)")
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+# sockets each CPU microarchitecture shipped on, including its HEDT/workstation parts
+MICROARCHITECTURE_SOCKETS = {
+    "Zen 5": ["AM5"],
+    "Zen 4": ["AM5"],
+    "Zen 3": ["AM4"],
+    "Zen 2": ["AM4", "sTRX4"],
+    "Zen+": ["AM4", "sTR4"],
+    "Zen": ["AM4", "sTR4"],
+    "Excavator": ["AM4", "FM2+"],
+    "Puma+": ["FM2+"],
+    "Steamroller": ["FM2+"],
+    "Piledriver": ["AM3+", "FM2", "FM2+"],
+    "Bulldozer": ["AM3+"],
+    "Jaguar": ["AM1"],
+    "Lynx": ["FM1"],
+    "K10": ["AM3", "AM3+", "AM2+", "AM2"],
+    "Arrow Lake": ["LGA1851"],
+    "Raptor Lake Refresh": ["LGA1700"],
+    "Raptor Lake": ["LGA1700"],
+    "Alder Lake": ["LGA1700"],
+    "Rocket Lake": ["LGA1200"],
+    "Comet Lake": ["LGA1200"],
+    "Cascade Lake": ["LGA2066"],
+    "Coffee Lake Refresh": ["LGA1151"],
+    "Coffee Lake": ["LGA1151"],
+    "Kaby Lake": ["LGA1151", "LGA2066"],
+    "Skylake": ["LGA1151", "LGA2066"],
+    "Broadwell": ["LGA1150", "LGA2011-3"],
+    "Haswell Refresh": ["LGA1150"],
+    "Haswell": ["LGA1150", "LGA2011-3"],
+    "Ivy Bridge": ["LGA1155", "LGA2011"],
+    "Sandy Bridge": ["LGA1155", "LGA2011"],
+    "Westmere": ["LGA1156", "LGA1366"],
+    "Nehalem": ["LGA1156", "LGA1366"],
+    "Yorkfield": ["LGA775"],
+    "Wolfdale": ["LGA775"],
+    "Core": ["LGA775"],
+}
+
+# memory generations supported by boards of each socket; sockets missing here accept any generation
+SOCKET_MEMORY = {
+    "AM5": ["DDR5"],
+    "LGA1851": ["DDR5"],
+    "LGA1700": ["DDR4", "DDR5"],
+    "AM4": ["DDR4"],
+    "sTR4": ["DDR4"],
+    "sTRX4": ["DDR4"],
+    "LGA1200": ["DDR4"],
+    "LGA2066": ["DDR4"],
+    "LGA2011-3": ["DDR4"],
+    "LGA1151": ["DDR4", "DDR3"],
+    "LGA1150": ["DDR3"],
+    "LGA1155": ["DDR3"],
+    "LGA1156": ["DDR3"],
+    "LGA1366": ["DDR3"],
+    "LGA2011": ["DDR3"],
+    "AM3+": ["DDR3"],
+    "AM3": ["DDR3"],
+    "FM2+": ["DDR3"],
+    "FM2": ["DDR3"],
+    "FM1": ["DDR3"],
+    "AM1": ["DDR3"],
+    "AM2+": ["DDR2"],
+    "AM2": ["DDR2"],
+    "LGA775": ["DDR2", "DDR3"],
+}
+
+MEMORY_GENERATIONS = ["DDR", "DDR2", "DDR3", "DDR4", "DDR5"]
+ANY_MEMORY = (1 << len(MEMORY_GENERATIONS)) - 1
+
+def parse_board_socket(socket) -> list:
+    '''
+    Splits a motherboard socket value into the CPU sockets it accepts,
+    e.g. "AM3/AM2+/AM2" -> [AM3, AM2+, AM2] and "2 x LGA2011-3 Narrow" -> [LGA2011-3].
+    Boards with an integrated CPU accept no socket at all.
+    '''
+    if not isinstance(socket, str) or socket.startswith("Integrated"):
+        return []
+    socket = socket.split(" x ")[-1].replace(" Narrow", "")
+    return [s.strip() for s in socket.split("/")]
+
+class CompatibilityIndex:
+    '''
+    Compatibility between CPUs, motherboards and memory kits, built once per catalog load.
+
+    Every CPU and board carries a bitmask over the known sockets (a CPU with an unknown microarchitecture
+    matches every socket), so a CPU fits a board when their masks overlap. Boards are grouped by
+    memory slots, max memory and supported memory generations, and each group maps to the
+    memory kits it can take.
+    '''
+    def __init__(self, cpu: pd.DataFrame, motherboard: pd.DataFrame, memory: pd.DataFrame):
+        board_sockets = {s: parse_board_socket(s) for s in motherboard["cpu_socket"].cat.categories}
+        sockets = sorted({s for parsed in board_sockets.values() for s in parsed} | {s for l in MICROARCHITECTURE_SOCKETS.values() for s in l})
+        self.socket_bits = {s: np.uint64(1) << np.uint64(i) for i, s in enumerate(sockets)}
+        all_sockets = np.bitwise_or.reduce(list(self.socket_bits.values()))
+
+        # CPU microarchitecture -> socket mask
+        self.microarchitecture_sockets = {
+            arch: self.socket_mask(MICROARCHITECTURE_SOCKETS[arch]) if arch in MICROARCHITECTURE_SOCKETS else all_sockets
+            for arch in cpu["microarchitecture"].cat.categories
+        }
+        self.cpu_sockets = self.lookup(cpu["microarchitecture"], self.microarchitecture_sockets, all_sockets)
+
+        # board socket -> socket mask, and socket -> board row ids
+        self.board_sockets = self.lookup(motherboard["cpu_socket"], {s: self.socket_mask(parsed) for s, parsed in board_sockets.items()}, np.uint64(0))
+        self.socket_boards = {s: np.flatnonzero(self.board_sockets & bit) for s, bit in self.socket_bits.items()}
+
+        # board -> memory group -> admissible memory kits
+        board_memory = {s: self.memory_mask([g for p in parsed for g in SOCKET_MEMORY.get(p, MEMORY_GENERATIONS)]) for s, parsed in board_sockets.items()}
+        board_memory = self.lookup(motherboard["cpu_socket"], board_memory, ANY_MEMORY)
+        groups = pd.DataFrame({
+            "memory_slots": motherboard["memory_slots"].to_numpy(),
+            "max_memory_gb": motherboard["max_memory_gb"].to_numpy(),
+            "memory": board_memory,
+        })
+        self.board_groups = groups.groupby(list(groups.columns), sort=False, dropna=False).ngroup().to_numpy()
+        self.group_keys = groups.drop_duplicates().reset_index(drop=True)
+
+        generations = memory["speed"].str.extract(r"^(DDR\d?)", expand=False)
+        self.memory_generation = np.array([1 << MEMORY_GENERATIONS.index(g) if isinstance(g, str) else ANY_MEMORY for g in generations], dtype=np.int64)
+        self.memory_modules = memory["module_count"].to_numpy()
+        self.memory_total = memory["total_ram"].to_numpy()
+        self.group_kits = {}
+
+    def socket_mask(self, sockets: list) -> np.uint64:
+        mask = np.uint64(0)
+        for s in sockets:
+            mask |= self.socket_bits.get(s, np.uint64(0))
+        return mask
+
+    def memory_mask(self, generations: list) -> int:
+        return sum(1 << MEMORY_GENERATIONS.index(g) for g in set(generations))
+
+    def lookup(self, series: pd.Series, values: dict, missing) -> np.ndarray:
+        '''
+        Maps each row of a categorical column to the value of its category, in one vectorised lookup.
+        '''
+        table = np.array([values[c] for c in series.cat.categories] + [missing])
+        return table[series.cat.codes.to_numpy()]
+
+    def kits(self, group: int) -> np.ndarray:
+        '''
+        Boolean mask over all memory kits that fit boards of the given memory group.
+        '''
+        if group not in self.group_kits:
+            keys = self.group_keys
+            self.group_kits[group] = (
+                (self.memory_modules <= keys.at[group, "memory_slots"])
+                & (self.memory_total <= keys.at[group, "max_memory_gb"])
+                & (self.memory_generation & int(keys.at[group, "memory"]) != 0)
+            )
+        return self.group_kits[group]
+
+    def socket_match(self, rows: np.ndarray, masks: np.ndarray, others: np.ndarray, other_masks: np.ndarray) -> np.ndarray:
+        union = np.bitwise_or.reduce(other_masks[others]) if len(others) else np.uint64(0)
+        return masks[rows] & union != 0
+
+    def kit_match(self, boards: np.ndarray, kits: np.ndarray) -> np.ndarray:
+        '''
+        Which of the kits fit at least one of the boards.
+        '''
+        match = np.zeros(len(kits), dtype=bool)
+        for group in np.unique(self.board_groups[boards]):
+            match |= self.kits(group)[kits]
+        return match
+
+    def board_match(self, boards: np.ndarray, kits: np.ndarray) -> np.ndarray:
+        '''
+        Which of the boards take at least one of the kits.
+        '''
+        groups = self.board_groups[boards]
+        fits = {group: self.kits(group)[kits].any() for group in np.unique(groups)}
+        return np.array([fits[g] for g in groups], dtype=bool)
+
+    def join(self, rows: dict, limit: int, all_rows: dict, rank=None) -> dict:
+        '''
+        Input:
+        - rows: candidate row positions of each table
+        - limit: number of candidates to keep of each table
+        - all_rows: every row position of each table, used when no candidate of a table fits the others
+        - rank: optional table name -> function(rows, k) returning the best k of rows, in order;
+          without it the first k rows are kept
+
+        Output:
+        - the best limit candidates of each table, pruned so that every CPU fits one of the boards
+          and every board takes one of the memory kits (and the other way round)
+        '''
+        if rank is None:
+            rank = {name: lambda candidates, k: candidates[:k] for name in rows}
+
+        def prune(keep, candidates):
+            # only prune if something is left, so a table is never emptied by compatibility alone
+            return candidates[keep] if keep.any() else candidates
+
+        def fitting(match, candidates, everything):
+            # the candidates that fit, else any row of the table that fits, else the candidates as they were
+            fit = candidates[match(candidates)]
+            if len(fit) == 0:
+                fit = everything[match(everything)]
+            return fit if len(fit) else candidates
+
+        cpus, boards, kits = rows["cpu"], rows["motherboard"], rows["memory"]
+
+        cpus = rank["cpu"](prune(self.socket_match(cpus, self.cpu_sockets, boards, self.board_sockets), cpus), limit)
+        boards = fitting(lambda b: self.socket_match(b, self.board_sockets, cpus, self.cpu_sockets), boards, all_rows["motherboard"])
+        boards = rank["motherboard"](prune(self.board_match(boards, kits), boards), limit)
+        cpus = prune(self.socket_match(cpus, self.cpu_sockets, boards, self.board_sockets), cpus)
+        kits = rank["memory"](fitting(lambda k: self.kit_match(boards, k), kits, all_rows["memory"]), limit)
+        boards = prune(self.board_match(boards, kits), boards)
+
+        return {**rows, "cpu": cpus, "motherboard": boards, "memory": kits}
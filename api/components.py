@@ -1,27 +1,23 @@
 import numpy as np
 import pandas as pd
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 from typing import Optional, Literal, List
 from .utils import create_enum_from_list, get_colours
-from .config import data_path
+from .catalog import current, per_catalog
+from .cache import LRUCache, make_key
 
-cpu_df = pd.read_csv(data_path / "cpu.csv")
-cooler_df = pd.read_csv(data_path / "cooler.csv")
-storage_df = pd.read_csv(data_path / "storage.csv")
-memory_df = pd.read_csv(data_path / "memory.csv")
-motherboard_df = pd.read_csv(data_path / "motherboard.csv")
-
-# lists of unique values for each component's detail
-CPU_MICROARCHITECTURES = sorted(cpu_df['microarchitecture'].dropna().unique().tolist())
-CPU_GRAPHICS = sorted(cpu_df['integrated_graphics'].dropna().unique().tolist())
-COOLER_COLOURS = sorted(cooler_df['color'].dropna().unique().tolist())
-STORAGE_TYPES = sorted(storage_df['type'].dropna().unique().tolist())
-STORAGE_FORM_FACTORS = sorted(storage_df['form_factor'].dropna().unique().tolist())
-STORAGE_INTERFACES = sorted(storage_df['interface'].dropna().unique().tolist())
-MEMORY_COLOURS = sorted(memory_df['color'].dropna().unique().tolist())
-MOTHERBOARD_SOCKETS = sorted(motherboard_df['cpu_socket'].dropna().unique().tolist())
-MOTHERBOARD_FORM_FACTORS = sorted(motherboard_df['form_factor'].dropna().unique().tolist())
-MOTHERBOARD_COLOURS = sorted(motherboard_df['color'].dropna().unique().tolist())
+# lists of unique values for each component's detail, precomputed with the catalog
+catalog = current()
+CPU_MICROARCHITECTURES = catalog.enum_values["cpu_microarchitectures"]
+CPU_GRAPHICS = catalog.enum_values["cpu_graphics"]
+COOLER_COLOURS = catalog.enum_values["cooler_colours"]
+STORAGE_TYPES = catalog.enum_values["storage_types"]
+STORAGE_FORM_FACTORS = catalog.enum_values["storage_form_factors"]
+STORAGE_INTERFACES = catalog.enum_values["storage_interfaces"]
+MEMORY_COLOURS = catalog.enum_values["memory_colours"]
+MOTHERBOARD_SOCKETS = catalog.enum_values["motherboard_sockets"]
+MOTHERBOARD_FORM_FACTORS = catalog.enum_values["motherboard_form_factors"]
+MOTHERBOARD_COLOURS = catalog.enum_values["motherboard_colours"]
 
 COOLER_COLOURS = get_colours(COOLER_COLOURS)
 MEMORY_COLOURS = get_colours(MEMORY_COLOURS)
@@ -90,4 +86,67 @@ class PCRequirements(BaseModel):
     cooler: CoolerRequirements = Field(description="Details of preferred CPU")
     storage: StorageRequirements = Field(description="Details of preferred internal hard drive for storage")
     memory: MemoryRequirements = Field(description="Details of preferred memory RAM")
-    motherboard: MotherboardRequirements = Field(description="Details of preferred motherboard")
\ No newline at end of file
+    motherboard: MotherboardRequirements = Field(description="Details of preferred motherboard")
+COMPONENT_MODELS = {
+    "cpu": CPURequirements,
+    "cooler": CoolerRequirements,
+    "storage": StorageRequirements,
+    "memory": MemoryRequirements,
+    "motherboard": MotherboardRequirements,
+}
+
+# enum field of each model -> (enum name, catalog value list) it is built from
+ENUM_FIELDS = {
+    "cpu": {"microarchitecture": ("microarchitecture", "cpu_microarchitectures")},
+    "storage": {
+        "preferred_type": ("storage_type", "storage_types"),
+        "preferred_form_factor": ("storage_form_factor", "storage_form_factors"),
+        "preferred_interface": ("storage_interface", "storage_interfaces"),
+    },
+    "motherboard": {
+        "preferred_socket": ("motherboard_socket", "motherboard_sockets"),
+        "preferred_form_factor": ("motherboard_form_factor", "motherboard_form_factors"),
+    },
+}
+
+class RequirementModels:
+    '''
+    The requirement models of one set of enum values: one model per component, and one for the whole PC.
+    '''
+    def __init__(self, components: dict, pc):
+        self.components = components
+        self.pc = pc
+        # changes whenever the requirement models (or the enum values they are built from) change
+        self.schema_version = make_key(pc.model_json_schema())[:12]
+
+def build_models(enum_values: dict) -> RequirementModels:
+    '''
+    Rebuilds the models above with enums made from other value lists, keeping every field's description and default.
+    '''
+    components = {}
+    for name, model in COMPONENT_MODELS.items():
+        fields = {}
+        for field, (enum_name, values) in ENUM_FIELDS.get(name, {}).items():
+            fields[field] = (Optional[List[create_enum_from_list(enum_name, enum_values[values])]], model.model_fields[field])
+        components[name] = create_model(model.__name__, __base__=model, **fields) if fields else model
+    fields = {name: (components[name], PCRequirements.model_fields[name]) for name in COMPONENT_MODELS}
+    return RequirementModels(components, create_model("PCRequirements", __base__=PCRequirements, **fields))
+
+# enum value lists -> models, for the last couple of catalogs, so a reload that brings no new values rebuilds nothing
+enum_models = LRUCache(maxsize=2)
+enum_models.set(make_key(catalog.enum_values), RequirementModels(COMPONENT_MODELS, PCRequirements))
+
+@per_catalog
+def requirement_models(catalog) -> RequirementModels:
+    '''
+    The requirement models of a catalog (by default the current one).
+    Models are only rebuilt when a catalog brings enum values that the last couple of catalogs didn't have.
+    '''
+    key = make_key(catalog.enum_values)
+    models = enum_models.get(key)
+    if models is None:
+        models = build_models(catalog.enum_values)
+        enum_models.set(key, models)
+    return models
+
+requirement_models(catalog)
@@ -7,9 +7,80 @@ BASE_DIR = Path(__file__).parent.resolve()
 
 load_dotenv(BASE_DIR / '.env')
 GROQ_KEY = os.environ.get("GROQ_KEY")   
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") # point at a local chat-completions server for testing
 MODEL = "llama-3.1-8b-instant"
 # MODEL = "llama-3.3-70b-versatile"
 
-data_path = BASE_DIR.parent / "data"
+# catalog tables (CATALOG_DATA points the API at another directory of them)
+data_path = Path(os.environ.get("CATALOG_DATA", BASE_DIR.parent / "data"))
+# scraped product tables, which `python -m api.etl` builds the catalog tables in data_path from
+parsed_path = BASE_DIR.parent / "scraper" / "parsed"
 
 TEST_MESSAGE = "I'm a storyboard animator, and I want a decent PC rig that does things fast! It needs at least 1 TB of storage as well as 16 GB of RAM. Try to keep the costs as low as possible, but without sacrificing performance."
+
+# requirement extraction cache (set REQUIREMENTS_CACHE_PATH to a file to persist it in SQLite)
+REQUIREMENTS_CACHE_SIZE = int(os.environ.get("REQUIREMENTS_CACHE_SIZE", 1024))
+REQUIREMENTS_CACHE_TTL = float(os.environ.get("REQUIREMENTS_CACHE_TTL", 24 * 60 * 60))
+REQUIREMENTS_CACHE_PATH = os.environ.get("REQUIREMENTS_CACHE_PATH")
+
+# requirements read off a message by the local rules in api/rules.py are used as they are, without calling the model,
+# when the rules are at least this confident in them (set above 1 to always call the model); otherwise they are passed to it as hints
+LOCAL_EXTRACTION_CONFIDENCE = float(os.environ.get("LOCAL_EXTRACTION_CONFIDENCE", 0.8))
+
+# near-duplicate requirement cache in api/similarity.py: a message reuses the requirements of a cached one at least this
+# similar (cosine of hashed character n-gram TF-IDF vectors), and a fraction of those hits are checked against the model
+SIMILARITY_CACHE_SIZE = int(os.environ.get("SIMILARITY_CACHE_SIZE", 1024))
+SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_THRESHOLD", 0.9))
+SIMILARITY_DIMENSIONS = int(os.environ.get("SIMILARITY_DIMENSIONS", 4096))
+SIMILARITY_AUDIT_RATE = float(os.environ.get("SIMILARITY_AUDIT_RATE", 0.0))
+
+# per-component fallback extraction, run concurrently when the single PCRequirements call fails
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", 16))
+EXTRACTION_TIMEOUT = float(os.environ.get("EXTRACTION_TIMEOUT", 20))
+
+# async request path
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", 100))
+FILTER_WORKERS = int(os.environ.get("FILTER_WORKERS", 4))
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("MAX_CONCURRENT_REQUESTS", 64))
+MAX_QUEUED_REQUESTS = int(os.environ.get("MAX_QUEUED_REQUESTS", 256))
+QUEUE_TIMEOUT = float(os.environ.get("QUEUE_TIMEOUT", 30))
+
+# estimated token budget for the candidate tables in the recommendation prompt
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 2000))
+
+# candidates are only drawn from the first this many Pareto frontiers of each table (see api/pareto.py), so that
+# no item is offered while one at least as good and as cheap is left out; 0 draws from every row
+PARETO_LEVELS = int(os.environ.get("PARETO_LEVELS", 1))
+
+# whole-build optimiser in api/builds.py, searching the filtered rows of each table that no cheaper row beats,
+# plus its BUILD_POOL_SIZE best scoring ones.
+# BUILD_MODE "shortlist" offers the model its best BUILD_SHORTLIST builds within the total budget, when the user gives one;
+# "final" answers with its best build without calling the model at all; "off" leaves the model to pick from the candidates
+BUILD_MODE = os.environ.get("BUILD_MODE", "shortlist")
+BUILD_POOL_SIZE = int(os.environ.get("BUILD_POOL_SIZE", 40))
+BUILD_SHORTLIST = int(os.environ.get("BUILD_SHORTLIST", 5))
+
+# cache of final recommendations, keyed on the extracted requirements, candidates, model and catalog version
+RECOMMENDATION_CACHE_SIZE = int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 1024))
+
+# batch recommendations: concurrent extractions and final calls per batch, and the rate of final calls across all batches
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 1000))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", 8))
+BATCH_REQUESTS_PER_SECOND = float(os.environ.get("BATCH_REQUESTS_PER_SECOND", 2))
+
+# add a Server-Timing header with the time spent in each stage to every response
+TIMING_HEADERS = os.environ.get("TIMING_HEADERS", "0") == "1"
+
+# binary snapshot of the typed catalog, memory-mapped by every process serving it (and rewritten by the first of them
+# whenever it is out of date); set CATALOG_SNAPSHOT to an empty string to parse the CSVs into a private copy per process
+SNAPSHOT_PATH = os.environ.get("CATALOG_SNAPSHOT", str(data_path / "snapshot"))
+SNAPSHOT_PATH = Path(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+
+# catalog reloads: POST /admin/reload needs this token in X-Admin-Token (the endpoint is off without one),
+# and the CSVs are checked for changes every CATALOG_WATCH_INTERVAL seconds (0 to only reload on demand or SIGHUP)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+CATALOG_WATCH_INTERVAL = float(os.environ.get("CATALOG_WATCH_INTERVAL", 0))
+
+# parts named outright in a message ("Ryzen 7 7800X3D") are pinned as the only candidates of their table,
+# as long as they pass its filters; up to this many rows each, the best scoring first
+SEARCH_MAX_PINS = int(os.environ.get("SEARCH_MAX_PINS", 3))
@@ -0,0 +1,200 @@
+'''
+Builds the catalog tables in data/ from the scraped tables in scraper/parsed, deriving the numeric columns
+the API filters on from strings like "650 - 2000 RPM", "2 x 16GB" and "2048 MB". This does what
+scraper/preprocessing.ipynb did by hand, plus memory speeds in MHz.
+
+Every derived column is parsed with vectorised string operations. Rows are matched to the last build
+by title and a hash of their scraped fields (titles alone repeat across colours and sellers), and only
+rows that are new or changed are recomputed. A table is only rewritten if any of its rows changed,
+so an unchanged scrape doesn't touch the catalog version.
+
+    python -m api.etl [--full] [--no-snapshot]
+'''
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from .catalog import Catalog, TABLES, SCHEMA, snapshot_lock
+from .config import data_path, parsed_path, SNAPSHOT_PATH
+
+# catalog table -> scraped product table it is built from
+SOURCES = {
+    "cpu": "cpu",
+    "cooler": "cpu-cooler",
+    "storage": "internal-hard-drive",
+    "memory": "memory",
+    "motherboard": "motherboard",
+}
+
+# directory, next to the tables, holding the row keys of the last build of each table, aligned with its rows
+STATE_DIR = ".etl"
+
+UNITS_GB = {"TB": 1000.0, "GB": 1.0, "MB": 0.001}
+
+def leading_number(series: pd.Series) -> pd.Series:
+    '''
+    The first number in each string, e.g. "$34.90" -> 34.9.
+    '''
+    return series.str.extract(r"(\d+\.?\d*)", expand=False).astype(float)
+
+def strip_unit(series: pd.Series, unit: str) -> pd.Series:
+    return pd.to_numeric(series.str.removesuffix(unit), errors="coerce")
+
+def average(series: pd.Series, unit: str) -> pd.Series:
+    '''
+    The midpoint of ranges like "650 - 2000 RPM", or the value itself for a single one like "1550 RPM".
+    '''
+    parts = series.str.removesuffix(unit).str.extract(r"^\s*(\d+\.?\d*)\s*(?:-\s*(\d+\.?\d*))?\s*$").astype(float)
+    return ((parts[0] + parts[1].fillna(parts[0])) / 2).round(3)
+
+def to_gb(series: pd.Series) -> pd.Series:
+    '''
+    Sizes like "2 TB", "192 GB" or "2048 MB" in GB.
+    '''
+    parts = series.str.extract(r"(\d+\.?\d*)\s*(TB|GB|MB)")
+    return parts[0].astype(float) * parts[1].map(UNITS_GB).astype(float)
+
+def modules(series: pd.Series) -> tuple:
+    '''
+    Memory kits like "2 x 16GB" as (module count, GB per module, total GB).
+    '''
+    parts = series.str.extract(r"(\d+)\s*x\s*(\d+\.?\d*)\s*(GB|MB)")
+    count = parts[0].astype(float)
+    size = parts[1].astype(float) * parts[2].map(UNITS_GB).astype(float)
+    return count, size, count * size
+
+def transform_cpu(df: pd.DataFrame) -> pd.DataFrame:
+    df["price"] = leading_number(df["price"])
+    df["performance_core_clock"] = strip_unit(df["performance_core_clock"], " GHz")
+    df["performance_core_boost_clock"] = strip_unit(df["performance_core_boost_clock"], " GHz")
+    df["tdp"] = strip_unit(df["tdp"], " W")
+    return df
+
+def transform_cooler(df: pd.DataFrame) -> pd.DataFrame:
+    df["price"] = leading_number(df["price"])
+    df["radiator_size"] = strip_unit(df["radiator_size"], " mm")
+    df["average_noise_level"] = average(df["noise_level"], " dB")
+    df["average_fan_rpm"] = average(df["fan_rpm"], " RPM")
+    return df
+
+def transform_storage(df: pd.DataFrame) -> pd.DataFrame:
+    df["price"] = leading_number(df["price"])
+    df["price_per_gb"] = leading_number(df["price_per_gb"])
+    df["cache_gb"] = to_gb(df["cache"])
+    df["capacity_gb"] = to_gb(df["capacity"])
+    return df
+
+def transform_memory(df: pd.DataFrame) -> pd.DataFrame:
+    df["price"] = leading_number(df["price"])
+    df["price_per_gb"] = leading_number(df["price_per_gb"])
+    df["module_count"], df["gb_per_module"], df["total_ram"] = modules(df["modules"])
+    # "DDR5-6000" -> 6000
+    df["speed_mhz"] = df["speed"].str.extract(r"-(\d+)", expand=False).astype(float)
+    return df
+
+def transform_motherboard(df: pd.DataFrame) -> pd.DataFrame:
+    df["price"] = leading_number(df["price"])
+    df["max_memory_gb"] = to_gb(df["max_memory"])
+    return df
+
+TRANSFORMS = {
+    "cpu": transform_cpu,
+    "cooler": transform_cooler,
+    "storage": transform_storage,
+    "memory": transform_memory,
+    "motherboard": transform_motherboard,
+}
+
+def numeric_schema(name: str) -> dict:
+    # categories are left as strings until the catalog loads the table, so old and new rows can be combined
+    return {col: dtype for col, dtype in SCHEMA[name].items() if dtype != "category"}
+
+def row_keys(source: pd.DataFrame) -> np.ndarray:
+    '''
+    One key per scraped row, from its title and the hash of all of its fields.
+    '''
+    return pd.util.hash_pandas_object(source, index=False).to_numpy()
+
+def load_previous(name: str, columns: list, path=data_path):
+    '''
+    The last build of a table and the keys of its rows, or None if there is none to build on,
+    including when it was built with other columns.
+    '''
+    keys_path = path / STATE_DIR / f"{name}.npy"
+    if not keys_path.exists() or not (path / f"{name}.csv").exists():
+        return None
+    keys = np.load(keys_path)
+    df = pd.read_csv(path / f"{name}.csv", dtype=numeric_schema(name))
+    if len(df) != len(keys) or list(df.columns) != columns:
+        return None
+    return keys, df
+
+def build_table(name: str, path=data_path, full: bool = False) -> tuple:
+    '''
+    Builds one table from its scraped source, recomputing only the rows that changed since the last build.
+    Returns the table, the keys of its rows and how many rows were recomputed, or None for the table
+    if nothing changed.
+    '''
+    source = pd.read_csv(parsed_path / f"{SOURCES[name]}.csv")
+    keys = row_keys(source)
+    columns = list(TRANSFORMS[name](source.head(0).copy()).columns)
+    previous = None if full else load_previous(name, columns, path)
+
+    if previous is None:
+        return TRANSFORMS[name](source.copy()).astype(numeric_schema(name)), keys, len(source)
+
+    old_keys, old = previous
+    if len(old_keys) == len(keys) and (old_keys == keys).all():
+        return None, keys, 0
+
+    # position of each row in the last build, or -1 if it is new or changed
+    unique_keys, first = np.unique(old_keys, return_index=True)
+    found = np.minimum(np.searchsorted(unique_keys, keys), len(unique_keys) - 1)
+    positions = np.where(unique_keys[found] == keys, first[found], -1)
+    changed = positions == -1
+
+    reused = old.iloc[positions[~changed]].set_axis(source.index[~changed])
+    recomputed = TRANSFORMS[name](source[changed].copy()).astype(numeric_schema(name))
+    df = pd.concat([reused, recomputed]).sort_index()
+    return df, keys, int(changed.sum())
+
+def write_table(name: str, df: pd.DataFrame, keys: np.ndarray, path=data_path):
+    '''
+    Writes a table and its row keys, renaming the finished CSV into place so the catalog watcher
+    never sees half of one.
+    '''
+    (path / STATE_DIR).mkdir(exist_ok=True)
+    tmp = path / f".{name}.csv.tmp"
+    df.to_csv(tmp, index=False)
+    tmp.replace(path / f"{name}.csv")
+    np.save(path / STATE_DIR / f"{name}.npy", keys)
+
+def run(path=data_path, full: bool = False, snapshot=SNAPSHOT_PATH) -> dict:
+    '''
+    Builds every table, then the catalog snapshot if any of them changed. Returns table -> rows recomputed.
+    '''
+    recomputed, written = {}, []
+    for name in TABLES:
+        start = time.perf_counter()
+        df, keys, recomputed[name] = build_table(name, path, full)
+        if df is None:
+            print(f"{name}: unchanged")
+            continue
+        write_table(name, df, keys, path)
+        written.append(name)
+        print(f"{name}: {len(df)} rows, {recomputed[name]} recomputed in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    if snapshot is not None and written:
+        catalog = Catalog.load(path, snapshot=None)
+        with snapshot_lock(snapshot):
+            catalog.save(snapshot)
+        print(f"wrote snapshot to {snapshot}")
+    return recomputed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="recompute every row, ignoring the last build")
+    parser.add_argument("--no-snapshot", action="store_true", help="don't rebuild the catalog snapshot")
+    args = parser.parse_args()
+
+    run(full=args.full, snapshot=None if args.no_snapshot else SNAPSHOT_PATH)
@@ -1,23 +1,208 @@
+import copy
 import json
 import os
-import instructor 
-from groq import Groq
-from .config import GROQ_KEY, MODEL
-from .components import CPURequirements, CoolerRequirements, StorageRequirements, MemoryRequirements, MotherboardRequirements, PCRequirements
+import time
+import random
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .config import MODEL, REQUIREMENTS_CACHE_SIZE, REQUIREMENTS_CACHE_TTL, REQUIREMENTS_CACHE_PATH, EXTRACTION_WORKERS, EXTRACTION_TIMEOUT, LOCAL_EXTRACTION_CONFIDENCE
+from .config import SIMILARITY_CACHE_SIZE, SIMILARITY_THRESHOLD, SIMILARITY_DIMENSIONS, SIMILARITY_AUDIT_RATE
+from .components import requirement_models, RequirementModels
+from .rules import extract_rules, found_fields
+from .cache import LRUCache, make_key
+from .similarity import SimilarityCache
+from .llm import client, aclient
+from . import metrics
 
-client = Groq(api_key=GROQ_KEY)
-client = instructor.from_groq(client, mode=instructor.Mode.JSON)
+logger = logging.getLogger(__name__)
 
-def call_to_model(messages, response_model):
-    response = client.chat.completions.create(
-        model=MODEL,
-        response_model=response_model,
-        messages=messages
-    ).model_dump()
+requirements_cache = LRUCache(
+    maxsize=REQUIREMENTS_CACHE_SIZE,
+    ttl=REQUIREMENTS_CACHE_TTL,
+    path=REQUIREMENTS_CACHE_PATH,
+    encode=lambda reqs: json.dumps(reqs, default=lambda x: x.value),
+    decode=lambda s: requirement_models().pc.model_validate_json(s).model_dump(),
+)
 
+similarity_cache = SimilarityCache(
+    maxsize=SIMILARITY_CACHE_SIZE,
+    threshold=SIMILARITY_THRESHOLD,
+    dimensions=SIMILARITY_DIMENSIONS,
+)
+
+metrics.register_cache("requirements", requirements_cache)
+metrics.register_cache("similarity", similarity_cache)
+
+executor = ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix="extraction")
+
+def normalise_message(message: str) -> str:
+    return " ".join(message.casefold().split())
+
+def requirements_key(message: str, models: RequirementModels = None) -> str:
+    # the requirement schema is part of the key, so a catalog that brings new enum values never reuses older answers
+    return make_key(normalise_message(message), MODEL, (models or requirement_models()).schema_version)
+
+def similarity_namespace(models: RequirementModels, hints: dict) -> str:
+    # only messages the rules read the same requirements off share answers, so "16GB" never reuses "32GB"
+    return make_key(MODEL, models.schema_version, json.dumps(hints or {}, sort_keys=True, default=lambda x: x.value))
+
+def call_to_model(messages, response_model, timeout=None):
+    try:
+        response = client.chat.completions.create(
+            model=MODEL,
+            response_model=response_model,
+            messages=messages,
+            timeout=timeout
+        ).model_dump()
+    except Exception:
+        metrics.llm_calls.inc(purpose="extraction", outcome="error")
+        raise
+
+    metrics.llm_calls.inc(purpose="extraction", outcome="ok")
     return response
 
+def extraction_failed(name: str, error: Exception):
+    # futures and asyncio.wait_for both raise TimeoutError on a missed deadline
+    metrics.extraction_failures.inc(component=name, reason="timeout" if isinstance(error, TimeoutError) else "error")
+    logger.warning("Could not extract %s requirements: %r", name, error)
+
+def call_to_models(messages, response_models: dict, timeout=EXTRACTION_TIMEOUT):
+    '''
+    Calls the model once for each response model, all at the same time.
+    Every call shares the same deadline; a call that fails or misses it comes back as None.
+    '''
+    futures = {name: executor.submit(call_to_model, messages, model, timeout) for name, model in response_models.items()}
+    deadline = time.monotonic() + timeout
+
+    responses = {}
+    for name, future in futures.items():
+        try:
+            responses[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except Exception as e:
+            future.cancel()
+            extraction_failed(name, e)
+            responses[name] = None
+
+    return responses
+
+async def acall_to_model(messages, response_model, timeout=None):
+    try:
+        response = await aclient.chat.completions.create(
+            model=MODEL,
+            response_model=response_model,
+            messages=messages,
+            timeout=timeout
+        )
+    except Exception:
+        metrics.llm_calls.inc(purpose="extraction", outcome="error")
+        raise
+
+    metrics.llm_calls.inc(purpose="extraction", outcome="ok")
+    return response.model_dump()
+
+async def acall_to_models(messages, response_models: dict, timeout=EXTRACTION_TIMEOUT):
+    '''
+    Async version of call_to_models.
+    '''
+    async def call(name, response_model):
+        try:
+            return await asyncio.wait_for(acall_to_model(messages, response_model, timeout), timeout=timeout)
+        except Exception as e:
+            extraction_failed(name, e)
+            return None
+
+    responses = await asyncio.gather(*(call(name, model) for name, model in response_models.items()))
+    return dict(zip(response_models.keys(), responses))
+
+def local_requirements(message: str, models: RequirementModels) -> tuple:
+    '''
+    Reads the requirements off the message with the local rules.
+    Returns them if the rules are confident enough to skip the model, else None, along with what they found as hints for the model.
+    '''
+    with metrics.span("extraction.rules"):
+        requirements, confidence = extract_rules(message, models)
+    if confidence >= LOCAL_EXTRACTION_CONFIDENCE:
+        metrics.rule_extractions.inc(outcome="used")
+        return requirements, None
+    metrics.rule_extractions.inc(outcome="hints" if confidence else "none")
+    return None, found_fields(requirements)
+
+def similar_requirements(message: str, namespace: str):
+    '''
+    The requirements extracted for a cached message close enough to this one, or None.
+    '''
+    with metrics.span("extraction.similarity"):
+        found = similarity_cache.get(normalise_message(message), namespace)
+    return None if found is None else found[0]
+
+def audit_similar() -> bool:
+    return random.random() < SIMILARITY_AUDIT_RATE
+
+def remember_similar(message: str, namespace: str, fresh: dict, similar: dict = None) -> dict:
+    '''
+    Caches requirements the model extracted for messages like this one, or if they were extracted to audit a hit,
+    records whether the requirements it reused were the same. Returns the fresh requirements.
+    '''
+    # partial results, where some component's extraction failed, are neither cached nor compared
+    if any(r is None for r in fresh.values()):
+        return fresh
+    if similar is None:
+        similarity_cache.set(normalise_message(message), fresh, namespace)
+    else:
+        correct = fresh == similar
+        similarity_cache.audit(correct)
+        metrics.similarity_audits.inc(outcome="correct" if correct else "false_hit")
+    return fresh
+
 def get_requirements(message: str):
+    '''
+    Extracts the requirements of each component from the user's message, with the local rules if they are
+    confident enough, else by reusing those of a near-identical message, or else with the model.
+    Results are cached on the normalised message, the model and the requirement schema version.
+    '''
+    models = requirement_models()
+    key = requirements_key(message, models)
+    cached = requirements_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    requirements, hints = local_requirements(message, models)
+    if requirements is None:
+        namespace = similarity_namespace(models, hints)
+        requirements = similar_requirements(message, namespace)
+        if requirements is None or audit_similar():
+            fresh = extract_requirements(message, models, hints)
+            requirements = remember_similar(message, namespace, fresh, requirements)
+    cache_requirements(key, requirements)
+    return copy.deepcopy(requirements)
+
+async def aget_requirements(message: str):
+    '''
+    Async version of get_requirements.
+    '''
+    models = requirement_models()
+    key = requirements_key(message, models)
+    cached = requirements_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    requirements, hints = local_requirements(message, models)
+    if requirements is None:
+        namespace = similarity_namespace(models, hints)
+        requirements = similar_requirements(message, namespace)
+        if requirements is None or audit_similar():
+            fresh = await aextract_requirements(message, models, hints)
+            requirements = remember_similar(message, namespace, fresh, requirements)
+    cache_requirements(key, requirements)
+    return copy.deepcopy(requirements)
+
+def cache_requirements(key: str, requirements: dict):
+    # don't cache partial results, where some component's extraction failed
+    if all(r is not None for r in requirements.values()):
+        requirements_cache.set(key, requirements)
+
+def build_messages(message: str, hints: dict = None):
     system_prompt = '''You are an expert assistant helping to extract PC component preferences from user input. Your task is to identify only the details that the user explicitly or implicitly mentions about their desired PC build. 
 
     You can only infer user preferences if it is within reason. For attributes that are not clearly stated or reasonably implied, you should ignore and leave blank (i.e. return None).
@@ -27,31 +212,47 @@ def get_requirements(message: str):
     'I'm building a PC for video editing' -> high CPU processing speed
     'Give me something compact. I'm limited on desk space.' -> smaller preferred_form_factor
     '''
-    messages = [
+    if hints:
+        system_prompt += f'''
+    These requirements have already been read off the user's input. Keep them unless the input says otherwise, and add whatever else it asks for or implies:
+    {json.dumps(hints, default=lambda x: x.value)}
+    '''
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": message}
     ]
 
+def extract_requirements(message: str, models: RequirementModels = None, hints: dict = None):
+    messages = build_messages(message, hints)
+    models = models or requirement_models()
+
     try: 
-        pc_requirements = call_to_model(messages, PCRequirements)
+        with metrics.span("extraction.single"):
+            pc_requirements = call_to_model(messages, models.pc)
         print("Called using PCRequirements!")
         return pc_requirements
     except:
-        cpu_requirements = call_to_model(messages, CPURequirements)
-        cooler_requirements = call_to_model(messages, CoolerRequirements)
-        storage_requirements = call_to_model(messages, StorageRequirements)
-        memory_requirements = call_to_model(messages, MemoryRequirements)
-        motherboard_requirements = call_to_model(messages, MotherboardRequirements)
-
+        metrics.extraction_fallbacks.inc()
+        with metrics.span("extraction.fallback"):
+            requirements = call_to_models(messages, models.components)
         print("Called using separate Requirements!")
+        return requirements
 
-        return {
-            "cpu": cpu_requirements, 
-            "cooler": cooler_requirements, 
-            "storage": storage_requirements, 
-            "memory": memory_requirements, 
-            "motherboard": motherboard_requirements
-        }
+async def aextract_requirements(message: str, models: RequirementModels = None, hints: dict = None):
+    messages = build_messages(message, hints)
+    models = models or requirement_models()
+
+    try: 
+        with metrics.span("extraction.single"):
+            pc_requirements = await acall_to_model(messages, models.pc)
+        print("Called using PCRequirements!")
+        return pc_requirements
+    except Exception:
+        metrics.extraction_fallbacks.inc()
+        with metrics.span("extraction.fallback"):
+            requirements = await acall_to_models(messages, models.components)
+        print("Called using separate Requirements!")
+        return requirements
 
 def save_requirements(reqs: dict, path: str):
     for name, data in reqs.items():
@@ -1,17 +1,12 @@
 import json
 import math
 import pandas as pd 
-from .utils import convert_to_enum_name
-from .config import data_path
+from .catalog import current
 
-cpu_df = pd.read_csv(data_path / "cpu.csv")
-cooler_df = pd.read_csv(data_path / "cooler.csv")
-storage_df = pd.read_csv(data_path / "storage.csv")
-memory_df = pd.read_csv(data_path / "memory.csv")
-motherboard_df = pd.read_csv(data_path / "motherboard.csv")
+# each *_query turns a component's requirements into (column, lo, hi) range and (column, values) enum predicates,
+# which the filter_* functions run against the table's query engine
 
-def filter_cpu(
-    df,
+def cpu_query(
     min_cores=0,
     min_core_clock_ghz=0,
     min_boost_clock_ghz=0,
@@ -30,21 +25,21 @@ def filter_cpu(
     if max_price is None:
         max_price = math.inf
 
-    filters = [
-        df["core_count"] >= min_cores,
-        df["performance_core_clock"] >= min_core_clock_ghz,
-        df["performance_core_boost_clock"] >= min_boost_clock_ghz,
-        df["tdp"] <= max_tdp_watts,
-        df["price"].astype(float) <= max_price,
+    ranges = [
+        ("core_count", min_cores, None),
+        ("performance_core_clock", min_core_clock_ghz, None),
+        ("performance_core_boost_clock", min_boost_clock_ghz, None),
+        ("tdp", None, max_tdp_watts),
+        ("price", None, max_price),
     ]
+    enums = []
 
     if microarchitecture:
-        filters.append(df['microarchitecture'].apply(convert_to_enum_name).isin(microarchitecture))
+        enums.append(("microarchitecture", microarchitecture))
 
-    return df.loc[pd.concat(filters, axis=1).all(axis=1)].reset_index(drop=False).rename(columns={"index": "item_id"})
+    return ranges, enums
 
-def filter_cooler(
-    df,
+def cooler_query(
     min_fan_rpm=0,
     max_noise_level_db=math.inf,
     max_radiator_size_mm=math.inf,
@@ -59,23 +54,22 @@ def filter_cooler(
     if max_price is None:
         max_price = math.inf 
 
-    filters = [
-        df["average_fan_rpm"] >= min_fan_rpm,
-        df["average_noise_level"] <= max_noise_level_db,
-        df["radiator_size"] <= max_radiator_size_mm,
-        df["price"].astype(float) <= max_price,
+    ranges = [
+        ("average_fan_rpm", min_fan_rpm, None),
+        ("average_noise_level", None, max_noise_level_db),
+        ("radiator_size", None, max_radiator_size_mm),
+        ("price", None, max_price),
     ]
 
-    return df.loc[pd.concat(filters, axis=1).all(axis=1)].reset_index(drop=False).rename(columns={"index": "item_id"})
+    return ranges, []
 
-def filter_storage(
-    df,
+def storage_query(
     min_capacity_gb=0,
     preferred_type=None, 
     min_cache_gb=0,
     preferred_form_factor=None,
     preferred_interface=None,
-    max_price_per_gb=math.inf
+    max_price_per_gb=math.inf,
 ):
     if min_capacity_gb is None:
         min_capacity_gb = 0
@@ -84,55 +78,57 @@ def filter_storage(
     if max_price_per_gb is None:
         max_price_per_gb = math.inf
 
-    filters = [
-        df["capacity_gb"].astype(float) >= min_capacity_gb,
-        df["cache_gb"].astype(float) >= min_cache_gb,
-        df["price_per_gb"].astype(float) <= max_price_per_gb
+    ranges = [
+        ("capacity_gb", min_capacity_gb, None),
+        ("cache_gb", min_cache_gb, None),
+        ("price_per_gb", None, max_price_per_gb),
     ]
+    enums = []
 
     if preferred_type is not None:
-        filters.append(df["type"].apply(convert_to_enum_name).isin(preferred_type))
+        enums.append(("type", preferred_type))
 
     if preferred_form_factor is not None:
-        filters.append(df["form_factor"].apply(convert_to_enum_name).isin(preferred_form_factor))
+        enums.append(("form_factor", preferred_form_factor))
 
     if preferred_interface is not None:
-        filters.append(df["interface"].apply(convert_to_enum_name).isin(preferred_interface))
+        enums.append(("interface", preferred_interface))
 
-    return df.loc[pd.concat(filters, axis=1).all(axis=1)].reset_index(drop=False).rename(columns={"index": "item_id"})
+    return ranges, enums
 
-def filter_memory(
-    df,
+def memory_query(
     min_capacity_gb=0,
-    min_speed_mhz=None, # TODO
+    min_speed_mhz=0,
     max_module_count=0,
     max_cas_latency=math.inf,
-    max_price=math.inf
+    max_price=math.inf,
 ):
     if min_capacity_gb is None:
         min_capacity_gb = 0
+    if min_speed_mhz is None:
+        min_speed_mhz = 0
     if max_module_count is None:
         max_module_count = math.inf
     if max_cas_latency is None:
         max_cas_latency = math.inf 
     if max_price is None:
         max_price = math.inf
-    filters = [
-        df["total_ram"] >= min_capacity_gb,
-        df["module_count"] <= max_module_count,
-        df["cas_latency"] <= max_cas_latency,
-        df["price"].astype(float) <= max_price,
+    ranges = [
+        ("total_ram", min_capacity_gb, None),
+        ("speed_mhz", min_speed_mhz, None),
+        ("module_count", None, max_module_count),
+        ("cas_latency", None, max_cas_latency),
+        ("price", None, max_price),
     ]
 
-    return df.loc[pd.concat(filters, axis=1).all(axis=1)].reset_index(drop=False).rename(columns={"index": "item_id"})
+    return ranges, []
 
-def filter_motherboard(
-    df,
+def motherboard_query(
     preferred_socket=None,
     preferred_form_factor=None, 
     min_max_memory_gb=0,
     min_memory_slots=0,
-    max_price=math.inf
+    max_price=math.inf,
 ):
     if min_max_memory_gb is None:
         min_max_memory_gb = 0
@@ -141,17 +137,48 @@ def filter_motherboard(
     if max_price is None:
         max_price = math.inf
 
-    filters = [
-        df["max_memory_gb"].astype(float) >= min_max_memory_gb,
-        df["memory_slots"] >= min_memory_slots,
-        df["price"] <= max_price,
+    ranges = [
+        ("max_memory_gb", min_max_memory_gb, None),
+        ("memory_slots", min_memory_slots, None),
+        ("price", None, max_price),
     ]
+    enums = []
 
     if preferred_socket:
-        filters.append(df["cpu_socket"].apply(convert_to_enum_name).isin(preferred_socket))
+        enums.append(("cpu_socket", preferred_socket))
 
     if preferred_form_factor:
-        filters.append(df["form_factor"].apply(convert_to_enum_name).isin(preferred_form_factor))
+        enums.append(("form_factor", preferred_form_factor))
+
+
+    return ranges, enums
+
+def bounding(ranges, enums) -> tuple:
+    '''
+    Just the predicates of a query that rule something out: ranges left at their defaults (0 or no limit)
+    still drop rows missing that column, which named parts shouldn't be for a bound nobody asked for.
+    '''
+    return [(col, lo, hi) for col, lo, hi in ranges if lo not in (None, 0) or hi not in (None, math.inf)], enums
+
+def filter_cpu(df, limit=None, **requirements):
+    return current().index(df).filter(*cpu_query(**requirements), limit=limit)
+
+def filter_cooler(df, limit=None, **requirements):
+    return current().index(df).filter(*cooler_query(**requirements), limit=limit)
+
+def filter_storage(df, limit=None, **requirements):
+    return current().index(df).filter(*storage_query(**requirements), limit=limit)
+
+def filter_memory(df, limit=None, **requirements):
+    return current().index(df).filter(*memory_query(**requirements), limit=limit)
 
+def filter_motherboard(df, limit=None, **requirements):
+    return current().index(df).filter(*motherboard_query(**requirements), limit=limit)
 
-    return df.loc[pd.concat(filters, axis=1).all(axis=1)].reset_index(drop=False).rename(columns={"index": "item_id"})
\ No newline at end of file
+QUERIES = {
+    "cpu": cpu_query,
+    "cooler": cooler_query,
+    "storage": storage_query,
+    "memory": memory_query,
+    "motherboard": motherboard_query,
+}
\ No newline at end of file
@@ -0,0 +1,50 @@
+import time
+import asyncio
+import threading
+from fastapi import HTTPException
+
+class ConcurrencyLimiter:
+    '''
+    Caps how many requests are served at once.
+    Up to max_queued more requests wait for a free slot; anything beyond that, or anything
+    that waits longer than timeout seconds, is turned away with a 429.
+    '''
+    def __init__(self, max_concurrent: int, max_queued: int, timeout: float):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.waiting = 0
+
+    async def acquire(self):
+        if self.semaphore.locked() and self.waiting >= self.max_queued:
+            raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": "1"})
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": "1"})
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self.semaphore.release()
+
+class RateLimiter:
+    '''
+    Spaces out calls to at most rate per second, letting up to burst calls through at once after a quiet spell.
+    delay reserves the next free slot and returns how many seconds to wait before using it;
+    it is thread-safe, so sync and async callers can share one limiter.
+    '''
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1 / rate
+        self.burst = burst
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self.lock:
+            now = time.monotonic()
+            wait = max(0.0, self.next - now - (self.burst - 1) * self.interval)
+            self.next = max(self.next, now) + self.interval
+            return wait
@@ -0,0 +1,52 @@
+import threading
+from .config import GROQ_KEY, GROQ_BASE_URL, LLM_MAX_CONNECTIONS
+
+# instructor, groq and openai take over a second to import, so none of them are touched until a client is first needed
+
+def build_client():
+    import httpx
+    import instructor
+    from groq import Groq
+
+    limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+    client = Groq(api_key=GROQ_KEY, base_url=GROQ_BASE_URL, http_client=httpx.Client(limits=limits))
+    return instructor.from_groq(client, mode=instructor.Mode.JSON)
+
+def build_aclient():
+    import httpx
+    import instructor
+    from groq import AsyncGroq
+
+    limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS)
+    aclient = AsyncGroq(api_key=GROQ_KEY, base_url=GROQ_BASE_URL, http_client=httpx.AsyncClient(limits=limits))
+    return instructor.from_groq(aclient, mode=instructor.Mode.JSON)
+
+class LazyClient:
+    '''
+    Stands in for a client, building it on first use and passing every attribute through to it from then on.
+    '''
+    def __init__(self, build):
+        self.build = build
+        self.client = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    self.client = self.build()
+        return self.client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+# one pooled connection set per process, shared by extraction and recommendation
+client = LazyClient(build_client)
+aclient = LazyClient(build_aclient)
+
+def warm():
+    '''
+    Builds both clients ahead of the first request, e.g. from a background thread at startup.
+    '''
+    client.get()
+    aclient.get()
@@ -1,9 +1,49 @@
-from fastapi import FastAPI 
+import time
+import signal
+import asyncio
+import secrets
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from .recommendation import * 
-from .extraction import get_requirements
+from .utils import to_json_records
+from .extraction import get_requirements, aget_requirements
+from .limits import ConcurrencyLimiter
+from . import metrics, llm, catalog as catalogs, search
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+class BatchRequest(BaseModel):
+    messages: list[str]
+    model: str = 'llama-3.3-70b-versatile'
+    # the most each build may cost, for every message; by default each message's own, if it names one
+    budget: float | None = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the LLM clients are slow to import, so build them in the background while the server starts answering
+    threading.Thread(target=llm.warm, daemon=True).start()
+
+    # reload the catalog on SIGHUP, and whenever the CSVs change if a watch interval is set.
+    # signal handlers can only be set from the main thread, which an embedded server or a TestClient isn't on,
+    # and Windows has no SIGHUP
+    if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=catalogs.reload, daemon=True).start())
+    if CATALOG_WATCH_INTERVAL > 0:
+        catalogs.watch(CATALOG_WATCH_INTERVAL)
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+limiter = ConcurrencyLimiter(MAX_CONCURRENT_REQUESTS, MAX_QUEUED_REQUESTS, QUEUE_TIMEOUT)
+
+async def limit_concurrency():
+    await limiter.acquire()
+    try:
+        yield
+    finally:
+        limiter.release()
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,20 +53,131 @@ app.add_middleware(
     allow_headers=["*"], 
 )
 
+@app.middleware("http")
+async def time_request(request: Request, call_next):
+    '''
+    Records how long each request takes, and collects the time spent in each of its stages.
+    With TIMING_HEADERS on, or when the request sends "X-Timing: 1", those stage timings come back in a Server-Timing header.
+    '''
+    timings = {}
+    token = metrics.request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.request_timings.reset(token)
+
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    metrics.request_seconds.observe(elapsed, route=route.path if route else "unmatched", status=response.status_code)
+    if TIMING_HEADERS or request.headers.get("x-timing") == "1":
+        response.headers["Server-Timing"] = metrics.server_timing({**timings, "total": elapsed})
+    return response
+
+@app.middleware("http")
+async def pin_catalog(request: Request, call_next):
+    '''
+    Serves the whole request from the catalog that was current when it came in, and reports its version
+    in an X-Catalog-Version header.
+    '''
+    with catalogs.pinned() as catalog:
+        response = await call_next(request)
+    response.headers["X-Catalog-Version"] = catalog.version
+    return response
+
+def format_event(stage: str, result) -> str:
+    '''
+    Formats a pipeline stage as a Server-Sent Event. Candidate tables are encoded column by column.
+    '''
+    if stage == "candidates":
+        data = "{" + ", ".join(f'"{name}": {to_json_records(df)}' for name, df in result.items()) + "}"
+    else:
+        data = json.dumps(jsonable_encoder(result))
+    return f"event: {stage}\ndata: {data}\n\n"
+
 @app.get("/")
 async def root():
     return {"message": "hello world"}
 
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/admin/reload")
+async def reload_catalog(x_admin_token: str = Header(None)):
+    '''
+    Reloads the catalog from data/ and swaps it in for new requests. Only reloads the worker that gets the request;
+    use SIGHUP or CATALOG_WATCH_INTERVAL to reload every worker.
+    '''
+    if ADMIN_TOKEN is None or x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    previous = catalogs.current().version
+    # loading and indexing takes a while, so it runs off the event loop
+    catalog = await asyncio.get_running_loop().run_in_executor(None, catalogs.reload)
+    return {"version": catalog.version, "previous_version": previous, "changed": catalog.version != previous}
+
 @app.get("/parrot")
 def parrot(message: str):
     return {"message": message}
 
-@app.get("/extract")
-def extract(message: str):
-    reqs = get_requirements(message)
+@app.get("/search")
+def search_titles(q: str, component: list[str] = Query(None), limit: int = 10):
+    '''
+    Finds parts by title, e.g. /search?q=ryzen 7 7800x3d&component=cpu. Typos are fine; with no component given,
+    every table is searched.
+    '''
+    catalog = catalogs.current()
+    unknown = [name for name in component or [] if name not in catalog.tables]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown component {unknown[0]}, expected one of {', '.join(catalog.tables)}")
+    with metrics.span("search"):
+        return search.search(catalog, q, component, min(max(limit, 1), 100))
+
+@app.get("/extract", dependencies=[Depends(limit_concurrency)])
+async def extract(message: str):
+    reqs = await aget_requirements(message)
     return reqs
 
-@app.get("/recommend")
-def recommend(message: str, model: str = 'llama-3.3-70b-versatile'):
-    rec = get_recommendation(message=message, model=model)
-    return rec
\ No newline at end of file
+@app.get("/recommend", dependencies=[Depends(limit_concurrency)])
+async def recommend(message: str, model: str = 'llama-3.3-70b-versatile', budget: float = None):
+    rec = await aget_recommendation(message=message, model=model, budget=budget)
+    return rec
+
+@app.get("/builds", dependencies=[Depends(limit_concurrency)])
+async def builds(message: str, budget: float = None, k: int = 5):
+    '''
+    The k best complete builds for the message within budget (by default, a total budget the message names),
+    found by the optimiser alone, without asking the model to pick.
+    '''
+    return await aget_builds(message, budget, min(max(k, 1), 50))
+
+# streamed responses hold their limiter slot until the body is done with, since yield dependencies only exit
+# once the response has been sent (or the client has gone), whether or not the body was ever iterated
+@app.get("/recommend/stream", dependencies=[Depends(limit_concurrency)])
+async def recommend_stream(message: str, model: str = 'llama-3.3-70b-versatile', budget: float = None):
+    '''
+    Streams the requirements, the candidates and the component choices as Server-Sent Events, each as soon as it is ready.
+    '''
+    async def events():
+        try:
+            async for stage, result in astream_recommendation(message=message, model=model, budget=budget):
+                yield format_event(stage, result)
+        except Exception as e:
+            yield format_event("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/recommend/batch", dependencies=[Depends(limit_concurrency)])
+async def recommend_batch(batch: BatchRequest):
+    '''
+    Recommends a build for each message, streaming back one JSON line per item as soon as it is done:
+    {"index": ..., "recommendation": ..., "error": ...}. Items finish in any order.
+    '''
+    if len(batch.messages) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} messages per batch")
+
+    async def results():
+        async for i, recommendation, error in abatch_recommendations(batch.messages, batch.model, batch.budget):
+            yield json.dumps({"index": i, "recommendation": recommendation, "error": error}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
\ No newline at end of file
@@ -0,0 +1,132 @@
+import time
+import threading
+import contextlib
+from contextvars import ContextVar
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+
+# stage -> seconds spent in it during the current request, if anything is collecting them
+request_timings = ContextVar("request_timings", default=None)
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    labels = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # an unlabelled counter is reported as 0 before it is first incremented
+        self.values = {} if labels else {(): 0}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> (count per bucket, sum, count)
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            counts, total, count = self.values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.values[key] = (counts, total + value, count + 1)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{format_labels(self.labels, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, key, le)} {count}")
+                lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, key)} {count}")
+        return lines
+
+registry = []
+caches = {}
+
+stage_seconds = Histogram("rigai_stage_seconds", "Time spent in each stage of a request.", ("stage",))
+request_seconds = Histogram("rigai_request_seconds", "Time taken to answer each request, by route.", ("route", "status"))
+llm_calls = Counter("rigai_llm_calls_total", "Calls to the LLM, by purpose and outcome.", ("purpose", "outcome"))
+rule_extractions = Counter("rigai_rule_extractions_total", "Extractions read by the local rules, by whether they were used as is, passed to the model as hints, or found nothing.", ("outcome",))
+similarity_audits = Counter("rigai_similarity_audits_total", "Near-duplicate cache hits checked against the model, by whether the reused requirements were right or a false hit.", ("outcome",))
+extraction_fallbacks = Counter("rigai_extraction_fallbacks_total", "Extractions that fell back to one call per component.")
+extraction_failures = Counter("rigai_extraction_failures_total", "Per-component extraction calls that failed, by component and whether they missed the deadline or errored.", ("component", "reason"))
+empty_filters = Counter("rigai_empty_filter_fallbacks_total", "Filters that matched nothing and fell back to the whole table.", ("component",))
+prompt_tokens = Histogram("rigai_prompt_tokens", "Estimated tokens of each recommendation prompt.", buckets=TOKEN_BUCKETS)
+
+def register_cache(name: str, cache):
+    '''
+    Reports the hits, misses, evictions and size of an LRUCache (or SimilarityCache) along with the other metrics.
+    '''
+    caches[name] = cache
+
+@contextlib.contextmanager
+def span(stage: str):
+    '''
+    Times the block as one stage of the current request, both in rigai_stage_seconds
+    and, if the request is collecting them, in its own timings.
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=stage)
+        timings = request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+def server_timing(timings: dict) -> str:
+    '''
+    Formats request timings as a Server-Timing header, in milliseconds.
+    '''
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings.items())
+
+def render() -> str:
+    '''
+    Every metric in the Prometheus text exposition format.
+    '''
+    lines = []
+    for metric in registry:
+        lines += metric.render()
+
+    for kind, help in (("hits", "Cache hits."), ("misses", "Cache misses."), ("evictions", "Cache evictions.")):
+        lines += [f"# HELP rigai_cache_{kind}_total {help}", f"# TYPE rigai_cache_{kind}_total counter"]
+        lines += [f'rigai_cache_{kind}_total{{cache="{name}"}} {cache.stats()[kind]}' for name, cache in caches.items()]
+    lines += ["# HELP rigai_cache_size Entries held in memory by each cache.", "# TYPE rigai_cache_size gauge"]
+    lines += [f'rigai_cache_size{{cache="{name}"}} {cache.stats()["size"]}' for name, cache in caches.items()]
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,145 @@
+'''
+Pareto frontiers of every component table over the price/performance columns its filters use.
+
+An item dominates another if it is at least as good on every one of those columns and better on at least one,
+so anything a filter keeps, it would keep the dominating item too, and at a score at least as high.
+Items are only compared within groups that agree on the columns that make them a different product
+to the filters or to compatibility (socket, memory generation, kit size and so on), so no item that
+fits a build or a preference the others don't is ever dominated.
+
+Every item gets a level: 0 for the frontier itself, 1 for the frontier of what is left without it, and so on.
+'''
+import numpy as np
+import pandas as pd
+
+# table -> column -> whether higher is better; these are the columns the filters bound
+CRITERIA = {
+    "cpu": {
+        "core_count": True,
+        "performance_core_clock": True,
+        "performance_core_boost_clock": True,
+        "tdp": False,
+        "price": False,
+    },
+    "cooler": {
+        "average_fan_rpm": True,
+        "average_noise_level": False,
+        "price": False,
+    },
+    "storage": {
+        "capacity_gb": True,
+        "cache_gb": True,
+        "price_per_gb": False,
+        # a bigger drive can be cheaper per GB and still too expensive for the buyer
+        "price": False,
+    },
+    "memory": {
+        "speed_mhz": True,
+        "cas_latency": False,
+        "price": False,
+    },
+    "motherboard": {
+        "max_memory_gb": True,
+        "memory_slots": True,
+        "price": False,
+    },
+}
+
+# table -> column -> pattern whose first group is compared instead of the whole value (None for the value itself);
+# items are only compared with others that have the same values here
+GROUPS = {
+    "cpu": {"microarchitecture": None, "integrated_graphics": None},
+    # a bigger radiator is neither better nor worse, since a case only takes up to some size
+    "cooler": {"radiator_size": None},
+    "storage": {"type": None, "form_factor": None, "interface": None},
+    # "DDR5-6000" -> DDR5, since boards take a generation, and kits only replace ones of the same size and layout
+    "memory": {"speed": r"^(DDR\d?)", "total_ram": None, "module_count": None},
+    "motherboard": {"cpu_socket": None, "form_factor": None},
+}
+
+# a row missing one of these can't be bought, so it counts as the worst on it; a row missing any other criterion
+# is a different kind of product (a passive cooler has no fan speed), and only compared with rows missing the same ones
+UNPRICED = ("price", "price_per_gb")
+
+# rows compared against all others at once
+CHUNK = 256
+
+def groups(name: str, df: pd.DataFrame) -> np.ndarray:
+    '''
+    The group number of every row of a table.
+    '''
+    keys = {}
+    for col, pattern in GROUPS[name].items():
+        codes, values = pd.factorize(df[col])
+        if pattern:
+            # matched once per distinct value rather than once per row
+            codes = pd.factorize(pd.Series(values, dtype=str).str.extract(pattern, expand=False).to_numpy()[codes])[0]
+        keys[col] = codes
+    for col in CRITERIA[name]:
+        if col not in UNPRICED:
+            keys[f"{col}.missing"] = df[col].isna().to_numpy()
+    return distinct(np.column_stack([np.zeros(len(df))] + list(keys.values())))
+
+def distinct(values: np.ndarray) -> np.ndarray:
+    '''
+    A number for every row of a 2D array, the same for identical rows, found by hashing rather than sorting them.
+    '''
+    return pd.DataFrame(values).groupby(list(range(values.shape[1])), sort=False).ngroup().to_numpy()
+
+def dominance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    '''
+    Given one row of criteria per item, all oriented so that higher is better,
+    returns the matrix whose [i, j] is whether item a[i] dominates item b[j].
+    '''
+    # one criterion at a time, so the temporaries are len(a) x len(b) rather than that many times the criteria
+    at_least, better = True, False
+    for x, y in zip(a.T, b.T):
+        at_least = at_least & (x[:, None] >= y)
+        better = better | (x[:, None] > y)
+    return at_least & better
+
+def frontier_levels(values: np.ndarray) -> np.ndarray:
+    '''
+    The frontier level of every row of values, which must be distinct and sorted in descending lexicographic order,
+    so that every row comes after all the rows that dominate it. A row's level is one more than the highest
+    level of any row dominating it, or 0 if none does.
+    '''
+    levels = np.zeros(len(values), dtype=np.int16)
+    for start in range(0, len(values), CHUNK):
+        chunk = values[start:start + CHUNK]
+        before = dominance(values[:start], chunk)
+        base = np.where(before, levels[:start, None] + 1, 0).max(axis=0, initial=0)
+        # rows dominating each other within the chunk settle in as many passes as their longest chain
+        within = dominance(chunk, chunk)
+        chunk_levels = base
+        while True:
+            relaxed = np.maximum(base, np.where(within, chunk_levels[:, None] + 1, 0).max(axis=0, initial=0))
+            if (relaxed == chunk_levels).all():
+                break
+            chunk_levels = relaxed
+        levels[start:start + CHUNK] = chunk_levels
+    return levels
+
+def pareto_levels(name: str, df: pd.DataFrame) -> np.ndarray:
+    '''
+    The frontier level of every row of a table, where 0 means no other row dominates it.
+    Missing prices count as the worst possible, so an unpriced row never dominates a priced one.
+    '''
+    values = np.column_stack([
+        df[col].to_numpy(dtype=np.float64) * (1 if higher_is_better else -1)
+        for col, higher_is_better in CRITERIA[name].items()
+    ])
+    values = np.nan_to_num(values, nan=-np.inf)
+
+    # identical rows neither dominate each other nor differ in level, so only distinct ones are compared
+    keys = np.column_stack([groups(name, df), values])
+    inverse = distinct(keys)
+    _, first = np.unique(inverse, return_index=True)
+    keys = keys[first]
+    # by group, then in descending lexicographic order, which puts every row after all the rows that dominate it
+    order = np.lexsort([-keys[:, i] for i in reversed(range(1, keys.shape[1]))] + [keys[:, 0]])
+    levels = np.zeros(len(keys), dtype=np.int16)
+    bounds = np.flatnonzero(np.diff(keys[order, 0])) + 1
+    for rows in np.split(order, bounds):
+        levels[rows] = frontier_levels(keys[rows, 1:])
+    return levels[inverse]
@@ -0,0 +1,120 @@
+import math
+import pandas as pd
+
+COMPONENT_NAMES = {
+    "cpu": "CPUs",
+    "cooler": "Coolers",
+    "storage": "Storage",
+    "memory": "Memory",
+    "motherboard": "Motherboards",
+}
+
+# always shown, so the model can name its pick and report its price
+BASE_COLUMNS = ["item_id", "title", "price"]
+
+# what a part is mostly judged on, shown even when the user has not asked about it
+DEFAULT_COLUMNS = {
+    "cpu": ["core_count", "performance_core_boost_clock"],
+    "cooler": ["average_noise_level"],
+    "storage": ["capacity_gb", "type"],
+    "memory": ["total_ram", "cas_latency"],
+    "motherboard": ["form_factor"],
+}
+
+# what the model needs to check that the parts it picks fit together
+COMPATIBILITY_COLUMNS = {
+    "cpu": ["microarchitecture"],
+    "cooler": [],
+    "storage": [],
+    "memory": ["speed", "module_count"],
+    "motherboard": ["cpu_socket", "memory_slots", "max_memory_gb"],
+}
+
+# requirement -> the columns that show how well a part meets it
+REQUIREMENT_COLUMNS = {
+    "cpu": {
+        "min_cores": ["core_count"],
+        "min_core_clock_ghz": ["performance_core_clock"],
+        "min_boost_clock_ghz": ["performance_core_boost_clock"],
+        "microarchitecture": ["microarchitecture"],
+        "max_tdp_watts": ["tdp"],
+    },
+    "cooler": {
+        "min_fan_rpm": ["average_fan_rpm"],
+        "max_noise_level_db": ["average_noise_level"],
+        "max_radiator_size_mm": ["radiator_size"],
+    },
+    "storage": {
+        "min_capacity_gb": ["capacity_gb"],
+        "preferred_type": ["type"],
+        "min_cache_gb": ["cache_gb"],
+        "preferred_form_factor": ["form_factor"],
+        "preferred_interface": ["interface"],
+        "max_price_per_gb": ["price_per_gb"],
+    },
+    "memory": {
+        "min_capacity_gb": ["total_ram"],
+        "min_speed_mhz": ["speed"],
+        "max_module_count": ["module_count"],
+        "max_cas_latency": ["cas_latency"],
+    },
+    "motherboard": {
+        "preferred_socket": ["cpu_socket"],
+        "preferred_form_factor": ["form_factor"],
+        "min_max_memory_gb": ["max_memory_gb"],
+        "min_memory_slots": ["memory_slots"],
+    },
+}
+
+def estimate_tokens(text: str) -> int:
+    '''
+    Rough token count of a piece of text, at about four characters per token.
+    '''
+    return math.ceil(len(text) / 4)
+
+def prompt_columns(name: str, requirements: dict = None) -> list:
+    '''
+    The columns of a component table worth showing the model, given the user's requirements.
+    '''
+    columns = BASE_COLUMNS + DEFAULT_COLUMNS[name] + COMPATIBILITY_COLUMNS[name]
+    for requirement, value in (requirements or {}).items():
+        if value is not None:
+            columns += REQUIREMENT_COLUMNS[name].get(requirement, [])
+    return list(dict.fromkeys(columns))
+
+def encode_table(df: pd.DataFrame, columns: list) -> tuple:
+    '''
+    Encodes a candidate table as a CSV header and one CSV line per row, keeping only the given columns.
+    '''
+    columns = [col for col in columns if col in df.columns]
+    lines = df[columns].to_csv(index=False, lineterminator="\n").splitlines()
+    return lines[0], lines[1:]
+
+def encode_candidates(candidates: dict, requirements: dict, budget: int) -> tuple:
+    '''
+    Input:
+    - candidates: component name -> candidate table, best candidates first
+    - requirements: component name -> extracted requirements
+    - budget: maximum estimated tokens for the candidate tables
+
+    Output:
+    - the candidate tables as text, with the worst candidates trimmed until they fit the budget
+      (longest list first, always keeping at least one candidate of each component)
+    - the estimated token count of that text
+    '''
+    tables = {}
+    for name, df in candidates.items():
+        header, lines = encode_table(df, prompt_columns(name, requirements.get(name)))
+        tables[name] = (f"{COMPONENT_NAMES[name]}:\n{header}", lines, [estimate_tokens(line) + 1 for line in lines])
+
+    tokens = sum(estimate_tokens(title) + 1 + sum(costs) for title, _, costs in tables.values())
+    while tokens > budget:
+        trimmable = [name for name, (_, lines, _) in tables.items() if len(lines) > 1]
+        if not trimmable:
+            break
+        _, lines, costs = tables[max(trimmable, key=lambda name: len(tables[name][1]))]
+        lines.pop()
+        tokens -= costs.pop()
+
+    text = "\n\n".join("\n".join([title] + lines) for title, lines, _ in tables.values())
+    return text, estimate_tokens(text)
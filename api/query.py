@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from .utils import convert_to_enum_name
+
+class EnumIndex:
+    '''
+    Maps the normalised enum name of every category in a categorical column to its integer code,
+    so that enum preference lists can be matched against the column's codes without touching the strings.
+    '''
+    def __init__(self, categories):
+        self.codes = {convert_to_enum_name(c): i for i, c in enumerate(categories)}
+        self.size = len(categories)
+
+    def code_set(self, values) -> np.ndarray:
+        '''
+        Resolves a list of enum members or values to a boolean lookup table over the codes.
+        The extra last slot stands for missing values (code -1) and is never selected.
+        '''
+        selected = np.zeros(self.size + 1, dtype=bool)
+        for v in values:
+            code = self.codes.get(getattr(v, "name", None) or convert_to_enum_name(v))
+            if code is not None:
+                selected[code] = True
+        return selected
+
+@lru_cache(maxsize=None)
+def enum_index(dtype: pd.CategoricalDtype) -> EnumIndex:
+    return EnumIndex(dtype.categories)
+
+class SortedIndex:
+    '''
+    Presorted copy of a numeric column. Missing values sort to the end and never satisfy a bound,
+    the same way a pandas comparison against NaN is always False.
+    order and sorted_values may be given precomputed, e.g. mapped from a catalog snapshot.
+    '''
+    def __init__(self, values: np.ndarray, order: np.ndarray = None, sorted_values: np.ndarray = None):
+        self.values = values
+        self.order = order if order is not None else np.argsort(values, kind="stable")
+        self.sorted = sorted_values if sorted_values is not None else values[self.order]
+        self.valid = len(values) - int(np.isnan(values).sum()) if values.dtype.kind == "f" else len(values)
+
+    def cast(self, bound):
+        '''
+        Casts a bound to the column's dtype, so float32 columns are compared in float32 just like pandas does.
+        '''
+        if self.values.dtype.kind == "f":
+            with np.errstate(over="ignore"):
+                return self.values.dtype.type(bound)
+        return bound
+
+    def bounds(self, lo=None, hi=None) -> tuple:
+        '''
+        Returns the [start, stop) slice of the sorted order holding every value with lo <= value <= hi.
+        '''
+        sorted_values = self.sorted[:self.valid]
+        start = int(np.searchsorted(sorted_values, self.cast(lo), side="left")) if lo is not None else 0
+        stop = int(np.searchsorted(sorted_values, self.cast(hi), side="right")) if hi is not None else self.valid
+        return start, max(start, stop)
+
+    def mask(self, rows: np.ndarray, lo=None, hi=None) -> np.ndarray:
+        values = self.values[rows]
+        mask = np.ones(len(rows), dtype=bool)
+        if lo is not None:
+            mask &= values >= self.cast(lo)
+        if hi is not None:
+            mask &= values <= self.cast(hi)
+        return mask
+
+class CodeIndex:
+    '''
+    Category codes of an enum column, along with how many rows hold each code.
+    '''
+    def __init__(self, series: pd.Series):
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype("category")
+        self.enum = enum_index(series.dtype)
+        # the categorical's own codes rather than series.cat.codes, which is a copy
+        self.codes = series.array.codes
+        self.counts = np.bincount(self.codes + 1, minlength=self.enum.size + 1)
+
+    def count(self, selected: np.ndarray) -> int:
+        # counts are shifted by one so that missing values (code -1) land in slot 0
+        return int(self.counts[1:][selected[:-1]].sum())
+
+class TableIndex:
+    '''
+    Query engine over a single table.
+    Range predicates are answered from presorted column indexes and enum predicates from category codes:
+    the most selective predicate picks the candidate rows, and only those rows are checked against the rest.
+    '''
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.ranges = {}
+        self.enums = {}
+
+    def build(self, orders: dict = None, sorted_values: dict = None):
+        '''
+        Builds the index of every numeric and categorical column up front, rather than on first use.
+        orders and sorted_values optionally give the presorted order and values of numeric columns,
+        e.g. from a catalog snapshot.
+        '''
+        for col in self.df.columns:
+            dtype = self.df[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                self.enum(col)
+            elif pd.api.types.is_numeric_dtype(dtype):
+                self.range(col, (orders or {}).get(col), (sorted_values or {}).get(col))
+        return self
+
+    def range(self, col: str, order: np.ndarray = None, sorted_values: np.ndarray = None) -> SortedIndex:
+        if col not in self.ranges:
+            self.ranges[col] = SortedIndex(self.df[col].to_numpy(), order, sorted_values)
+        return self.ranges[col]
+
+    def enum(self, col: str) -> CodeIndex:
+        if col not in self.enums:
+            self.enums[col] = CodeIndex(self.df[col])
+        return self.enums[col]
+
+    def select(self, ranges=(), enums=()) -> np.ndarray:
+        '''
+        Input:
+        - ranges: (column, lo, hi) tuples, keeping rows with lo <= value <= hi (None for an open end)
+        - enums: (column, values) tuples, keeping rows whose normalised value is one of values
+
+        Output:
+        - positions of the matching rows, in table order
+        '''
+        n = len(self.df)
+        predicates = []
+
+        for col, lo, hi in ranges:
+            index = self.range(col)
+            start, stop = index.bounds(lo, hi)
+            # a predicate every row satisfies is a no-op
+            if stop - start < n:
+                predicates.append((stop - start, "range", col, (lo, hi, start, stop)))
+
+        for col, values in enums:
+            index = self.enum(col)
+            selected = index.enum.code_set(values)
+            count = index.count(selected)
+            if count < n:
+                predicates.append((count, "enum", col, selected))
+
+        if not predicates:
+            return np.arange(n)
+
+        predicates.sort(key=lambda p: p[0])
+        count, kind, col, args = predicates[0]
+        if count == 0:
+            return np.arange(0)
+
+        if kind == "range":
+            rows = self.ranges[col].order[args[2]:args[3]]
+        else:
+            rows = np.flatnonzero(args[self.enums[col].codes])
+
+        for _, kind, col, args in predicates[1:]:
+            if kind == "range":
+                rows = rows[self.ranges[col].mask(rows, args[0], args[1])]
+            else:
+                rows = rows[args[self.enums[col].codes[rows]]]
+
+        return np.sort(rows)
+
+    def filter(self, ranges=(), enums=(), limit=None) -> pd.DataFrame:
+        '''
+        Same as select, but returns the matching rows with their original index as the item_id column.
+        With a limit, only the first limit matching rows are ever taken out of the table.
+        '''
+        return self.take(self.select(ranges, enums)[:limit])
+
+    def take(self, rows: np.ndarray) -> pd.DataFrame:
+        '''
+        Returns the rows at the given positions, with their original index as the item_id column.
+        '''
+        return self.df.iloc[rows].reset_index(drop=False).rename(columns={"index": "item_id"})
@@ -1,19 +1,35 @@
+import copy
 import json
-import instructor 
-from groq import Groq
+import time
+import asyncio
+import contextvars
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pydantic import BaseModel
-from .extraction import get_requirements
+from .extraction import get_requirements, aget_requirements, normalise_message
 from .filters import *
 from .config import *
+from .catalog import current, pinned, on_reload
+from .prompt import encode_candidates, estimate_tokens
+from .search import find_pins
+from .builds import best_builds
+from .rules import read_budget
+from .llm import client, aclient
+from .cache import LRUCache, make_key
+from .limits import RateLimiter
+from . import metrics
 
-client = Groq(api_key=GROQ_KEY)
-client = instructor.from_groq(client, mode=instructor.Mode.JSON)
+# filtering is CPU-bound, so the async path runs it here rather than on the event loop
+executor = ThreadPoolExecutor(max_workers=FILTER_WORKERS, thread_name_prefix="filters")
 
-cpu_df = pd.read_csv(data_path / "cpu.csv")
-cooler_df = pd.read_csv(data_path / "cooler.csv")
-storage_df = pd.read_csv(data_path / "storage.csv")
-memory_df = pd.read_csv(data_path / "memory.csv")
-motherboard_df = pd.read_csv(data_path / "motherboard.csv")
+recommendation_cache = LRUCache(maxsize=RECOMMENDATION_CACHE_SIZE)
+metrics.register_cache("recommendation", recommendation_cache)
+
+# picks from an older catalog can never be hit again once a new one is in, so don't keep them around
+on_reload(lambda catalog: recommendation_cache.clear())
+
+# shared by every batch, so concurrent batches don't add up to more than the rate limit
+batch_rate_limiter = RateLimiter(BATCH_REQUESTS_PER_SECOND, burst=BATCH_CONCURRENCY)
 
 class Component(BaseModel):
     item_id: int
@@ -27,55 +43,527 @@ class ComponentChoices(BaseModel):
     memory: Component 
     motherboard: Component
 
-def get_filtered_csvs(message: str, limit: int):
-    cpu_requirements, cooler_requirements, storage_requirements, memory_requirements, motherboard_requirements = get_requirements(message=message).values()
+def get_candidates(requirements: dict, limit: int, pins: dict = None):
+    '''
+    Filters every component table against its requirements and keeps the best limit rows of each,
+    scored on price/performance with weights derived from the requirements. Only rows on the first
+    PARETO_LEVELS Pareto frontiers of each table are considered.
+    CPUs, motherboards and memory are pre-joined, so that only mutually compatible parts are offered.
+    Rows are only ever taken out of the shared catalog tables as the final limit rows, never as a full copy.
+    Falls back to the best rows of the whole table when nothing matches.
+    pins optionally gives component name -> rows the user asked for by name, which replace the filtered rows of that table.
+    '''
+    catalog = current()
+    rows, rank = candidate_rows(catalog, requirements, limit, pins)
+    with metrics.span("take"):
+        return tuple(catalog.indexes[name].take(rank[name](rows[name], limit)) for name in QUERIES)
+
+def candidate_rows(catalog, requirements: dict, limit: int, pins: dict = None) -> tuple:
+    '''
+    The filtered rows of every table that get_candidates picks from, with CPUs, motherboards and memory already
+    joined down to their best limit compatible rows, along with the ranker of each table.
+    '''
+    rows, all_rows, rank = filtered_rows(catalog, requirements, pins)
+    with metrics.span("compatibility"):
+        rows = catalog.compatibility.join(rows, limit, all_rows, rank)
+    return rows, rank
+
+def filtered_rows(catalog, requirements: dict, pins: dict = None) -> tuple:
+    '''
+    The rows of every table its filters keep, along with the whole frontier and the ranker of each table.
+    Pinned rows that meet the requirements replace them, the best SEARCH_MAX_PINS by score; if none of the pins
+    do, the filters pick as usual, and if they keep nothing at all, the whole frontier is used.
+    '''
+    pins = pins or {}
+    rows, all_rows, rank = {}, {}, {}
+    for name, query in QUERIES.items():
+        all_rows[name] = catalog.frontier(name)
+        component_requirements = requirements.get(name)
+        with metrics.span(f"filter.{name}"):
+            rank[name] = catalog.scorers[name].ranker(component_requirements)
+            selected = catalog.indexes[name].select(*query(**component_requirements)) if component_requirements is not None else None
+            # "Crucial P3 Plus" names every size of it, but "4TB" still rules out the smaller ones
+            kept = np.asarray(pins.get(name, []), dtype=np.int64)
+            if len(kept) and component_requirements is not None:
+                kept = np.intersect1d(kept, catalog.indexes[name].select(*bounding(*query(**component_requirements))))
+            if len(kept):
+                rows[name] = rank[name](kept, SEARCH_MAX_PINS)
+            else:
+                # anything a filter keeps off the frontier, it keeps something on it that is at least as good
+                rows[name] = catalog.frontier(name, selected) if selected is not None else []
+        if len(rows[name]) == 0:
+            metrics.empty_filters.inc(component=name)
+            rows[name] = all_rows[name]
+
+    return rows, all_rows, rank
+
+async def aget_candidates(requirements: dict, limit: int, pins: dict = None):
+    '''
+    Runs get_candidates on the filter threads, in the caller's context so its stages are timed with the request.
+    '''
+    return await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, get_candidates, requirements, limit, pins)
+
+def message_pins(message: str) -> dict:
+    '''
+    The parts the message names outright, to be offered in place of whatever the filters would pick.
+    '''
+    with metrics.span("search"):
+        return find_pins(current(), message)
 
-    cpu_filtered = filter_cpu(cpu_df.copy(), **cpu_requirements).head(limit) if cpu_requirements is not None else []
-    cooler_filtered = filter_cooler(cooler_df.copy(), **cooler_requirements).head(limit) if cooler_requirements is not None else []
-    storage_filtered = filter_storage(storage_df.copy(), **storage_requirements).head(limit) if storage_requirements is not None else []
-    memory_filtered = filter_memory(memory_df.copy(), **memory_requirements).head(limit) if memory_requirements is not None else []
-    motherboard_filtered = filter_motherboard(motherboard_df.copy(), **motherboard_requirements).head(limit) if motherboard_requirements is not None else []
+def get_builds(requirements: dict, budget: float = None, k: int = BUILD_SHORTLIST, pins: dict = None) -> list:
+    '''
+    The k best compatible builds within budget, made from the rows the filters keep.
+    Each build is (score, total price, component name -> row), see api/builds.py.
+    '''
+    catalog = current()
+    rows, _, _ = filtered_rows(catalog, requirements, pins)
+    with metrics.span("builds"):
+        return best_builds(catalog, rows, requirements, budget, k, BUILD_POOL_SIZE)
+
+def planned_builds(message: str, requirements: dict, budget: float = None, pins: dict = None) -> list:
+    '''
+    The builds BUILD_MODE has the optimiser contribute: none when it is off, or when it only shortlists and there is
+    no total budget, given or read off the message; else the best build (for "final") or the best BUILD_SHORTLIST.
+    '''
+    if BUILD_MODE == "off":
+        return []
+    if budget is None:
+        budget = read_budget(message)
+    if BUILD_MODE == "shortlist" and budget is None:
+        return []
+    return get_builds(requirements, budget, 1 if BUILD_MODE == "final" else BUILD_SHORTLIST, pins)
+
+def build_choices(build: tuple) -> dict:
+    '''
+    A build in the same form as the model's pick, component name -> {item_id, name, price}.
+    '''
+    catalog = current()
+    _, _, parts = build
+    return {
+        name: {"item_id": int(catalog[name].index[parts[name]]), "name": catalog[name]["title"].iloc[parts[name]], "price": round(float(catalog[name]["price"].iloc[parts[name]]), 2)}
+        for name in QUERIES
+    }
+
+def shortlist_candidates(builds: list) -> tuple:
+    '''
+    Just the parts of the builds as the candidate tables, in the order the builds first use them.
+    '''
+    catalog = current()
+    return tuple(catalog.indexes[name].take(np.array(list(dict.fromkeys(parts[name] for _, _, parts in builds)), dtype=np.int64)) for name in QUERIES)
+
+async def aget_builds(message: str, budget: float = None, k: int = BUILD_SHORTLIST) -> list:
+    '''
+    The k best builds for the message within budget (by default, the one read off the message, if any),
+    as [{"components": ..., "total_price": ..., "score": ...}], best first.
+    '''
+    with pinned():
+        requirements = await aget_requirements(message=message)
+        if budget is None:
+            budget = read_budget(message)
+        builds = await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, get_builds, requirements, budget, k, message_pins(message))
+        return [build_record(build) for build in builds]
+
+def build_record(build: tuple) -> dict:
+    return {"components": build_choices(build), "total_price": build[1], "score": build[0]}
+
+def get_filtered_csvs(message: str, limit: int):
+    with pinned():
+        return get_candidates(get_requirements(message=message), limit=limit, pins=message_pins(message))
 
-    if len(cpu_filtered) == 0:
-        cpu_filtered = cpu_df.copy().head(limit)
-    if len(cooler_filtered) == 0:
-        cooler_filtered = cooler_df.copy().head(limit)
-    if len(storage_filtered) == 0:
-        storage_filtered = storage_df.copy().head(limit)
-    if len(memory_filtered) == 0:
-        memory_filtered = memory_df.copy().head(limit)
-    if len(motherboard_filtered) == 0:
-        motherboard_filtered = motherboard_df.copy().head(limit)
+async def aget_filtered_csvs(message: str, limit: int):
+    with pinned():
+        requirements = await aget_requirements(message=message)
+        return await aget_candidates(requirements, limit, message_pins(message))
 
-    return cpu_filtered, cooler_filtered, storage_filtered, memory_filtered, motherboard_filtered
+def encode_builds(builds: list) -> str:
+    '''
+    One line per build, e.g. "1. cpu 12, cooler 40, storage 7, memory 301, motherboard 88: $912.45 in total".
+    '''
+    catalog = current()
+    lines = []
+    for i, (_, price, parts) in enumerate(builds, 1):
+        ids = ", ".join(f"{name} {catalog[name].index[parts[name]]}" for name in QUERIES)
+        lines.append(f"{i}. {ids}: ${price:.2f} in total")
+    return "\n".join(lines)
 
-def get_recommendation(message: str, model: str):
-    system_prompt = """You are tasked with recommending a compatible and high-performance PC setup. You are given five JSON arrays, consisting of details of CPUs, coolers, storage hard drives, memory modules, and motherboards. From the list, choose only ONE component from each array, ensuring compatibility across all components that it meets the user's expectation and preference based on their input. For each component, output the name, as well as its item ID. You must only select from the given options. Do not invent anything new."""
+def build_messages(message: str, requirements: dict, candidates: tuple, builds: list = None):
+    '''
+    Builds the recommendation prompt, returning the messages along with their estimated token count.
+    With builds from the optimiser, the candidates are their parts, and the builds are listed for the model to pick from.
+    '''
+    system_prompt = """You are tasked with recommending a compatible and high-performance PC setup. You are given five CSV tables, consisting of details of CPUs, coolers, storage hard drives, memory modules, and motherboards, each with the best options first. From the list, choose only ONE component from each table, ensuring compatibility across all components that it meets the user's expectation and preference based on their input. Every CPU fits at least one of the motherboards, and every motherboard takes at least one of the memory kits, but make sure the ones you pick fit each other. For each component, output its title as the name, as well as its item ID and price. You must only select from the given options. Do not invent anything new."""
 
-    cpu_filtered, cooler_filtered, storage_filtered, memory_filtered, motherboard_filtered = get_filtered_csvs(message=message, limit=10)
+    with metrics.span("prompt"):
+        options, _ = encode_candidates(dict(zip(QUERIES, candidates)), requirements, PROMPT_TOKEN_BUDGET)
 
     user_prompt = f"""The user inputted: {message}
 
-    Here are the component options:
-    CPUs: {json.dumps(cpu_filtered.reset_index().to_dict(orient="records"))}
-    Coolers: {json.dumps(cooler_filtered.reset_index().to_dict(orient="records"))}
-    Storage: {json.dumps(storage_filtered.reset_index().to_dict(orient="records"))}
-    Memory: {json.dumps(memory_filtered.reset_index().to_dict(orient="records"))}
-    Motherboard: {json.dumps(motherboard_filtered.reset_index().to_dict(orient="records"))}
-    """
+Here are the component options:
+
+{options}
+"""
+    if builds:
+        system_prompt += """ The complete builds listed after the options fit together and within the user's total budget, best first by item ID. Pick one of them unless the user's input clearly calls for another combination of the options."""
+        user_prompt += f"""
+Complete builds within the budget:
+
+{encode_builds(builds)}
+"""
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+    metrics.prompt_tokens.observe(tokens)
+    return messages, tokens
+
+def recommendation_key(requirements: dict, candidates: tuple, model: str, builds: list = None) -> str:
+    '''
+    Canonical hash of everything the final pick is based on: the extracted requirements, the candidates
+    and builds offered, the model and the catalog version. Keys from an older catalog never match again once it is replaced.
+    '''
+    return make_key(requirements, [df["item_id"].tolist() for df in candidates], model, current().version, builds or [])
+
+def choose_components(message: str, requirements: dict, candidates: tuple, model: str, builds: list = None):
+    '''
+    Asks the model to pick one component of each table from the candidates (or one of the builds), unless the same pick is cached.
+    '''
+    key = recommendation_key(requirements, candidates, model, builds)
+    cached = recommendation_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    messages, tokens = build_messages(message, requirements, candidates, builds)
+
+    print(f"Sent request to {model} (~{tokens} prompt tokens)...")
+
+    try:
+        with metrics.span("recommendation"):
+            recommendation = client.chat.completions.create(
+                model=model,
+                response_model=ComponentChoices,
+                messages=messages
+            ).model_dump()
+    except Exception:
+        metrics.llm_calls.inc(purpose="recommendation", outcome="error")
+        raise
+    metrics.llm_calls.inc(purpose="recommendation", outcome="ok")
+
+    recommendation_cache.set(key, recommendation)
+    return copy.deepcopy(recommendation)
+
+async def achoose_components(message: str, requirements: dict, candidates: tuple, model: str, builds: list = None):
+    '''
+    Async version of choose_components.
+    '''
+    key = recommendation_key(requirements, candidates, model, builds)
+    cached = recommendation_cache.get(key)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    messages, tokens = build_messages(message, requirements, candidates, builds)
+
+    print(f"Sent request to {model} (~{tokens} prompt tokens)...")
+
+    try:
+        with metrics.span("recommendation"):
+            recommendation = await aclient.chat.completions.create(
+                model=model,
+                response_model=ComponentChoices,
+                messages=messages
+            )
+    except Exception:
+        metrics.llm_calls.inc(purpose="recommendation", outcome="error")
+        raise
+    metrics.llm_calls.inc(purpose="recommendation", outcome="ok")
+
+    recommendation = recommendation.model_dump()
+    recommendation_cache.set(key, recommendation)
+    return copy.deepcopy(recommendation)
+
+def get_recommendation(message: str, model: str, budget: float = None):
+    '''
+    Picks one component of each table for the message. budget is the most the whole build may cost,
+    by default read off the message; with BUILD_MODE on, the optimiser's builds within it are the candidates,
+    or its best build is the answer.
+    '''
+    with pinned():
+        requirements = get_requirements(message=message)
+        pins = message_pins(message)
+        builds = planned_builds(message, requirements, budget, pins)
+        if builds and BUILD_MODE == "final":
+            return build_choices(builds[0])
+        candidates = shortlist_candidates(builds) if builds else get_candidates(requirements, limit=10, pins=pins)
+        return choose_components(message, requirements, candidates, model, builds)
+
+async def aget_recommendation(message: str, model: str, budget: float = None):
+    '''
+    Async version of get_recommendation.
+    '''
+    with pinned():
+        requirements = await aget_requirements(message=message)
+        pins = message_pins(message)
+        builds = await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, planned_builds, message, requirements, budget, pins)
+        if builds and BUILD_MODE == "final":
+            return build_choices(builds[0])
+        candidates = shortlist_candidates(builds) if builds else await aget_candidates(requirements, 10, pins)
+        return await achoose_components(message, requirements, candidates, model, builds)
+
+def get_candidates_batch(requirement_sets: list, limit: int, pin_sets: list = None, return_exceptions: bool = False) -> list:
+    '''
+    Runs get_candidates for a whole batch in one pass, filtering each distinct requirement set (and set of pins) only once.
+    Returns the candidates of each requirement set, in order. With return_exceptions, a requirement set that fails
+    gets its exception in place of candidates, as with asyncio.gather, instead of failing the whole batch.
+    '''
+    unique = {}
+    pin_sets = pin_sets or [None] * len(requirement_sets)
+    keys = [make_key(requirements, pins) for requirements, pins in zip(requirement_sets, pin_sets)]
+    for key, requirements, pins in zip(keys, requirement_sets, pin_sets):
+        if key not in unique:
+            try:
+                unique[key] = get_candidates(requirements, limit, pins)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                unique[key] = e
+    return [unique[key] for key in keys]
+
+def batch_candidates(messages: list, requirement_sets: dict, items: list, budget: float = None) -> tuple:
+    '''
+    The builds (see planned_builds) and the candidates of the given items of a batch.
+    Items with builds get just their parts as candidates; the rest are filtered in one pass by get_candidates_batch.
+    Returns item -> (builds, candidates), and item -> exception for the items that failed, which the rest don't wait on.
+    '''
+    pins, builds, failed = {}, {}, {}
+    for i in items:
+        try:
+            pins[i] = message_pins(messages[i])
+            builds[i] = planned_builds(messages[i], requirement_sets[i], budget, pins[i])
+        except Exception as e:
+            failed[i] = e
+    unplanned = [i for i in items if i not in failed and not builds[i]]
+    filtered = dict(zip(unplanned, get_candidates_batch([requirement_sets[i] for i in unplanned], 10, [pins[i] for i in unplanned], return_exceptions=True)))
+
+    plans = {}
+    for i in items:
+        if i in failed:
+            continue
+        try:
+            candidates = shortlist_candidates(builds[i]) if builds[i] else filtered[i]
+            if isinstance(candidates, Exception):
+                raise candidates
+            plans[i] = (builds[i], candidates)
+        except Exception as e:
+            failed[i] = e
+    return plans, failed
+
+def batch_groups(messages: list, requirement_sets: list, candidate_sets: list, model: str, build_sets: list = None) -> dict:
+    '''
+    Groups the items of a batch that would send the model the same pick to make, so each pick is only made once.
+    Returns recommendation key -> (message, requirements, candidates, builds, item indices).
+    '''
+    groups = {}
+    build_sets = build_sets or [None] * len(messages)
+    for i, (message, requirements, candidates, builds) in enumerate(zip(messages, requirement_sets, candidate_sets, build_sets)):
+        key = recommendation_key(requirements, candidates, model, builds)
+        if key not in groups:
+            groups[key] = (message, requirements, candidates, builds, [])
+        groups[key][4].append(i)
+    return groups
+
+def iter_recommendations(messages: list, model: str, budget: float = None):
+    '''
+    Recommends a build for each of many messages, yielding (index, recommendation, error) as each item finishes.
+
+    Requirements are extracted BATCH_CONCURRENCY messages at a time (identical messages only once),
+    candidates are filtered for the whole batch in one pass, and the final picks are made
+    BATCH_CONCURRENCY at a time, no faster than BATCH_REQUESTS_PER_SECOND.
+    budget and BUILD_MODE apply to every item as they do in get_recommendation.
+    An item that fails comes back with its error instead of a recommendation; the rest of the batch carries on.
+    The whole batch is served from the catalog that was current when it started.
+    '''
+    # pinned around each step rather than across the yields, since a generator may be resumed or closed in another context;
+    # work handed to the pool carries the pin along in a copy of the context
+    catalog = current()
+    with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="batch") as pool:
+        # identical messages (up to case and whitespace) are only extracted once
+        unique = {}
+        for message in messages:
+            unique.setdefault(normalise_message(message), message)
+        with pinned(catalog):
+            futures = {key: pool.submit(contextvars.copy_context().run, get_requirements, message) for key, message in unique.items()}
+
+        requirement_sets, failed = {}, {}
+        for i, message in enumerate(messages):
+            try:
+                requirement_sets[i] = futures[normalise_message(message)].result()
+            except Exception as e:
+                failed[i] = e
+
+        for i, e in failed.items():
+            yield i, None, repr(e)
+
+        items = [i for i in range(len(messages)) if i not in failed]
+        with pinned(catalog):
+            plans, failed = batch_candidates(messages, requirement_sets, items, budget)
+        for i, e in failed.items():
+            yield i, None, repr(e)
+
+        items = [i for i in items if i in plans]
+        if BUILD_MODE == "final":
+            # items with a build are answered with it, without asking the model
+            for i in items:
+                if plans[i][0]:
+                    with pinned(catalog):
+                        choices = build_choices(plans[i][0][0])
+                    yield i, choices, None
+            items = [i for i in items if not plans[i][0]]
+
+        def choose(message, requirements, candidates, builds):
+            time.sleep(batch_rate_limiter.delay())
+            return choose_components(message, requirements, candidates, model, builds)
+
+        with pinned(catalog):
+            groups = batch_groups([messages[i] for i in items], [requirement_sets[i] for i in items], [plans[i][1] for i in items], model, [plans[i][0] for i in items])
+            futures = {pool.submit(contextvars.copy_context().run, choose, *group[:4]): group[4] for group in groups.values()}
+        for future in as_completed(futures):
+            try:
+                recommendation, error = future.result(), None
+            except Exception as e:
+                recommendation, error = None, repr(e)
+            for j in futures[future]:
+                yield items[j], copy.deepcopy(recommendation), error
+
+def get_recommendations(messages: list, model: str, budget: float = None) -> list:
+    '''
+    Same as iter_recommendations, but waits for the whole batch and returns one result per message, in order.
+    '''
+    results = [None] * len(messages)
+    for i, recommendation, error in iter_recommendations(messages, model, budget):
+        results[i] = {"recommendation": recommendation, "error": error}
+    return results
+
+async def abatch_recommendations(messages: list, model: str, budget: float = None):
+    '''
+    Async version of iter_recommendations.
+    '''
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    # pinned around each step, as in iter_recommendations; tasks and the executor get a copy of the pinned context
+    catalog = current()
+
+    async def extract(message):
+        async with semaphore:
+            return await aget_requirements(message=message)
+
+    unique = {}
+    for message in messages:
+        unique.setdefault(normalise_message(message), message)
+    with pinned(catalog):
+        extractions = asyncio.gather(*(extract(m) for m in unique.values()), return_exceptions=True)
+    extracted = dict(zip(unique, await extractions))
+
+    requirement_sets, items = {}, []
+    for i, message in enumerate(messages):
+        requirements = extracted[normalise_message(message)]
+        if isinstance(requirements, Exception):
+            yield i, None, repr(requirements)
+        else:
+            requirement_sets[i] = requirements
+            items.append(i)
+
+    with pinned(catalog):
+        planning = asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, batch_candidates, messages, requirement_sets, items, budget)
+    plans, failed = await planning
+    for i, e in failed.items():
+        yield i, None, repr(e)
+
+    items = [i for i in items if i in plans]
+    if BUILD_MODE == "final":
+        for i in items:
+            if plans[i][0]:
+                with pinned(catalog):
+                    choices = build_choices(plans[i][0][0])
+                yield i, choices, None
+        items = [i for i in items if not plans[i][0]]
+    with pinned(catalog):
+        groups = batch_groups([messages[i] for i in items], [requirement_sets[i] for i in items], [plans[i][1] for i in items], model, [plans[i][0] for i in items])
+
+    async def choose(message, requirements, candidates, builds, indices):
+        async with semaphore:
+            await asyncio.sleep(batch_rate_limiter.delay())
+            try:
+                return indices, await achoose_components(message, requirements, candidates, model, builds), None
+            except Exception as e:
+                return indices, None, repr(e)
+
+    with pinned(catalog):
+        # tasks made here copy the pinned context
+        choices = [asyncio.ensure_future(choose(*group)) for group in groups.values()]
+    for task in asyncio.as_completed(choices):
+        indices, recommendation, error = await task
+        for j in indices:
+            yield items[j], copy.deepcopy(recommendation), error
+
+async def astream_recommendation(message: str, model: str, budget: float = None):
+    '''
+    Runs the same pipeline as aget_recommendation, yielding (stage, result) as soon as each stage is ready:
+    - "requirements": the extracted requirements
+    - "builds": the optimiser's builds, as aget_builds gives them, if BUILD_MODE has it contribute any
+    - "candidates": component name -> candidate table
+    - "partial": the component choices so far, as the model writes them
+    - "choices": the final component choices
+    '''
+    # pinned between yields only, as in iter_recommendations
+    catalog = current()
+    with pinned(catalog):
+        requirements = await aget_requirements(message=message)
+    yield "requirements", requirements
+
+    with pinned(catalog):
+        pins = message_pins(message)
+        builds = await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, planned_builds, message, requirements, budget, pins)
+    if builds:
+        yield "builds", [build_record(build) for build in builds]
+        if BUILD_MODE == "final":
+            with pinned(catalog):
+                choices = build_choices(builds[0])
+            yield "choices", choices
+            return
+
+    with pinned(catalog):
+        candidates = shortlist_candidates(builds) if builds else await aget_candidates(requirements, 10, pins)
+        key = recommendation_key(requirements, candidates, model, builds)
+    yield "candidates", dict(zip(QUERIES, candidates))
+
+    cached = recommendation_cache.get(key)
+    if cached is not None:
+        yield "choices", copy.deepcopy(cached)
+        return
+
+    messages, tokens = build_messages(message, requirements, candidates, builds)
 
-    print(f"Sent request to {model}...")
+    print(f"Sent streaming request to {model} (~{tokens} prompt tokens)...")
 
-    recommendation = client.chat.completions.create(
-        model=model,
-        response_model=ComponentChoices,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    ).model_dump()
+    partial = None
+    try:
+        with metrics.span("recommendation"):
+            async for partial in aclient.chat.completions.create_partial(
+                model=model,
+                response_model=ComponentChoices,
+                messages=messages
+            ):
+                yield "partial", partial.model_dump()
+        if partial is None:
+            raise ValueError(f"{model} streamed back no component choices")
+    except Exception:
+        metrics.llm_calls.inc(purpose="recommendation", outcome="error")
+        raise
+    metrics.llm_calls.inc(purpose="recommendation", outcome="ok")
 
-    return recommendation
+    recommendation = ComponentChoices.model_validate(partial.model_dump()).model_dump()
+    recommendation_cache.set(key, recommendation)
+    yield "choices", copy.deepcopy(recommendation)
 
 if __name__ == "__main__":
-    print(get_recommendation(message=TEST_MESSAGE, model=MODEL))
\ No newline at end of file
+    print(get_recommendation(message=TEST_MESSAGE, model=MODEL))
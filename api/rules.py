@@ -0,0 +1,397 @@
+'''
+Deterministic requirement extraction for messages that spell their requirements out, like
+"at least 1 TB of storage", "16 GB of RAM", "under $150 for the CPU" or "AM5".
+Numbers are read with their units and bounds, and tied to the part named nearest to them in the same clause;
+enum values are matched against the catalog's own value lists.
+
+Alongside the requirements comes a confidence: the share of the message's requirement cues the rules
+could place in a field. Cues they can't place, like a budget for the whole build (see read_budget), a use like "gaming"
+or "quiet" that the model would turn into requirements, a negation, or a stray number, count against it,
+and so does every sentence they read nothing in, like "I'm a storyboard animator", which may still imply something.
+Cheap and fast are left out, since the candidates are ranked on price and performance anyway.
+'''
+import re
+import bisect
+from .catalog import current, per_catalog
+from .components import requirement_models, COMPONENT_MODELS, RequirementModels
+
+SENTENCE_BREAKS = r"[.!?;](?:\s|$)|\n"
+# clauses end at sentence punctuation and at conjunctions, so "1 TB of storage as well as 16 GB of RAM" is two
+CLAUSE_BREAKS = re.compile(SENTENCE_BREAKS + r"|,(?!\d)|\b(?:and|as well as|but|plus|also|while)\b")
+
+# words naming each part; numbers like "16 GB" or "$150" belong to the part named nearest to them
+COMPONENT_WORDS = {
+    "cpu": r"cpus?|processors?",
+    "cooler": r"coolers?|cooling|fans?|aio|radiators?|heatsinks?",
+    "storage": r"storage|ssds?|hdds?|drives?|disks?|nvme",
+    "memory": r"ram|memory|ddr[345]|dimms?|sticks?",
+    "motherboard": r"motherboards?|mobos?|mainboards?|boards?",
+}
+COMPONENT_PATTERN = re.compile(r"\b(?=[a-z])(?:" + "|".join(rf"(?P<{name}>{words})\b" for name, words in COMPONENT_WORDS.items()) + ")")
+
+NUMBER = r"(\d+(?:,\d{3})*(?:\.\d+)?)"
+
+# kind of quantity -> pattern, with the number in the first group that matched; tried in this order
+QUANTITIES = {
+    "kit": re.compile(r"\b(\d+)\s*x\s*(\d+)\s*gb\b"),
+    "price_per_gb": re.compile(rf"\${NUMBER}\s*(?:per|/|a)\s*gb\b"),
+    "price": re.compile(rf"\$\s*{NUMBER}|\b{NUMBER}\s*(?:dollars|usd|bucks)\b"),
+    "capacity": re.compile(rf"\b{NUMBER}\s*(tb|gb)\b"),
+    "cores": re.compile(r"\b(\d+)[\s-]*cores?\b"),
+    "ghz": re.compile(rf"\b{NUMBER}\s*ghz\b"),
+    "mhz": re.compile(r"\b(\d{3,5})\s*mhz\b|\bddr[345][\s-]*(\d{4})\b"),
+    "cas": re.compile(r"\bcl\s*(\d+)\b|\bcas(?:\s*latency)?(?:\s*of)?\s*(\d+)\b"),
+    "watts": re.compile(r"\b(\d+)\s*(?:w|watts?)\b"),
+    "db": re.compile(rf"\b{NUMBER}\s*dba?\b"),
+    "rpm": re.compile(r"\b(\d+)\s*rpm\b"),
+    "mm": re.compile(r"\b(\d{3})\s*mm\b"),
+    "slots": re.compile(r"\b(\d)\s*(?:ram\s+|memory\s+|dimm\s+)?slots?\b"),
+    "modules": re.compile(r"\b(\d)\s*(?:sticks|modules|dimms)\b"),
+}
+
+# quantity kind -> the field it fills, for kinds that only one part has
+FIELDS = {
+    "price_per_gb": ("storage", "max_price_per_gb"),
+    "cores": ("cpu", "min_cores"),
+    "mhz": ("memory", "min_speed_mhz"),
+    "cas": ("memory", "max_cas_latency"),
+    "db": ("cooler", "max_noise_level_db"),
+    "rpm": ("cooler", "min_fan_rpm"),
+    "slots": ("motherboard", "min_memory_slots"),
+    "modules": ("memory", "max_module_count"),
+}
+
+# capacities and prices go to whichever part is named nearest; parts missing here have no such field
+CAPACITY_FIELDS = {"storage": "min_capacity_gb", "memory": "min_capacity_gb", "motherboard": "min_max_memory_gb"}
+PRICE_FIELDS = {"cpu": "max_price", "cooler": "max_price", "memory": "max_price", "motherboard": "max_price"}
+
+# words before a number saying which way it bounds
+MIN_WORDS = re.compile(r"\b(?:at least|min(?:imum)?|(?<!no )more than|over|above|upwards of|no less than)\s*\$?\s*$")
+MAX_WORDS = re.compile(r"\b(?:under|below|less than|at most|max(?:imum)?|no more than|up to|cheaper than|within|budget(?: of)?|quieter than)\s*\$?\s*$")
+
+# words for the whole build; a price after one of these is its budget, unless a part is named in between or right after it
+BUILD_WORDS = re.compile(r"\b(?:pcs?|computers?|builds?|rigs?|setups?|workstations?|budget|total|overall)\b")
+# "for $800" closing a clause of a sentence about the whole build, as in "a PC with 16 GB of RAM and 1 TB storage for $800"
+CLOSING_PRICE = re.compile(r"\bfor(?:\s+(?:about|around|roughly|under|below|less than|at most))?\s*$")
+
+# "no more than" and "no less than" are bounds, not negations
+NEGATION = re.compile(r"\b(?:no(?!\s+(?:more|less)\s+than\b)|not|never|without|except|avoid|instead of)\b|n't\b")
+
+# things the model would turn into requirements, but the rules can't
+VAGUE = re.compile(
+    r"\b(?:gam(?:e|es|ing)|edit(?:ing|or)?|render(?:ing)?|stream(?:ing)?|video|3d|cad|machine learning|workstation|server"
+    r"|compact|small|tiny|mini|quiet|silent|noise|noisy|lots of|plenty of|a lot of|large|big|huge|overclock(?:ing)?"
+    r"|future[\s-]?proof|upgrad(?:e|able)|amd|intel)\b"
+)
+
+# sentences shorter than this, like "thanks!", are taken to ask for nothing when the rules read nothing in them
+MIN_SENTENCE_WORDS = 4
+
+# the words, numbers and symbols ("AM3+", '2.5"') enum values are told apart by; "LGA1700" is "lga", "1700"
+TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)?|[+\"]")
+# what may stand between the tokens of one phrase, as in "micro atx", "micro-atx", "m.2" or "lga1700"
+JOINERS = {"", " ", "-", "."}
+
+def tokens(text: str) -> tuple:
+    return tuple(TOKEN.findall(text.lower()))
+
+class Phrases:
+    '''
+    Every way of naming the enum values of a catalog in a message, as a sequence of tokens,
+    along with the field it fills and the values it stands for.
+    '''
+    def __init__(self, enum_values: dict):
+        self.phrases = {}
+
+        for value in enum_values["cpu_microarchitectures"]:
+            # "core" is as often a count of cores as Intel's old microarchitecture
+            if value != "Core":
+                self.add("cpu", "microarchitecture", [value], [value])
+
+        sockets = [v for v in enum_values["motherboard_sockets"] if not v.startswith(("Integrated", "2 x"))]
+        for socket in sorted({s for v in sockets for s in v.split("/")}):
+            self.add("motherboard", "preferred_socket", [socket], [v for v in sockets if socket in v.split("/")])
+
+        aliases = {"Micro ATX": ["matx", "m-atx", "microatx", "uatx"], "Mini ITX": ["itx", "miniitx"], "EATX": ["e-atx"]}
+        for value in enum_values["motherboard_form_factors"]:
+            self.add("motherboard", "preferred_form_factor", [value] + aliases.get(value, []), [value])
+
+        types = enum_values["storage_types"]
+        spinning = [v for v in types if v.endswith("RPM")]
+        for value in spinning:
+            self.add("storage", "preferred_type", [value], [value])
+        self.add("storage", "preferred_type", ["ssd", "ssds"], [v for v in types if v == "SSD"])
+        self.add("storage", "preferred_type", ["hdd", "hdds", "hard drive", "hard drives", "hard disk", "hard disks", "spinning"], spinning)
+        self.add("storage", "preferred_type", ["sshd", "sshds", "hybrid"], [v for v in types if v == "Hybrid"])
+
+        forms = enum_values["storage_form_factors"]
+        for value in forms:
+            if value.startswith("M.2-"):
+                self.add("storage", "preferred_form_factor", [value, value[4:]], [value])
+        self.add("storage", "preferred_form_factor", ["m.2"], [v for v in forms if v.startswith("M.2")])
+        for size in ("2.5", "3.5"):
+            self.add("storage", "preferred_form_factor", [f'{size}"', f"{size} inch", f"{size} inches", f"{size}in"], [v for v in forms if v == f'{size}"'])
+        self.add("storage", "preferred_form_factor", ["msata"], [v for v in forms if v == "mSATA"])
+
+        interfaces = enum_values["storage_interfaces"]
+        self.add("storage", "preferred_interface", ["nvme", "pcie"], [v for v in interfaces if "PCIe" in v])
+        for gen in ("2.0", "3.0", "4.0", "5.0"):
+            self.add("storage", "preferred_interface", [f"pcie {gen}", f"pcie {gen[0]}", f"gen {gen[0]}"], [v for v in interfaces if f"PCIe {gen}" in v])
+        self.add("storage", "preferred_interface", ["sata"], [v for v in interfaces if "SATA" in v and v != "mSATA"])
+        self.add("storage", "preferred_interface", ["sas"], [v for v in interfaces if v.startswith("SAS")])
+        self.add("storage", "preferred_interface", ["u.2"], [v for v in interfaces if v == "U.2"])
+
+        self.longest = max(map(len, self.phrases), default=0)
+        self.first = {key[0] for key in self.phrases}
+
+    def add(self, component: str, field: str, names: list, values: list):
+        # the first field a name is given to keeps it
+        if values:
+            for name in names:
+                self.phrases.setdefault(tokens(name), (component, field, values))
+
+    def find(self, text: str) -> list:
+        '''
+        The phrases in text, each as (start, end, component, field, values), the longest one first where they overlap,
+        so that "Micro ATX" is read as itself rather than as "ATX".
+        '''
+        # most messages name no enum value at all
+        if self.first.isdisjoint(TOKEN.findall(text)):
+            return []
+        words = [(m.start(), m.end(), m.group()) for m in TOKEN.finditer(text)]
+        found, i = [], 0
+        while i < len(words):
+            n = 0
+            if words[i][2] in self.first:
+                for n in range(min(self.longest, len(words) - i), 0, -1):
+                    hit = self.phrases.get(tuple(w for _, _, w in words[i:i + n]))
+                    if hit and all(text[words[j][1]:words[j + 1][0]] in JOINERS for j in range(i, i + n - 1)):
+                        found.append((words[i][0], words[i + n - 1][1], *hit))
+                        break
+                else:
+                    n = 0
+            i += max(n, 1)
+        return found
+
+@per_catalog
+def phrases_of(catalog) -> Phrases:
+    return Phrases(catalog.enum_values)
+
+# built for the first catalog here, and for each one after it before it is swapped in, never by a request
+phrases_of(current())
+
+def alternation(patterns: dict, first: str) -> re.Pattern:
+    '''
+    One pattern matching any of patterns, so a message is scanned once rather than once for each;
+    match.lastgroup is the key of the one that matched. first is a lookahead for how any of them can start,
+    so that most positions are passed over without trying every pattern.
+    '''
+    return re.compile(f"(?={first})(?:" + "|".join(f"(?P<{key}>{pattern})" for key, pattern in patterns.items()) + ")")
+
+# the same patterns with their groups made non-capturing, scanned for all at once
+QUANTITY_PATTERN = alternation({kind: re.sub(r"\((?!\?)", "(?:", pattern.pattern) for kind, pattern in QUANTITIES.items()}, r"[\d$]|cl|cas|ddr")
+
+def narrowest(value_sets: list) -> list:
+    '''
+    The values of every phrase found for one field, leaving out phrases that another one found narrows down,
+    so "PCIe 4.0 NVMe" means PCIe 4.0 rather than every PCIe drive.
+    '''
+    kept = [s for s in value_sets if not any(other < s for other in value_sets)]
+    return sorted(set().union(*kept))
+
+def first_number(match: re.Match) -> float:
+    return float(next(g for g in match.groups() if g is not None).replace(",", ""))
+
+class Reader:
+    '''
+    One pass of the rules over one message.
+    '''
+    def __init__(self, message: str, catalog):
+        self.text = message.lower()
+        self.catalog = catalog
+        self.taken = []
+        self.found = {name: {} for name in COMPONENT_MODELS}
+        self.enums = {}
+        self.mapped = 0
+        self.unmapped = 0
+
+        breaks = [m.start() for m in CLAUSE_BREAKS.finditer(self.text)]
+        self.clause_starts = [0] + [b + 1 for b in breaks]
+        self.sentence_starts = [0] + [m.start() + 1 for m in re.finditer(SENTENCE_BREAKS, self.text)]
+        self.components = [(m.start(), m.end(), m.lastgroup, self.clause(m.start())) for m in COMPONENT_PATTERN.finditer(self.text)]
+        self.negated = {self.clause(m.start()) for m in NEGATION.finditer(self.text)}
+        self.builds = [(m.end(), self.clause(m.start())) for m in BUILD_WORDS.finditer(self.text)]
+
+    def clause(self, position: int) -> int:
+        return bisect.bisect_right(self.clause_starts, position) - 1
+
+    def sentence(self, position: int) -> int:
+        return bisect.bisect_right(self.sentence_starts, position) - 1
+
+    def clause_text(self, position: int) -> str:
+        i = self.clause(position)
+        return self.text[self.clause_starts[i]:self.clause_starts[i + 1] if i + 1 < len(self.clause_starts) else None]
+
+    def take(self, start: int, end: int) -> bool:
+        # each stretch of the message is only read once, by the first rule that matches it
+        if any(start < e and s < end for s, e in self.taken):
+            return False
+        self.taken.append((start, end))
+        return True
+
+    def nearest_component(self, start: int, end: int):
+        clause = self.clause(start)
+        named = [(max(s - end, start - e, 0), name) for s, e, name, c in self.components if c == clause and not (s >= start and e <= end)]
+        return min(named)[1] if named else None
+
+    def bound(self, start: int, end: int):
+        before = self.text[max(self.clause_starts[self.clause(start)], start - 25):start]
+        after = self.text[end:end + 10]
+        if MIN_WORDS.search(before) or re.match(r"\s*(?:\+|or more|minimum)", after):
+            return "min"
+        if MAX_WORDS.search(before) or re.match(r"\s*(?:or less|max(?:imum)?)\b", after):
+            return "max"
+        return None
+
+    def after_build_word(self, start: int, end: int) -> bool:
+        clause = self.clause(start)
+        before = [e for e, c in self.builds if c == clause and e <= start]
+        return bool(before) and not any(
+            c == clause and (max(before) <= s < start or end <= s <= end + 2) for s, _, _, c in self.components
+        )
+
+    def closes_build(self, start: int, end: int) -> bool:
+        clause, sentence = self.clause(start), self.sentence(start)
+        return (
+            CLOSING_PRICE.search(self.text[self.clause_starts[clause]:start]) is not None
+            and any(self.sentence(e) == sentence and e <= start for e, _ in self.builds)
+            and not any(c == clause and s >= end for s, _, _, c in self.components)
+        )
+
+    def is_budget(self, match: re.Match) -> bool:
+        '''
+        Whether a price is for the whole build rather than a part: it has no part named next to it, follows a word
+        for the whole build, or closes a clause of a sentence about the whole build with "for $800".
+        Prices bounded from below ("at least $500") or negated aren't budgets.
+        '''
+        start, end = match.start(), match.end()
+        return (
+            (self.nearest_component(start, end) is None or self.after_build_word(start, end) or self.closes_build(start, end))
+            and self.bound(start, end) != "min"
+            and self.clause(start) not in self.negated
+        )
+
+    def place(self, match: re.Match, component: str, field: str, value):
+        '''
+        Puts a value in a field, unless its clause is negated, its bound goes the other way, or the field is taken.
+        '''
+        bound = self.bound(match.start(), match.end())
+        fields = self.found[component] if component else {}
+        if (
+            component is None or field is None
+            or self.clause(match.start()) in self.negated
+            or (bound is not None and not field.startswith(bound))
+            or field in fields and fields[field] != value
+        ):
+            self.unmapped += 1
+            return
+        fields[field] = value
+        self.mapped += 1
+
+    def read_enums(self):
+        for start, end, component, field, values in phrases_of(self.catalog).find(self.text):
+            if not self.take(start, end):
+                continue
+            if self.clause(start) in self.negated:
+                self.unmapped += 1
+                continue
+            self.enums.setdefault((component, field), []).append(set(values))
+            self.mapped += 1
+        for (component, field), value_sets in self.enums.items():
+            self.found[component][field] = narrowest(value_sets)
+
+    def read_quantities(self):
+        for match in QUANTITY_PATTERN.finditer(self.text):
+            if self.take(match.start(), match.end()):
+                # matched again on its own, for its groups
+                kind = match.lastgroup
+                self.read_quantity(kind, QUANTITIES[kind].match(self.text, match.start(), match.end()))
+
+    def read_quantity(self, kind: str, match: re.Match):
+        clause = self.clause_text(match.start())
+        nearest = self.nearest_component(match.start(), match.end())
+
+        if kind == "kit":
+            count, size = int(match.group(1)), float(match.group(2))
+            self.place(match, "memory", "min_capacity_gb", count * size)
+            self.place(match, "memory", "max_module_count", count)
+        elif kind in FIELDS:
+            self.place(match, *FIELDS[kind], first_number(match))
+        elif kind == "capacity":
+            gb = first_number(match) * (1000 if match.group(2) == "tb" else 1)
+            self.place(match, nearest, CAPACITY_FIELDS.get(nearest), gb)
+        elif kind == "price":
+            # a budget for the whole build isn't any one part's
+            self.place(match, None if self.is_budget(match) else nearest, PRICE_FIELDS.get(nearest), first_number(match))
+        elif kind == "ghz":
+            field = "min_boost_clock_ghz" if re.search(r"\b(?:boost|turbo)\b", clause) else "min_core_clock_ghz"
+            self.place(match, "cpu", field, first_number(match))
+        elif kind == "watts":
+            # watts could as well be a power supply's, so they need the CPU or its TDP named
+            named = nearest == "cpu" or re.search(r"\btdp\b", clause)
+            self.place(match, "cpu" if named else None, "max_tdp_watts", first_number(match))
+        elif kind == "mm":
+            named = nearest == "cooler"
+            self.place(match, "cooler" if named else None, "max_radiator_size_mm", first_number(match))
+
+    def read_leftovers(self):
+        for match in VAGUE.finditer(self.text):
+            if self.take(match.start(), match.end()):
+                self.unmapped += 1
+        for match in re.finditer(r"\d+", self.text):
+            if self.take(match.start(), match.end()):
+                self.unmapped += 1
+        read = {self.sentence(start) for start, _ in self.taken}
+        ends = self.sentence_starts[1:] + [len(self.text)]
+        for i, (start, end) in enumerate(zip(self.sentence_starts, ends)):
+            if i not in read and len(re.findall(r"\w+", self.text[start:end])) >= MIN_SENTENCE_WORDS:
+                self.unmapped += 1
+
+    def confidence(self) -> float:
+        return round(self.mapped / (self.mapped + self.unmapped), 3) if self.mapped else 0.0
+
+def extract_rules(message: str, models: RequirementModels = None) -> tuple:
+    '''
+    Reads the requirements of each component off the message with the rules above.
+
+    Output:
+    - the requirements, in the same form as the model's
+    - the confidence that they are all the message asks for, from 0 (nothing found) to 1 (every cue placed)
+    '''
+    reader = Reader(message, current())
+    reader.read_enums()
+    reader.read_quantities()
+    reader.read_leftovers()
+    requirements = (models or requirement_models()).pc.model_validate(reader.found).model_dump()
+    return requirements, reader.confidence()
+
+def found_fields(requirements: dict) -> dict:
+    '''
+    Just the fields of each component that are set.
+    '''
+    return {name: {k: v for k, v in fields.items() if v is not None} for name, fields in requirements.items() if any(v is not None for v in fields.values())}
+
+def read_budget(message: str):
+    '''
+    The budget for the whole build, from a price with no part named next to it, like "$1,200 in total",
+    following a word for the whole build, like "a gaming PC for $900 with 32GB of RAM", or closing a list of parts,
+    like "a PC with 16 GB of RAM and 1 TB storage for $800". Returns None if there is none.
+    '''
+    reader = Reader(message, current())
+    per_gb = [m.span() for m in QUANTITIES["price_per_gb"].finditer(reader.text)]
+    budgets = [
+        first_number(match) for match in QUANTITIES["price"].finditer(reader.text)
+        if reader.is_budget(match) and not any(s <= match.start() < e for s, e in per_gb)
+    ]
+    # with more than one, the tightest is the one the user can't go over
+    return min(budgets) if budgets else None
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# feature -> (column, compare on a log scale, higher is better)
+FEATURES = {
+    "cpu": {
+        "cores": ("core_count", True, True),
+        "boost_clock": ("performance_core_boost_clock", False, True),
+        "core_clock": ("performance_core_clock", False, True),
+        "tdp": ("tdp", False, False),
+        "price": ("price", True, False),
+    },
+    "cooler": {
+        "fan_rpm": ("average_fan_rpm", False, True),
+        "noise": ("average_noise_level", False, False),
+        "radiator_size": ("radiator_size", False, False),
+        "price": ("price", True, False),
+    },
+    "storage": {
+        "capacity": ("capacity_gb", True, True),
+        "cache": ("cache_gb", True, True),
+        "price_per_gb": ("price_per_gb", True, False),
+    },
+    "memory": {
+        "capacity": ("total_ram", True, True),
+        "speed": ("speed_mhz", False, True),
+        "modules": ("module_count", False, False),
+        "cas_latency": ("cas_latency", False, False),
+        "price": ("price", True, False),
+    },
+    "motherboard": {
+        "max_memory": ("max_memory_gb", True, True),
+        "memory_slots": ("memory_slots", False, True),
+        "price": ("price", True, False),
+    },
+}
+
+# weight of each feature when the user has not said anything about it
+BASE_WEIGHTS = {
+    "cpu": {"cores": 1.0, "boost_clock": 1.0, "core_clock": 0.5, "tdp": 0.0, "price": 1.0},
+    "cooler": {"fan_rpm": 0.5, "noise": 1.0, "radiator_size": 0.0, "price": 1.0},
+    "storage": {"capacity": 1.0, "cache": 0.25, "price_per_gb": 1.0},
+    "memory": {"capacity": 1.0, "speed": 0.0, "modules": 0.0, "cas_latency": 0.5, "price": 1.0},
+    "motherboard": {"max_memory": 0.5, "memory_slots": 0.5, "price": 1.0},
+}
+
+# requirement -> the feature whose weight goes up when the user states that requirement
+REQUIREMENT_FEATURES = {
+    "cpu": {"min_cores": "cores", "min_boost_clock_ghz": "boost_clock", "min_core_clock_ghz": "core_clock", "max_tdp_watts": "tdp", "max_price": "price"},
+    "cooler": {"min_fan_rpm": "fan_rpm", "max_noise_level_db": "noise", "max_radiator_size_mm": "radiator_size", "max_price": "price"},
+    "storage": {"min_capacity_gb": "capacity", "min_cache_gb": "cache", "max_price_per_gb": "price_per_gb"},
+    "memory": {"min_capacity_gb": "capacity", "min_speed_mhz": "speed", "max_module_count": "modules", "max_cas_latency": "cas_latency", "max_price": "price"},
+    "motherboard": {"min_max_memory_gb": "max_memory", "min_memory_slots": "memory_slots", "max_price": "price"},
+}
+
+# items missing this feature can't be bought, so they always rank last
+REQUIRED_FEATURES = {
+    "cpu": "price",
+    "cooler": "price",
+    "storage": "price_per_gb",
+    "memory": "price",
+    "motherboard": "price",
+}
+
+STATED_WEIGHT = 1.0
+
+def normalise(values: np.ndarray, log: bool, higher_is_better: bool) -> np.ndarray:
+    '''
+    Scales a column to [0, 1] over the whole table, where 1 is the best value.
+    '''
+    values = values.astype(np.float64)
+    if log:
+        values = np.log1p(np.clip(values, 0, None))
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    scaled = (values - lo) / (hi - lo) if hi > lo else np.zeros_like(values)
+    return (scaled if higher_is_better else 1 - scaled).astype(np.float32)
+
+class TableScorer:
+    '''
+    Scores the items of a table as a weighted sum of their normalised features.
+    Features are normalised once, when the catalog loads; a request only picks the weights.
+    '''
+    def __init__(self, name: str, df: pd.DataFrame):
+        self.name = name
+        self.features = {}
+        for feature, (col, log, higher_is_better) in FEATURES[name].items():
+            self.features[feature] = normalise(df[col].to_numpy(), log, higher_is_better)
+        self.invalid = np.isnan(self.features[REQUIRED_FEATURES[name]])
+        # a missing optional feature counts as the worst value rather than disqualifying the item
+        for feature in self.features.values():
+            np.nan_to_num(feature, copy=False, nan=0.0)
+
+    def weights(self, requirements: dict = None) -> dict:
+        weights = dict(BASE_WEIGHTS[self.name])
+        for requirement, value in (requirements or {}).items():
+            feature = REQUIREMENT_FEATURES[self.name].get(requirement)
+            if feature is not None and value:
+                weights[feature] += STATED_WEIGHT
+        return weights
+
+    def score(self, requirements: dict = None, rows: np.ndarray = None) -> np.ndarray:
+        '''
+        Scores every item of the table (or just the given rows, in order) against the weights derived from requirements.
+        '''
+        scores = np.zeros(len(self.invalid) if rows is None else len(rows), dtype=np.float32)
+        for feature, weight in self.weights(requirements).items():
+            if weight:
+                values = self.features[feature]
+                scores += np.float32(weight) * (values if rows is None else values[rows])
+        scores[self.invalid if rows is None else self.invalid[rows]] = -np.inf
+        return scores
+
+    def ranker(self, requirements: dict = None):
+        '''
+        Returns a function that picks the k best-scoring of any set of rows, best first.
+        Ties keep table order.
+        '''
+        scores = None
+
+        def top(rows: np.ndarray, k: int) -> np.ndarray:
+            nonlocal scores
+            rows = np.asarray(rows)
+            if k <= 0:
+                return rows[:0]
+            # scored on first use, so a ranker that is never called costs nothing
+            if scores is None:
+                scores = self.score(requirements)
+            if len(rows) > k:
+                # O(n) partial sort for the k-th best score, then only the k rows it leaves are fully sorted;
+                # of the rows tied on it, the first in table order make up the k
+                values = scores[rows]
+                kth = -np.partition(-values, k - 1)[k - 1]
+                above = rows[values > kth]
+                rows = np.concatenate([above, np.sort(rows[values == kth])[:k - len(above)]])
+            return rows[np.lexsort((rows, -scores[rows]))]
+
+        return top
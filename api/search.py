@@ -0,0 +1,199 @@
+import re
+import itertools
+import numpy as np
+import pandas as pd
+
+# "32GB" is written "32 GB" in most titles
+UNIT = re.compile(r"(\d)(gb|tb|mb)\b")
+SEPARATORS = re.compile(r"[^0-9a-z]+")
+
+def normalise_title(text: str) -> str:
+    return " " + SEPARATORS.sub(" ", UNIT.sub(r"\1 \2", text.lower())).strip() + " "
+
+def normalise_titles(titles: pd.Series) -> list:
+    '''
+    normalise_title for a whole column at once, running each regex over all the titles joined into one string.
+    '''
+    joined = "\n".join(titles.fillna("").str.replace("\n", " ")).lower()
+    joined = re.sub(r"[^0-9a-z\n]+", " ", UNIT.sub(r"\1 \2", joined))
+    return [" " + title.strip() + " " for title in joined.split("\n")]
+
+# words too common in titles to say anything about which part is meant
+STOP_WORDS = {"gb", "tb", "mb", "mhz", "ghz", "with", "and", "the", "for"}
+
+def title_words(text: str) -> list:
+    '''
+    The words of a title or message that can pick out a part: model numbers, and other words of two letters or more.
+    '''
+    return [w for w in normalise_title(text).split() if w not in STOP_WORDS and (len(w) > 1 or w.isdigit())]
+
+def trigram_codes(text: str) -> np.ndarray:
+    '''
+    The distinct character trigrams of a normalised string, each packed into one integer.
+    '''
+    b = np.frombuffer(text.encode("ascii"), dtype=np.uint8).astype(np.int64)
+    return np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+class TitleIndex:
+    '''
+    Inverted indexes over the titles of a table: from character trigrams to the rows holding them,
+    for typo-tolerant search, and from whole words, for spotting parts named in a message.
+    Each is stored as one sorted array of keys and, for each key, a slice of an array of row ids.
+    Both are built in a few vectorised passes over all titles at once.
+    '''
+    # everything but the vocabulary, which is how the index is stored in a catalog snapshot
+    ARRAYS = (
+        "grams", "offsets", "rows", "gram_counts", "word_rows", "word_offsets",
+        "is_number", "is_model", "is_long_model", "word_counts", "number_counts",
+    )
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, vocabulary: list):
+        '''
+        An index from the ARRAYS and vocabulary of one built before.
+        '''
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index.vocabulary = {word: i for i, word in enumerate(vocabulary)}
+        return index
+
+    def __init__(self, titles: pd.Series):
+        normalised = normalise_titles(titles)
+        lengths = np.fromiter(map(len, normalised), dtype=np.int64, count=len(normalised))
+        b = np.frombuffer("".join(normalised).encode("ascii"), dtype=np.uint8).astype(np.int64)
+
+        # a trigram at every position that doesn't run over the end of its title
+        rows = np.repeat(np.arange(len(normalised)), lengths)
+        starts = np.arange(len(b) - 2)
+        valid = rows[starts] == rows[starts + 2]
+        codes = ((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])[valid]
+        pairs = np.sort((codes << 20) | rows[starts[valid]])
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+
+        # pairs are sorted by trigram, then row
+        codes, rows = pairs >> 20, pairs & ((1 << 20) - 1)
+        self.grams, self.offsets = np.unique(codes, return_index=True)
+        self.offsets = np.append(self.offsets, len(rows))
+        self.rows = rows
+        self.gram_counts = np.bincount(rows, minlength=len(normalised))
+
+        # and from whole words to the rows holding them, for finding titles named in a message
+        words = [title.split() for title in normalised]
+        word_ids, vocabulary = pd.factorize(np.array(list(itertools.chain.from_iterable(words)), dtype=object))
+        word_rows = np.repeat(np.arange(len(words)), [len(w) for w in words])
+        # drop words that can't pick out a part, and repeats of a word within a title
+        keep = np.array([w not in STOP_WORDS and (len(w) > 1 or w.isdigit()) for w in vocabulary], dtype=bool)
+        pairs = np.unique((word_rows << 20 | word_ids)[keep[word_ids]])
+        word_rows, word_ids = pairs >> 20, pairs & ((1 << 20) - 1)
+        self.vocabulary = {word: i for i, word in enumerate(vocabulary)}
+        order = np.argsort(word_ids, kind="stable")
+        self.word_rows = word_rows[order]
+        self.word_offsets = np.searchsorted(word_ids[order], np.arange(len(vocabulary) + 1))
+        self.is_number = np.array([any(c.isdigit() for c in word) for word in vocabulary], dtype=bool)
+        # model numbers like "b650" or "7800x3d", as opposed to sizes and counts like "16";
+        # the longer ones are distinctive enough to name a part on their own
+        lengths = np.array([len(word) for word in vocabulary])
+        self.is_model = self.is_number & (lengths > 2)
+        self.is_long_model = self.is_number & (lengths > 4)
+        self.word_counts = np.bincount(word_rows, minlength=len(normalised))
+        self.number_counts = np.bincount(word_rows, weights=self.is_number[word_ids], minlength=len(normalised)).astype(np.int64)
+
+    def overlap(self, query: str) -> tuple:
+        '''
+        The number of distinct trigrams every title shares with query, and how many query has.
+        '''
+        codes = trigram_codes(normalise_title(query))
+        found = np.searchsorted(self.grams, codes)
+        found = found[(found < len(self.grams)) & (self.grams[np.minimum(found, len(self.grams) - 1)] == codes)]
+        postings = [self.rows[self.offsets[i]:self.offsets[i + 1]] for i in found]
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.gram_counts)) if postings else np.zeros(len(self.gram_counts), dtype=np.int64)
+        return shared, len(codes)
+
+    def search(self, query: str, limit: int = 10) -> tuple:
+        '''
+        The rows whose titles are most similar to query (Dice coefficient of their trigrams), best first,
+        along with their scores.
+        '''
+        shared, count = self.overlap(query)
+        scores = 2 * shared / (count + self.gram_counts)
+        rows = np.flatnonzero(shared)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+        rows = rows[np.lexsort((rows, -scores[rows]))]
+        return rows, scores[rows]
+
+    def mentioned(self, text: str) -> tuple:
+        '''
+        The rows whose titles are named in a longer text such as a user's message, best matches first,
+        along with the share of their words found. A title counts as named when the text has every number in it,
+        and either all of its words, one of its model numbers (like "b650") and at least half of its other words,
+        or one of its longer model numbers (like "7800x3d"). So "Ryzen 7 7800X3D" names "AMD Ryzen 7 7800X3D",
+        but "Samsung 990 Pro" doesn't name "Samsung 980 Pro", and "16 GB of performance RAM" doesn't name
+        "PNY Performance 16 GB".
+        Words are matched whole, since one character is all that tells many models apart.
+        '''
+        hits = np.zeros(len(self.word_counts), dtype=np.int64)
+        number_hits = np.zeros(len(self.word_counts), dtype=np.int64)
+        model_hits = np.zeros(len(self.word_counts), dtype=np.int64)
+        long_model_hits = np.zeros(len(self.word_counts), dtype=np.int64)
+        for word in set(title_words(text)):
+            i = self.vocabulary.get(word)
+            if i is None:
+                continue
+            rows = self.word_rows[self.word_offsets[i]:self.word_offsets[i + 1]]
+            hits[rows] += 1
+            if self.is_number[i]:
+                number_hits[rows] += 1
+            if self.is_model[i]:
+                model_hits[rows] += 1
+            if self.is_long_model[i]:
+                long_model_hits[rows] += 1
+        word_hits = hits - number_hits
+        words = self.word_counts - self.number_counts
+
+        named = (
+            (number_hits == self.number_counts)
+            & (
+                (hits == self.word_counts)
+                | ((model_hits > 0) & (word_hits > 0) & (2 * word_hits >= words))
+                | (long_model_hits > 0)
+            )
+            & (self.word_counts >= 2)
+        )
+        rows = np.flatnonzero(named)
+        share = hits[rows] / self.word_counts[rows]
+        # most of the title found first, then the most specific title
+        order = np.lexsort((rows, -self.word_counts[rows], -share))
+        return rows[order], share[order]
+
+def search(catalog, query: str, components: list = None, limit: int = 10) -> dict:
+    '''
+    The items of each component table (by default all of them) whose titles best match query, best first,
+    as records of their item_id, title, price and score.
+    '''
+    results = {}
+    for name in components or catalog.tables:
+        rows, scores = catalog.titles[name].search(query, limit)
+        df = catalog[name]
+        results[name] = [
+            {"item_id": int(row), "title": df["title"].iat[row], "price": None if pd.isna(price) else round(float(price), 2), "score": round(float(score), 3)}
+            for row, price, score in zip(rows, df["price"].to_numpy()[rows], scores)
+        ]
+    return results
+
+def find_pins(catalog, message: str) -> dict:
+    '''
+    The parts a message names outright, as component name -> row ids, for components it names any of.
+    Only the best matching titles count: those with the largest share of their words in the message and, among
+    them, the most words. All of them are returned, in catalog order; which are offered is up to the filters
+    and the scores (see api/recommendation.py).
+    '''
+    pins = {}
+    for name, index in catalog.titles.items():
+        rows, share = index.mentioned(message)
+        if len(rows) == 0:
+            continue
+        best = (share == share[0]) & (index.word_counts[rows] == index.word_counts[rows[0]])
+        pins[name] = np.sort(rows[best]).tolist()
+    return pins
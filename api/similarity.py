@@ -0,0 +1,156 @@
+import re
+import threading
+import numpy as np
+
+# character n-grams of these lengths are hashed into the vectors
+NGRAMS = (3, 4, 5)
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+WORD = re.compile(r"[^\W_]+(?:\.\d+)?")
+
+def ngram_counts(text: str, dimensions: int) -> np.ndarray:
+    '''
+    How often each hashed character n-gram of text occurs, as a vector of length dimensions.
+    Every n-gram is hashed in one vectorised pass per length, as a polynomial over its bytes.
+    Punctuation is dropped first, so "1TB SSD!" and "1TB SSD" are the same.
+    '''
+    text = " ".join(WORD.findall(text))
+    b = np.frombuffer(f" {text} ".encode(), dtype=np.uint8).astype(np.uint64)
+    buckets = []
+    for n in NGRAMS:
+        if len(b) < n:
+            continue
+        h = np.zeros(len(b) - n + 1, dtype=np.uint64)
+        for k in range(n):
+            h = h * np.uint64(1000003) + b[k:len(b) - n + 1 + k]
+        # mix in the length, so a 3-gram and a 4-gram never share a bucket just by being prefixes
+        buckets.append((h ^ np.uint64(n * 0x9E3779B97F4A7C15 % 2**64)) % np.uint64(dimensions))
+    return np.bincount(np.concatenate(buckets).astype(np.int64), minlength=dimensions) if buckets else np.zeros(dimensions, dtype=np.int64)
+
+class SimilarityCache:
+    '''
+    Bounded, thread-safe cache that answers for messages close enough to one seen before, not just identical ones.
+
+    Messages are embedded as TF-IDF vectors of their hashed character n-grams, with sublinear term frequencies
+    and document frequencies counted over the messages stored. A lookup is one matrix-vector product
+    against every stored vector, over just the n-grams the message has; the most similar message at or above threshold (by cosine similarity) is a hit,
+    as long as it has the same numbers in it, since "16 GB" and "32 GB" are a character apart.
+    Entries are kept per namespace (e.g. model and requirement schema), and the least recently used is evicted when full.
+    '''
+    def __init__(self, maxsize=1024, threshold=0.9, dimensions=4096):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self.lock = threading.Lock()
+        # one column per entry, so a lookup only reads the rows of the n-grams in the message
+        self.vectors = np.zeros((dimensions, 0), dtype=np.float32)
+        self.last_used = np.zeros(0, dtype=np.int64)
+        self.namespaces = np.zeros(0, dtype=np.int64)
+        self.entries = []
+        # the n-grams each entry has, to take it back out of the document counts when it is evicted
+        self.present = []
+        self.namespace_ids = {}
+        self.document_counts = np.zeros(dimensions, dtype=np.int64)
+        self.documents = 0
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.audits = 0
+        self.false_hits = 0
+
+    def embed(self, message: str) -> tuple:
+        counts = ngram_counts(message, self.dimensions)
+        return counts, self.weigh(counts)
+
+    def weigh(self, counts: np.ndarray) -> np.ndarray:
+        idf = np.log((1 + self.documents) / (1 + self.document_counts)) + 1
+        vector = np.where(counts > 0, 1 + np.log(np.maximum(counts, 1)), 0) * idf
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).astype(np.float32)
+
+    def get(self, message: str, namespace: str = None):
+        '''
+        Returns (value, similarity, cached message) of the closest stored message, or None if none is close enough.
+        '''
+        numbers = sorted(NUMBER.findall(message))
+        with self.lock:
+            _, vector = self.embed(message)
+            namespace_id = self.namespace_ids.get(namespace)
+            size = len(self.entries)
+            if namespace_id is not None and size:
+                present = np.flatnonzero(vector)
+                scores = vector[present] @ self.vectors[present, :size]
+                scores[self.namespaces[:size] != namespace_id] = -1
+                for slot in np.flatnonzero(scores >= self.threshold)[np.argsort(-scores[scores >= self.threshold])]:
+                    cached_message, cached_numbers, value = self.entries[slot]
+                    if cached_numbers == numbers:
+                        self.clock += 1
+                        self.last_used[slot] = self.clock
+                        self.hits += 1
+                        return value, float(scores[slot]), cached_message
+            self.misses += 1
+            return None
+
+    def set(self, message: str, value, namespace: str = None):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            counts = ngram_counts(message, self.dimensions)
+            present = np.flatnonzero(counts)
+            namespace_id = self.namespace_ids.setdefault(namespace, len(self.namespace_ids))
+            entry = (message, sorted(NUMBER.findall(message)), value)
+            self.clock += 1
+            if len(self.entries) < self.maxsize:
+                # grow the arrays by doubling, up to maxsize rows
+                if len(self.entries) == self.vectors.shape[1]:
+                    size = min(self.maxsize, max(16, 2 * len(self.entries)))
+                    vectors = np.zeros((self.dimensions, size), dtype=np.float32)
+                    vectors[:, :len(self.entries)] = self.vectors
+                    self.vectors = vectors
+                    self.last_used = np.resize(self.last_used, size)
+                    self.namespaces = np.resize(self.namespaces, size)
+                slot = len(self.entries)
+                self.entries.append(entry)
+                self.present.append(present)
+            else:
+                slot = int(np.argmin(self.last_used))
+                self.document_counts[self.present[slot]] -= 1
+                self.documents -= 1
+                self.entries[slot] = entry
+                self.present[slot] = present
+                self.evictions += 1
+            # the message counts towards its own document frequencies
+            self.document_counts[present] += 1
+            self.documents += 1
+            self.vectors[:, slot] = self.weigh(counts)
+            self.last_used[slot] = self.clock
+            self.namespaces[slot] = namespace_id
+
+    def audit(self, correct: bool):
+        '''
+        Records whether a hit, checked against a fresh answer, was right.
+        '''
+        with self.lock:
+            self.audits += 1
+            self.false_hits += not correct
+
+    def clear(self):
+        with self.lock:
+            self.vectors = self.vectors[:, :0]
+            self.last_used = self.last_used[:0]
+            self.namespaces = self.namespaces[:0]
+            self.entries = []
+            self.present = []
+            self.document_counts[:] = 0
+            self.documents = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "audits": self.audits,
+            "false_hits": self.false_hits,
+        }
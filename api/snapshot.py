@@ -0,0 +1,16 @@
+import time
+from .catalog import Catalog, snapshot_lock
+from .config import SNAPSHOT_PATH
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    if SNAPSHOT_PATH is None:
+        raise SystemExit("CATALOG_SNAPSHOT is empty, so there is no snapshot to write")
+    catalog = Catalog.load(snapshot=None)
+    with snapshot_lock(SNAPSHOT_PATH):
+        catalog.save(SNAPSHOT_PATH)
+    print(f"wrote snapshot {catalog.version} to {SNAPSHOT_PATH} in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    Catalog.load()
+    print(f"loaded it back in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,3 +1,4 @@
+import json
 import pandas as pd
 import numpy as np
 from enum import Enum
@@ -24,4 +25,30 @@ def convert_to_enum_name(s: str):
     '''
     if isinstance(s, str):
         return s.lower().replace(" ", "_").replace("+", "plus").replace("-", "_")
-    return s
\ No newline at end of file
+    return s
+
+def encode_column(series: pd.Series) -> list:
+    '''
+    Encodes every value of a column as a JSON fragment in one pass over the column.
+    Floats keep the shortest representation of their own precision, and missing values become null.
+    '''
+    values = series.to_numpy()
+    if values.dtype.kind == "f":
+        encoded = values.astype(str)
+        encoded[~np.isfinite(values)] = "null"
+        return encoded.tolist()
+    if values.dtype.kind in "iu":
+        return values.astype(str).tolist()
+    if values.dtype.kind == "b":
+        return np.where(values, "true", "false").tolist()
+    return ["null" if pd.isna(v) else json.dumps(v) for v in values]
+
+def to_json_records(df: pd.DataFrame) -> str:
+    '''
+    Serialises a DataFrame as a JSON array of records, encoding it column by column
+    rather than building a dictionary for every row.
+    '''
+    keys = [json.dumps(str(col)) + ": " for col in df.columns]
+    columns = [encode_column(df[col]) for col in df.columns]
+    records = ["{" + ", ".join(k + v for k, v in zip(keys, row)) + "}" for row in zip(*columns)]
+    return "[" + ", ".join(records) + "]"
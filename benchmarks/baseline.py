@@ -0,0 +1,50 @@
+import json
+import numpy as np
+from pathlib import Path
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+
+# a result this much worse than its baseline counts as a regression
+TOLERANCE = 0.5
+
+def percentiles(samples: list) -> dict:
+    '''
+    p50/p95/p99 of a list of durations in seconds, in milliseconds.
+    '''
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99]) if len(samples) else (np.nan,) * 3
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_rps")
+
+def lower_is_better(metric: str) -> bool:
+    # durations and memory
+    return metric.endswith(("_ms", "_us", "_mib"))
+
+def load_baselines() -> dict:
+    return json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+
+def save_baselines(suite: str, results: dict):
+    baselines = load_baselines()
+    baselines[suite] = results
+    BASELINES_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+def compare(suite: str, results: dict, tolerance: float = TOLERANCE) -> list:
+    '''
+    Prints every result of a suite next to its stored baseline, and returns the ones that regressed:
+    durations or memory more than tolerance higher, or throughputs more than tolerance lower.
+    Counters (errors, sizes) are shown but never flagged.
+    '''
+    baseline = load_baselines().get(suite, {})
+    regressions = []
+    for metric, value in results.items():
+        base = baseline.get(metric)
+        flag = ""
+        if base and isinstance(value, float) and (lower_is_better(metric) or higher_is_better(metric)):
+            ratio = value / base
+            if (ratio < 1 / (1 + tolerance)) if higher_is_better(metric) else (ratio > 1 + tolerance):
+                flag = "  <-- REGRESSION"
+                regressions.append(metric)
+        change = f"({value / base - 1:+.0%} vs {base})" if base else "(no baseline)"
+        print(f"{metric:<48} {value:>12} {change}{flag}")
+    return regressions
@@ -0,0 +1,52 @@
+'''
+The whole-build optimiser on the real catalog and on synthetic catalogs made of copies of it. No LLM is involved.
+- <scale>x.<budget>.get_builds_us: time to find the top --k builds for the test message's requirements,
+  candidates included, at each total budget ("any" for none)
+- <scale>x.<budget>.best_score / builds: score of the best build found, and how many were found
+
+    python -m benchmarks.builds [--scales 1 10 100] [--k 5] [--save]
+'''
+import os
+import sys
+import argparse
+
+os.environ.setdefault("GROQ_KEY", "stub")
+
+from api import recommendation
+from api.catalog import pinned
+from api.components import PCRequirements
+from .baseline import compare, save_baselines, TOLERANCE
+from .filters import timeit, scaled_catalog
+from .stub_llm import REQUIREMENTS
+
+BUDGETS = (600, 1000, 2000, None)
+
+def run(scales: list, k: int) -> dict:
+    requirements = PCRequirements.model_validate(REQUIREMENTS).model_dump()
+    results = {}
+    for scale in scales:
+        with pinned(scaled_catalog(scale)):
+            for budget in BUDGETS:
+                prefix = f"{scale}x.{budget or 'any'}"
+                builds = recommendation.get_builds(requirements, budget, k)
+                results[f"{prefix}.get_builds_us"] = timeit(lambda: recommendation.get_builds(requirements, budget, k))
+                results[f"{prefix}.best_score"] = builds[0][0] if builds else 0.0
+                results[f"{prefix}.builds"] = len(builds)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--k", type=int, default=5, help="builds to find")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.scales, args.k)
+    regressions = compare("builds", results, args.tolerance)
+    if args.save:
+        save_baselines("builds", results)
+        print("baseline saved")
+    elif regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
@@ -0,0 +1,76 @@
+'''
+Cold start of the API, with the catalog loaded from its binary snapshot and from the CSVs:
+- import_ms: time to import api.main in a fresh interpreter
+- ready_ms: time from starting uvicorn to the first answered request
+- first_extract_ms: time from starting uvicorn to the first /extract answered through the stub LLM
+
+    python -m benchmarks.cold_start [--runs 5] [--save]
+'''
+import os
+import sys
+import time
+import argparse
+import subprocess
+import httpx
+import numpy as np
+
+os.environ.setdefault("GROQ_KEY", "stub")
+
+from api.config import TEST_MESSAGE, BASE_DIR, SNAPSHOT_PATH
+from .baseline import compare, save_baselines, TOLERANCE
+from .load import free_port, start_app
+from .stub_llm import StubLLM
+
+# no snapshot at all, so the catalog is parsed from the CSVs
+NO_SNAPSHOT = {"CATALOG_SNAPSHOT": ""}
+
+def import_time(env: dict) -> float:
+    code = "import time; start = time.perf_counter(); import api.main; print(time.perf_counter() - start)"
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=BASE_DIR.parent, env=dict(os.environ, **env), text=True)
+    return float(output.strip().splitlines()[-1]) * 1000
+
+def first_response(stub: StubLLM, env: dict) -> tuple:
+    port = free_port()
+    start = time.perf_counter()
+    app = start_app(stub.url, port, cache=True, env=env, poll=0.01)
+    ready = time.perf_counter() - start
+    try:
+        httpx.get(f"http://127.0.0.1:{port}/extract", params={"message": TEST_MESSAGE}, timeout=60).raise_for_status()
+        extract = time.perf_counter() - start
+    finally:
+        app.terminate()
+        app.wait()
+    return ready * 1000, extract * 1000
+
+def run(runs: int) -> dict:
+    if not (SNAPSHOT_PATH / "manifest.json").exists():
+        subprocess.check_call([sys.executable, "-m", "api.snapshot"], cwd=BASE_DIR.parent)
+
+    stub = StubLLM(latency=0, jitter=0).start()
+    results = {}
+    try:
+        for mode, env in (("snapshot", {}), ("csv", NO_SNAPSHOT)):
+            imports = [import_time(env) for _ in range(runs)]
+            ready, extract = zip(*(first_response(stub, env) for _ in range(runs)))
+            results[f"{mode}.import_ms"] = round(float(np.median(imports)), 1)
+            results[f"{mode}.ready_ms"] = round(float(np.median(ready)), 1)
+            results[f"{mode}.first_extract_ms"] = round(float(np.median(extract)), 1)
+    finally:
+        stub.stop()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    regressions = compare("cold_start", results, args.tolerance)
+    if args.save:
+        save_baselines("cold_start", results)
+        print("baseline saved")
+    elif regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
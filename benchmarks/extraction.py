@@ -0,0 +1,84 @@
+'''
+Requirement extraction by the local rules against extraction by the (stub) model:
+- <message>.rules_us and <message>.confidence: time the rules take to read each message, and how sure they are
+- <mode>.extract_p50_ms: /extract latency for the messages the rules are confident about,
+  with the rules on ("rules") and off ("model"), the requirement cache off in both
+- <mode>.llm_calls: calls that reached the stub model
+
+    python -m benchmarks.extraction [--requests 20] [--latency 0.3] [--save]
+'''
+import os
+import sys
+import time
+import argparse
+import httpx
+
+os.environ.setdefault("GROQ_KEY", "stub")
+
+from api.config import TEST_MESSAGE, LOCAL_EXTRACTION_CONFIDENCE
+from api.rules import extract_rules
+from .baseline import percentiles, compare, save_baselines, TOLERANCE
+from .filters import timeit
+from .load import free_port, start_app
+from .stub_llm import StubLLM
+
+MESSAGES = {
+    "test_message": TEST_MESSAGE,
+    "explicit": "I need a Zen 4 CPU with at least 8 cores under $300, 32GB of DDR5-6000 RAM and a 2TB NVMe SSD.",
+    "board": "Looking for an AM5 Micro ATX motherboard with 4 memory slots, and a cooler quieter than 30 dB.",
+    "vague": "I want a compact gaming PC that runs quiet and doesn't cost too much.",
+}
+
+MODES = {"rules": str(LOCAL_EXTRACTION_CONFIDENCE), "model": "2"}
+
+def extract_latency(stub: StubLLM, threshold: str, messages: list, requests: int) -> tuple:
+    port = free_port()
+    app = start_app(stub.url, port, cache=False, env={"LOCAL_EXTRACTION_CONFIDENCE": threshold})
+    try:
+        url = f"http://127.0.0.1:{port}/extract"
+        with httpx.Client(timeout=60) as client:
+            client.get(url, params={"message": messages[0]}).raise_for_status()
+            calls = stub.calls
+            latencies = []
+            for i in range(requests):
+                start = time.perf_counter()
+                client.get(url, params={"message": messages[i % len(messages)]}).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+    finally:
+        app.terminate()
+        app.wait()
+    return percentiles(latencies)["p50_ms"], stub.calls - calls
+
+def run(requests: int, latency: float) -> dict:
+    results, confident = {}, []
+    for name, message in MESSAGES.items():
+        _, confidence = extract_rules(message)
+        results[f"{name}.rules_us"] = timeit(lambda: extract_rules(message))
+        results[f"{name}.confidence"] = confidence
+        if confidence >= LOCAL_EXTRACTION_CONFIDENCE:
+            confident.append(message)
+
+    stub = StubLLM(latency=latency, jitter=0).start()
+    try:
+        for mode, threshold in MODES.items():
+            results[f"{mode}.extract_p50_ms"], results[f"{mode}.llm_calls"] = extract_latency(stub, threshold, confident, requests)
+    finally:
+        stub.stop()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds the stub LLM takes per call")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.latency)
+    regressions = compare("extraction", results, args.tolerance)
+    if args.save:
+        save_baselines("extraction", results)
+        print("baseline saved")
+    elif regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
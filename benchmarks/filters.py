@@ -0,0 +1,94 @@
+'''
+Micro-benchmarks of the filter_* functions and get_filtered_csvs, on the real catalog
+and on synthetic catalogs made of 10 and 100 copies of it. No LLM is involved.
+
+    python -m benchmarks.filters [--scales 1 10 100] [--save]
+'''
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from api import filters, recommendation
+from api.catalog import Catalog, current, pinned
+from api.components import PCRequirements
+from api.config import TEST_MESSAGE
+from api.extraction import requirements_cache, requirements_key
+from .baseline import compare, save_baselines, TOLERANCE
+from .stub_llm import REQUIREMENTS
+
+FILTERS = {
+    "cpu": filters.filter_cpu,
+    "cooler": filters.filter_cooler,
+    "storage": filters.filter_storage,
+    "memory": filters.filter_memory,
+    "motherboard": filters.filter_motherboard,
+}
+
+def scaled_catalog(scale: int) -> Catalog:
+    '''
+    A catalog with every table repeated scale times, each copy with its own index.
+    '''
+    catalog = current()
+    if scale == 1:
+        return catalog
+    tables = {name: pd.concat([df] * scale, ignore_index=True) for name, df in catalog.tables.items()}
+    return Catalog(tables, version=f"{catalog.version}x{scale}")
+
+def timeit(fn, repeat: int = 7, min_time: float = 0.05) -> float:
+    '''
+    Median time per call of fn in microseconds, over repeat rounds of enough calls to last min_time each.
+    '''
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    return round(float(np.median(rounds)) * 1e6, 1)
+
+def run(scales: list) -> dict:
+    requirements = PCRequirements.model_validate(REQUIREMENTS).model_dump()
+    # get_filtered_csvs goes through the requirements cache, so prime it instead of calling the model
+    requirements_cache.set(requirements_key(TEST_MESSAGE), requirements)
+
+    results = {}
+    for scale in scales:
+        start = time.perf_counter()
+        scaled = scaled_catalog(scale)
+        if scale != 1:
+            results[f"{scale}x.catalog_build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        with pinned(scaled):
+            for name, fn in FILTERS.items():
+                df = scaled[name]
+                results[f"{scale}x.filter_{name}_us"] = timeit(lambda: fn(df, **requirements[name]))
+                results[f"{scale}x.filter_{name}_limit10_us"] = timeit(lambda: fn(df, limit=10, **requirements[name]))
+            results[f"{scale}x.get_filtered_csvs_us"] = timeit(lambda: recommendation.get_filtered_csvs(TEST_MESSAGE, limit=10))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.scales)
+    regressions = compare("filters", results, args.tolerance)
+    if args.save:
+        save_baselines("filters", results)
+        print("baseline saved")
+    elif regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
@@ -0,0 +1,119 @@
+'''
+Load test of the API against the stub LLM: starts the stub and the app (under uvicorn), fires requests
+at each endpoint with the given concurrency, and reports latency percentiles and throughput.
+
+    python -m benchmarks.load [--requests 200] [--concurrency 16] [--latency 0.3] [--save]
+
+The requirement and recommendation caches, and the local requirement rules, are turned off unless --cache
+is given, so every request goes through the whole pipeline.
+'''
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+import httpx
+
+os.environ.setdefault("GROQ_KEY", "stub")
+
+from api.config import TEST_MESSAGE, BASE_DIR
+from .baseline import percentiles, compare, save_baselines, TOLERANCE
+from .stub_llm import StubLLM
+
+ENDPOINTS = ["/extract", "/recommend"]
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_app(llm_url: str, port: int, cache: bool, env: dict = None, poll: float = 0.2, workers: int = 1) -> subprocess.Popen:
+    '''
+    Starts the app under uvicorn (with workers worker processes), pointed at the stub LLM, and returns once it answers.
+    '''
+    overrides = env or {}
+    env = dict(os.environ, GROQ_KEY="stub", GROQ_BASE_URL=llm_url)
+    env.pop("REQUIREMENTS_CACHE_PATH", None)
+    if not cache:
+        env.update(REQUIREMENTS_CACHE_SIZE="0", SIMILARITY_CACHE_SIZE="0", RECOMMENDATION_CACHE_SIZE="0", LOCAL_EXTRACTION_CONFIDENCE="2")
+    env.update(overrides)
+
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning", "--workers", str(workers)],
+        cwd=BASE_DIR.parent, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/")
+            return app
+        except httpx.TransportError:
+            time.sleep(poll)
+    app.kill()
+    raise RuntimeError("the app did not start within 60 seconds")
+
+async def load(url: str, requests: int, concurrency: int) -> dict:
+    '''
+    Sends requests GET requests to url, concurrency at a time, each with a different message.
+    '''
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def call(client, i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, params={"message": f"{TEST_MESSAGE} (#{i})"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(call(client, i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return {**percentiles(latencies), "throughput_rps": round(len(latencies) / elapsed, 2), "errors": errors}
+
+def run(requests: int, concurrency: int, latency: float, jitter: float, cache: bool) -> dict:
+    stub = StubLLM(latency=latency, jitter=jitter).start()
+    port = free_port()
+    app = start_app(stub.url, port, cache)
+    results = {}
+    try:
+        for endpoint in ENDPOINTS:
+            # one request first, so lazy set-up isn't counted against the percentiles
+            asyncio.run(load(f"http://127.0.0.1:{port}{endpoint}", 1, 1))
+            for metric, value in asyncio.run(load(f"http://127.0.0.1:{port}{endpoint}", requests, concurrency)).items():
+                results[f"{endpoint.strip('/')}.c{concurrency}.{metric}"] = value
+        results["llm_calls"] = stub.calls
+    finally:
+        app.terminate()
+        app.wait()
+        stub.stop()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds the stub LLM takes per call")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--cache", action="store_true", help="leave the requirement and recommendation caches on")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.concurrency, args.latency, args.jitter, args.cache)
+    regressions = compare("load", results, args.tolerance)
+    if args.save:
+        save_baselines("load", results)
+        print("baseline saved")
+    elif regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
@@ -0,0 +1,141 @@
+'''
+Memory of the API served by several uvicorn workers, with the catalog mapped from its shared snapshot
+and with a private copy of it parsed from the CSVs in every worker. After a warm-up of requests
+through the stub LLM, reports the summed memory of the worker processes, read from /proc (Linux only):
+- rss_mib: resident memory, counting pages shared between workers once per worker
+- pss_mib: proportional memory, splitting each shared page between the workers mapping it
+- uss_mib: memory private to each worker
+- snapshot_rss_mib: resident pages of the mapped snapshot files, once per worker
+- pss_saving: how many MiB less PSS the shared snapshot takes than private copies
+
+The real catalog is only a few MiB, so --scale serves one made of that many copies of every table,
+to show how the two grow with the catalog.
+
+    python -m benchmarks.memory [--workers 4] [--scale 1] [--save]
+'''
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import pandas as pd
+from pathlib import Path
+
+os.environ.setdefault("GROQ_KEY", "stub")
+
+from api.catalog import TABLES
+from api.config import data_path
+from .baseline import compare, save_baselines, TOLERANCE
+from .load import free_port, start_app, load
+from .stub_llm import StubLLM
+
+def scaled_data(scale: int, path: Path) -> Path:
+    '''
+    Writes every table repeated scale times to path, and returns it.
+    Each copy's titles are numbered, so that no copy shares its strings or title words with another.
+    '''
+    for name in TABLES:
+        df = pd.read_csv(data_path / f"{name}.csv", dtype=str, keep_default_na=False)
+        copies = [df.assign(title=df["title"] + f" copy{i}") if i else df for i in range(scale)]
+        pd.concat(copies).to_csv(path / f"{name}.csv", index=False)
+    return path
+
+def children(pid: int) -> list:
+    pids = []
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # the parent pid is the second field after the parenthesised command name
+            if int(stat.read_text().rsplit(")", 1)[1].split()[1]) == pid:
+                pids.append(int(stat.parent.name))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+def workers(pid: int) -> list:
+    '''
+    The uvicorn worker processes under the app's main process, leaving out multiprocessing's helpers.
+    '''
+    return [child for child in children(pid) if b"spawn_main" in Path(f"/proc/{child}/cmdline").read_bytes()]
+
+def smaps_rollup(pid: int) -> dict:
+    '''
+    Memory totals of a process in KiB, e.g. {"Rss": ..., "Pss": ..., "Private_Dirty": ...}.
+    '''
+    usage = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        key, value = line.split(":")
+        usage[key] = int(value.split()[0])
+    return usage
+
+def mapped_rss(pid: int, path: Path) -> int:
+    '''
+    Resident KiB of the files under path that a process has mapped.
+    '''
+    rss, inside = 0, False
+    for line in Path(f"/proc/{pid}/smaps").read_text().splitlines():
+        fields = line.split()
+        if not line.endswith("kB") and len(fields) >= 5 and "-" in fields[0]:
+            inside = len(fields) >= 6 and fields[5].startswith(str(path))
+        elif inside and fields[0] == "Rss:":
+            rss += int(fields[1])
+    return rss
+
+def measure(stub: StubLLM, mode: str, data: Path, count: int, requests: int) -> dict:
+    snapshot = data / "snapshot" if mode == "shared" else None
+    env = {"CATALOG_DATA": str(data), "CATALOG_SNAPSHOT": str(snapshot or "")}
+    port = free_port()
+    app = start_app(stub.url, port, cache=False, env=env, workers=count)
+    try:
+        # enough requests for every worker to take some, so each has touched the catalog
+        for endpoint in ("/extract", "/recommend"):
+            asyncio.run(load(f"http://127.0.0.1:{port}{endpoint}", requests, count * 4))
+        time.sleep(0.5)
+
+        pids = workers(app.pid)
+        usages = [smaps_rollup(pid) for pid in pids]
+        mib = lambda kib: round(kib / 1024, 1)
+        results = {
+            f"{mode}.workers": len(pids),
+            f"{mode}.rss_mib": mib(sum(u["Rss"] for u in usages)),
+            f"{mode}.pss_mib": mib(sum(u["Pss"] for u in usages)),
+            f"{mode}.uss_mib": mib(sum(u["Private_Clean"] + u["Private_Dirty"] for u in usages)),
+        }
+        if snapshot is not None:
+            results[f"{mode}.snapshot_rss_mib"] = mib(sum(mapped_rss(pid, snapshot) for pid in pids))
+        return results
+    finally:
+        app.terminate()
+        app.wait()
+
+def run(count: int, requests: int, scale: int = 1) -> dict:
+    stub = StubLLM(latency=0, jitter=0).start()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        data = scaled_data(scale, Path(tmp))
+        try:
+            for mode in ("shared", "private"):
+                results.update(measure(stub, mode, data, count, requests))
+        finally:
+            stub.stop()
+    results["pss_saving"] = round(results["private.pss_mib"] - results["shared.pss_mib"], 1)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scale", type=int, default=1, help="copies of every table in the catalog served")
+    parser.add_argument("--requests", type=int, default=200, help="warm-up requests per endpoint")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    suite = "memory" if args.scale == 1 else f"memory_{args.scale}x"
+    results = run(args.workers, args.requests, args.scale)
+    regressions = compare(suite, results, args.tolerance)
+    if args.save:
+        save_baselines(suite, results)
+        print("baseline saved")
+    elif regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
@@ -0,0 +1,126 @@
+'''
+The near-duplicate requirement cache against labelled pairs of messages: for each pair, whether the second
+may reuse the requirements extracted from the first. Every first message is cached, in the namespace
+extraction would give it, then every second one is looked up:
+- hit_rate@<threshold>: pairs labelled the same that hit, at each threshold tried
+- false_hit_rate@<threshold>: hits of pairs labelled different, at each threshold tried
+- get_us / set_us: lookup and insertion time with a full cache of --size messages
+
+    python -m benchmarks.similarity [--size 1024] [--save]
+'''
+import os
+import sys
+import time
+import random
+import argparse
+
+os.environ.setdefault("GROQ_KEY", "stub")
+
+from api.config import SIMILARITY_DIMENSIONS
+from api.components import requirement_models
+from api.extraction import normalise_message, local_requirements, similarity_namespace
+from api.similarity import SimilarityCache
+from .baseline import compare, save_baselines, TOLERANCE
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+# (cached message, new message, whether the new one asks for the same build)
+PAIRS = [
+    ("cheap PC for video editing, 1TB SSD", "budget video editing rig with a 1 TB SSD", True),
+    ("cheap pc for video editing with a 1tb ssd", "Cheap PC for video editing, with a 1TB SSD!", True),
+    ("I want a quiet gaming PC with 32GB of RAM", "i want a quiet gaming pc with 32 GB of RAM please", True),
+    ("Build me a PC for Blender rendering", "build me a pc for blender rendering, thanks", True),
+    ("I need a compact PC for my small desk", "I need a compact PC for my tiny desk", True),
+    ("A silent PC for music production with lots of storage", "a silent pc for music production with plenty of storage", True),
+    ("What's the best gaming PC I can get for $1000?", "whats the best gaming pc i can get for $1000", True),
+    ("I want a streaming PC with 16GB RAM and a 2TB drive", "I want a PC for streaming with 16GB RAM and a 2TB drive", True),
+    ("Looking for a workstation for 3D modelling and CAD", "looking for a workstation for 3d modeling and CAD", True),
+    ("Give me a cheap office PC for spreadsheets and email", "give me a cheap office pc for email and spreadsheets", True),
+    ("I'm a programmer and I compile large codebases all day", "I'm a programmer who compiles large codebases all day", True),
+    ("A PC for photo editing in Lightroom, nothing fancy", "a pc for photo editing in lightroom. nothing fancy.", True),
+    ("I want a small form factor gaming build", "i want a small form factor build for gaming", True),
+    ("quiet PC for my bedroom that stays cool", "Quiet PC for my bedroom which stays cool", True),
+    ("I'm a storyboard animator and need a fast PC with 1 TB of storage and 16 GB of RAM",
+     "I am a storyboard animator and I need a fast PC with 1 TB storage and 16 GB RAM", True),
+
+    ("I want a quiet gaming PC with 32GB of RAM", "I want a quiet gaming PC with 16GB of RAM", False),
+    ("I want an AMD gaming PC", "I want an Intel gaming PC", False),
+    ("cheap PC for video editing, 1TB SSD", "cheap PC for video editing, 1TB HDD", False),
+    ("a PC for music production", "a PC for video production", False),
+    ("I want a gaming PC with DDR5 memory", "I want a gaming PC with DDR4 memory", False),
+    ("A compact PC for my small desk", "A powerful PC for my small desk", False),
+    ("I need a motherboard with wifi", "I need a motherboard without wifi", False),
+    ("Build me a cheap PC for gaming", "Build me an expensive PC for gaming", False),
+    ("A PC for light gaming and browsing", "A PC for heavy gaming and streaming", False),
+    ("I want a silent PC for office work", "I want a fast PC for office work", False),
+    ("quiet PC with an air cooler", "quiet PC with a liquid cooler", False),
+    ("Gaming PC with an ATX motherboard", "Gaming PC with a Mini ITX motherboard", False),
+    ("a PC for machine learning with lots of RAM", "a PC for machine learning with lots of storage", False),
+    ("I want the fastest CPU you have", "I want the cheapest CPU you have", False),
+    ("Workstation with a 16 core CPU", "Workstation with an 8 core CPU", False),
+]
+
+def lookups(cache: SimilarityCache, namespaces: dict) -> list:
+    '''
+    Caches the first message of every pair, then looks up the second. Returns (right hit, false hit) for each pair.
+    '''
+    for cached, _, _ in PAIRS:
+        cache.set(normalise_message(cached), cached, namespaces[cached])
+    found = []
+    for cached, message, same in PAIRS:
+        hit = cache.get(normalise_message(message), namespaces[message])
+        # a hit on some other pair's message counts as a false one, whatever the label
+        right = same and hit is not None and hit[0] == cached
+        found.append((right, hit is not None and not right))
+    return found
+
+def timings(size: int) -> dict:
+    cache = SimilarityCache(maxsize=size, dimensions=SIMILARITY_DIMENSIONS)
+    words = " ".join(message for pair in PAIRS for message in pair[:2]).split()
+    rng = random.Random(0)
+    messages = [" ".join(rng.choices(words, k=12)) for _ in range(size + 200)]
+    for message in messages[:size]:
+        cache.set(message, None)
+
+    start = time.perf_counter()
+    for message in messages[size:]:
+        cache.get(message)
+    get_us = (time.perf_counter() - start) / 200 * 1e6
+    start = time.perf_counter()
+    for message in messages[size:]:
+        cache.set(message, None)
+    set_us = (time.perf_counter() - start) / 200 * 1e6
+    return {"get_us": round(get_us, 1), "set_us": round(set_us, 1)}
+
+def run(size: int) -> dict:
+    models = requirement_models()
+    namespaces = {}
+    for cached, message, _ in PAIRS:
+        for m in (cached, message):
+            namespaces[m] = similarity_namespace(models, local_requirements(m, models)[1])
+
+    same = sum(label for _, _, label in PAIRS)
+    results = {}
+    for threshold in THRESHOLDS:
+        found = lookups(SimilarityCache(threshold=threshold, dimensions=SIMILARITY_DIMENSIONS), namespaces)
+        results[f"hit_rate@{threshold}"] = round(sum(hit for hit, _ in found) / same, 3)
+        results[f"false_hit_rate@{threshold}"] = round(sum(false for _, false in found) / (len(PAIRS) - same), 3)
+        print(f"{threshold}: {results[f'hit_rate@{threshold}']:.0%} hits, {results[f'false_hit_rate@{threshold}']:.0%} false hits")
+    results.update(timings(size))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1024, help="messages in the cache when timing it")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.size)
+    regressions = compare("similarity", results, args.tolerance)
+    if args.save:
+        save_baselines("similarity", results)
+        print("baseline saved")
+    elif regressions:
+        print(f"{len(regressions)} regression(s)")
+        sys.exit(1)
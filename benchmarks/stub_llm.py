@@ -0,0 +1,149 @@
+import io
+import re
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# what the stub "extracts" from any message: a storage- and memory-heavy build on a modest CPU
+REQUIREMENTS = {
+    "cpu": {"min_cores": 6, "min_boost_clock_ghz": 4.0},
+    "cooler": {"max_noise_level_db": 35},
+    "storage": {"min_capacity_gb": 1000, "preferred_type": ["SSD"]},
+    "memory": {"min_capacity_gb": 16},
+    "motherboard": {"preferred_form_factor": ["ATX"]},
+}
+
+COMPONENT_REQUIREMENTS = {
+    "CPURequirements": "cpu",
+    "CoolerRequirements": "cooler",
+    "StorageRequirements": "storage",
+    "MemoryRequirements": "memory",
+    "MotherboardRequirements": "motherboard",
+}
+
+# table title in the recommendation prompt -> component
+TABLE_COMPONENTS = {"CPUs": "cpu", "Coolers": "cooler", "Storage": "storage", "Memory": "memory", "Motherboards": "motherboard"}
+
+def response_model(messages: list) -> str:
+    '''
+    Name of the response model instructor asked for: the last schema title in the system prompt.
+    Streamed calls ask for its Partial version, which is answered the same way.
+    '''
+    titles = re.findall(r'"title": "(\w+)"', messages[0]["content"])
+    return titles[-1].removeprefix("Partial") if titles else None
+
+def pick_components(prompt: str) -> dict:
+    '''
+    Picks the first (best-ranked) candidate of every table in a recommendation prompt.
+    '''
+    choices = {}
+    for block in prompt.split("\n\n"):
+        lines = block.strip().splitlines()
+        if len(lines) < 3 or lines[0].rstrip(":") not in TABLE_COMPONENTS:
+            continue
+        header, row = csv.reader(io.StringIO("\n".join(lines[1:3])))
+        row = dict(zip(header, row))
+        choices[TABLE_COMPONENTS[lines[0].rstrip(":")]] = {"item_id": int(row["item_id"]), "name": row["title"], "price": float(row["price"] or 0)}
+    return choices
+
+def canned_response(messages: list) -> dict:
+    model = response_model(messages)
+    if model == "ComponentChoices":
+        return pick_components(messages[-1]["content"])
+    if model in COMPONENT_REQUIREMENTS:
+        return REQUIREMENTS[COMPONENT_REQUIREMENTS[model]]
+    return REQUIREMENTS
+
+class StubLLM:
+    '''
+    Local stand-in for the Groq chat completions API, answering every call with canned JSON
+    shaped like the response model instructor asked for, after latency +- jitter seconds.
+    Supports streamed responses, so /recommend/stream can be benchmarked too.
+    faults maps a response model to how its calls go wrong instead: "hang" never answers (until the stub stops),
+    and "invalid" answers with content that isn't JSON.
+    '''
+    def __init__(self, port: int = 0, latency: float = 0.3, jitter: float = 0.05, faults: dict = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.faults = faults or {}
+        self.stopped = threading.Event()
+        self.calls = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["content-length"])))
+                stub.calls += 1
+                fault = stub.faults.get(response_model(body["messages"]))
+                if fault == "hang":
+                    stub.stopped.wait()
+                    return
+                time.sleep(max(0.0, random.uniform(stub.latency - stub.jitter, stub.latency + stub.jitter)))
+                content = "{\"min_capacity_gb\": " if fault == "invalid" else json.dumps(canned_response(body["messages"]))
+
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("content-type", "text/event-stream")
+                    self.send_header("transfer-encoding", "chunked")
+                    self.end_headers()
+                    for i in range(0, len(content), 16):
+                        delta = {"object": "chat.completion.chunk", "model": body["model"], "choices": [{"index": 0, "delta": {"content": content[i:i + 16]}, "finish_reason": None}]}
+                        self.chunk(f"data: {json.dumps(delta)}\n\n".encode())
+                    self.chunk(b"data: [DONE]\n\n")
+                    self.chunk(b"")
+                    return
+
+                response = json.dumps({
+                    "id": f"stub-{stub.calls}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stub LLM server on its own, e.g. to point GROQ_BASE_URL at it.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub = StubLLM(args.port, args.latency, args.jitter)
+    print(f"stub LLM listening on {stub.url}")
+    stub.server.serve_forever()
@@ -1,6 +1,24 @@
 import os
+import re
 import csv
-from bs4 import BeautifulSoup
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup, SoupStrainer
+
+# lxml parses several times faster than the pure-Python html.parser, but is optional
+try:
+    import lxml
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+PRODUCT_ROWS = SoupStrainer('tr', class_='tr__product')
+
+# rows parsed from each page on the last run, kept next to the pages
+PARSED_PAGES = "parsed.json"
 
 '''
 td__name -> Name
@@ -87,12 +105,34 @@ CASE_HEADERS = [
     "internal_bays"
 ]
 
+PRODUCTS = {
+    "case": CASE_HEADERS,
+    "cpu": CPU_HEADERS,
+    "cpu-cooler": CPU_COOLER_HEADERS,
+    "internal-hard-drive": INTERNAL_HARD_DRIVE_HEADERS,
+    "memory": MEMORY_HEADERS,
+    "motherboard": MOTHERBOARD_HEADERS,
+    "power-supply": POWER_SUPPLY_HEADERS,
+    "video-card": VIDEO_CARD_HEADERS,
+}
+
 def ensure_text(cell, tag=None):
     if not cell:
         return "None"
     text = cell.get_text(strip=True) if cell else "None"
     return text if text else "None"
 
+def row_cells(row):
+    '''
+    Maps every class of the row's cells to the first cell that has it, so that each cell
+    is looked up in one pass over the row rather than one row.find per cell.
+    '''
+    cells = {}
+    for cell in row.find_all('td'):
+        for cls in cell.get('class', []):
+            cells.setdefault(cls, cell)
+    return cells
+
 def get_product_details(rows, spec_count, spec_headers):
     '''
     Input:
@@ -107,9 +147,10 @@ def get_product_details(rows, spec_count, spec_headers):
     products = []
 
     for row in rows:
-        title_cell = row.find('td', class_='td__name')
-        price_cell = row.find('td', class_='td__price')
-        rating_cell = row.find('td', class_='td__rating')
+        cells = row_cells(row)
+        title_cell = cells.get('td__name')
+        price_cell = cells.get('td__price')
+        rating_cell = cells.get('td__rating')
 
         # extract title from <p> tag
         title_cell = title_cell.find('p')
@@ -133,7 +174,7 @@ def get_product_details(rows, spec_count, spec_headers):
         # extract spec values
         specs = []
         for i in range(1, spec_count+1):
-            spec_cell = row.find('td', class_=f'td__spec--{i}')
+            spec_cell = cells.get(f'td__spec--{i}')
             cls = spec_cell.get('class', [])
             if 'td--empty' in cls:
                 specs.append("None")
@@ -159,33 +200,139 @@ def get_product_details(rows, spec_count, spec_headers):
 
     return products
 
-def parse(product_name, spec_headers):
-    data_path = f"./parsed/{product_name}.csv"
-    pages_path = f"./pages/{product_name}"
-
-    pages = len(os.listdir(pages_path))
-    headers = [
-        'title',
-        'rating',
-        'price'
-    ] + spec_headers
-
-    # write header row
-    with open(data_path, 'w', newline='') as f:
-        writer = csv.DictWriter(f, headers)
-        writer.writeheader()
-
-    for i in range(1, pages+1):
-        with open(f"{pages_path}/page{i}.txt", "rb") as f:
-            response = f.read()
-        soup = BeautifulSoup(str(response), 'html.parser')
-        rows = soup.find_all('tr', class_='tr__product')
-
-        products = get_product_details(rows, len(spec_headers), spec_headers)
+def product_rows(page):
+    '''
+    Cuts the page down to the span from the first product row to the end of the last one,
+    which is most of the parsing saved. The whole page is kept if the rows can't be found.
+    '''
+    first = page.find('tr__product')
+    last = page.rfind('tr__product')
+    start = page.rfind('<tr', 0, first)
+    end = page.find('</tr>', last)
+    if first == -1 or start == -1 or end == -1:
+        return page
+    return page[start:end + len('</tr>')]
+
+def parse_page(path, spec_headers):
+    '''
+    Parses one saved page into its products. Runs in the worker processes, so it only takes picklable arguments.
+    '''
+    with open(path, "rb") as f:
+        response = f.read()
+    # only the product rows are built into a tree, the rest of the page is skipped over
+    soup = BeautifulSoup(product_rows(str(response)), PARSER, parse_only=PRODUCT_ROWS)
+    rows = soup.find_all('tr', class_='tr__product')
+    return get_product_details(rows, len(spec_headers), spec_headers)
+
+def page_paths(pages_path):
+    '''
+    The saved pages of a product, in page order.
+    '''
+    pages = {}
+    for name in os.listdir(pages_path):
+        match = re.fullmatch(r"page(\d+)\.txt", name)
+        if match:
+            pages[int(match.group(1))] = os.path.join(pages_path, name)
+    return [pages[i] for i in sorted(pages)]
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def load_parsed_pages(product_name):
+    '''
+    The rows parsed from each page of a product on the last run, with the hash of the page they came from.
+    '''
+    try:
+        with open(f"./pages/{product_name}/{PARSED_PAGES}") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_parsed_pages(product_name, parsed):
+    path = f"./pages/{product_name}/{PARSED_PAGES}"
+    with open(path + ".tmp", "w") as f:
+        json.dump(parsed, f)
+    os.replace(path + ".tmp", path)
+
+def parse_all(products, workers=None, reuse=True):
+    '''
+    Parses the saved pages of every product in products (product name -> spec headers) into ./parsed/<product>.csv.
 
-        with open(data_path, 'a', newline='') as f:
-            writer = csv.DictWriter(f, headers)
-            writer.writerows(products)
+    Pages of all the products are spread across a pool of worker processes. Their rows come back
+    in page order and are written as they arrive, through one open writer per product, to a temporary file
+    that replaces the CSV once every page has been parsed, so a run that fails leaves the last CSVs whole.
+    Pages whose content hasn't changed since the last run reuse the rows parsed from them then, unless reuse is False.
+    '''
+    writers = {}
+    files = []
+    jobs = []
+    parsed = {}
+    for product_name, spec_headers in products.items():
+        headers = [
+            'title',
+            'rating',
+            'price'
+        ] + spec_headers
+        paths = page_paths(f"./pages/{product_name}")
+        previous = load_parsed_pages(product_name) if reuse else {}
+        parsed[product_name] = {}
+        for path in paths:
+            page = os.path.basename(path)
+            digest = file_hash(path)
+            cached = previous.get(page)
+            rows = cached["rows"] if cached and cached["sha256"] == digest and cached["headers"] == headers else None
+            jobs.append((product_name, page, digest, rows))
+
+        f = open(f"./parsed/{product_name}.csv.tmp", 'w', newline='')
+        files.append(f)
+        writers[product_name] = csv.DictWriter(f, headers)
+        writers[product_name].writeheader()
+
+    to_parse = [(product_name, page) for product_name, page, _, rows in jobs if rows is None]
+    counts = {product_name: [0, 0, 0] for product_name in products}
+    start = time.time()
+    executor = None
+    try:
+        if workers == 1:
+            results = (parse_page(f"./pages/{product_name}/{page}", products[product_name]) for product_name, page in to_parse)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(
+                parse_page,
+                [f"./pages/{product_name}/{page}" for product_name, page in to_parse],
+                [products[product_name] for product_name, _ in to_parse],
+                chunksize=4,
+            )
+
+        for product_name, page, digest, rows in jobs:
+            if rows is None:
+                rows = next(results)
+            else:
+                counts[product_name][2] += 1
+            writers[product_name].writerows(rows)
+            headers = writers[product_name].fieldnames
+            parsed[product_name][page] = {"sha256": digest, "headers": headers, "rows": rows}
+            counts[product_name][0] += 1
+            counts[product_name][1] += len(rows)
+    finally:
+        if executor:
+            executor.shutdown()
+        for f in files:
+            f.close()
+    elapsed = time.time() - start
+
+    for product_name in products:
+        os.replace(f"./parsed/{product_name}.csv.tmp", f"./parsed/{product_name}.csv")
+        save_parsed_pages(product_name, parsed[product_name])
+
+    for product_name, (pages, rows, unchanged) in counts.items():
+        print(f"{product_name}: {pages} pages ({unchanged} unchanged), {rows} products")
+    print(f"Parsed {len(to_parse)} pages with {PARSER} in {round(elapsed, 3)}s ({round(len(to_parse) / max(elapsed, 1e-9), 1)} pages/sec)")
+    return counts
+
+def parse(product_name, spec_headers, workers=None):
+    return parse_all({product_name: spec_headers}, workers)
 
 if __name__ == "__main__":
     '''
@@ -198,5 +345,18 @@ if __name__ == "__main__":
     - motherboard
     - power-supply
     - video-card
+
+    python parser.py [product ...] [--workers N]
+    With no product names, every product with saved pages under ./pages is parsed.
     '''
-    parse("internal-hard-drive", INTERNAL_HARD_DRIVE_HEADERS)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("products", nargs="*", help="product names, see above")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to one per CPU; 1 parses in this process")
+    parser.add_argument("--all-pages", action="store_true", help="re-parse pages that haven't changed since the last run")
+    args = parser.parse_args()
+
+    for name in args.products:
+        if name not in PRODUCTS:
+            parser.error(f"unknown product {name}, expected one of {', '.join(PRODUCTS)}")
+    names = args.products or [name for name in PRODUCTS if os.path.isdir(f"./pages/{name}")]
+    parse_all({name: PRODUCTS[name] for name in names}, args.workers, reuse=not args.all_pages)
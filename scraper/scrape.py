@@ -1,32 +1,189 @@
 import os
+import json
 import time
+import random
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from tqdm import tqdm
-from firecrawl import FirecrawlApp, ScrapeOptions 
+from parser import product_rows
 
 load_dotenv("../.env")
 APIKEY = os.getenv("FIRECRAWL_KEY")
 
-def scrape_all(product, pages):
-    for i in tqdm(range(60, pages+1), desc="Scraping pages"):
-        app = FirecrawlApp(api_key=APIKEY)
-        response = app.scrape_url(f'https://pcpartpicker.com/products/{product}/#page={i}', formats=['html'])
-        with open(f"./pages/{product}/page{i}.txt", "w") as f:
-            f.write(str(response))
-            f.close()
-
-def scrape_one(product, page):
-    app = FirecrawlApp(api_key=APIKEY)
-    i = page
-    response = app.scrape_url(f'https://pcpartpicker.com/products/{product}/#page={i}', formats=['html'])
-    with open(f"./pages/{product}/page{i}.txt", "w") as f:
-        f.write(str(response))
-        f.close()
-
-start = time.time()
-print("Starting to scrape...")
-
-scrape_all("internal-hard-drive", 64)
-
-end = time.time()
-print(f"Done! Time elapsed: {round(end-start, 3)}s")
\ No newline at end of file
+PRODUCT_URL = "https://pcpartpicker.com/products/{product}/#page={page}"
+
+# fetched pages and their hashes, kept next to the pages of each product
+MANIFEST = "manifest.json"
+
+class FirecrawlFetcher:
+    '''
+    Fetches pages through Firecrawl, with one client shared by every page and thread.
+    '''
+    def __init__(self, api_key=APIKEY):
+        # firecrawl is only needed for real scrapes, not against a local server
+        from firecrawl import FirecrawlApp
+        self.app = FirecrawlApp(api_key=api_key)
+
+    def __call__(self, product, page):
+        response = self.app.scrape_url(PRODUCT_URL.format(product=product, page=page), formats=['html'])
+        return str(response)
+
+class HTTPFetcher:
+    '''
+    Fetches pages with plain GETs, e.g. from a local server of saved pages:
+    HTTPFetcher("http://127.0.0.1:8000/{product}/page{page}.txt")
+    '''
+    def __init__(self, url, timeout=30):
+        import httpx
+        self.url = url
+        self.client = httpx.Client(timeout=timeout)
+
+    def __call__(self, product, page):
+        response = self.client.get(self.url.format(product=product, page=page))
+        response.raise_for_status()
+        return response.text
+
+def content_hash(text):
+    '''
+    Hash of the product rows of a page, so that a page only counts as changed when its products do.
+    '''
+    return hashlib.sha256(product_rows(text).encode()).hexdigest()
+
+class Manifest:
+    '''
+    Hash and fetch time of every page of a product, along with the range and start time of the
+    current run. Saved after every page, so an interrupted run can pick up where it stopped.
+    '''
+    def __init__(self, product):
+        self.path = f"./pages/{product}/{MANIFEST}"
+        self.lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.data = {"run": None, "pages": {}}
+
+    def start(self, first, last, resume=True):
+        '''
+        Starts a run over pages first to last, or carries on with the last one if it didn't finish.
+        Returns the pages that still need fetching.
+        '''
+        run = self.data["run"]
+        if not (resume and run and not run["finished"] and run["pages"] == [first, last]):
+            run = self.data["run"] = {"pages": [first, last], "started": time.time(), "finished": None}
+            self.save()
+        done = {int(page) for page, entry in self.data["pages"].items() if entry["fetched"] >= run["started"]}
+        return [page for page in range(first, last + 1) if page not in done]
+
+    def changed(self, page, digest):
+        entry = self.data["pages"].get(str(page))
+        return entry is None or entry["sha256"] != digest
+
+    def update(self, page, digest):
+        '''
+        Records a fetched page, once it's safely on disk.
+        '''
+        with self.lock:
+            entry = self.data["pages"].get(str(page))
+            changed = entry is None or entry["sha256"] != digest
+            now = time.time()
+            self.data["pages"][str(page)] = {
+                "sha256": digest,
+                "fetched": now,
+                "changed": now if changed else entry["changed"],
+            }
+            self.save()
+
+    def finish(self):
+        self.data["run"]["finished"] = time.time()
+        self.save()
+
+    def save(self):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+def fetch_with_retry(fetcher, product, page, retries=3, backoff=1.0):
+    '''
+    Calls the fetcher, retrying failures with exponential backoff and jitter.
+    '''
+    for attempt in range(retries + 1):
+        try:
+            return fetcher(product, page)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            tqdm.write(f"page {page} failed ({str(e).splitlines()[0]}), retrying in {round(delay, 1)}s")
+            time.sleep(delay)
+
+def scrape_all(product, pages, start=1, fetcher=None, concurrency=4, retries=3, backoff=1.0, resume=True):
+    '''
+    Fetches pages start to pages of a product into ./pages/<product>/page<i>.txt, concurrency at a time.
+
+    A page whose products haven't changed since it was last fetched is left as it is on disk,
+    so the parser reuses the rows it already has for it. Pages that fail after every retry
+    are reported and left for the next run, which resumes the same range unless resume is False.
+    '''
+    fetcher = fetcher or FirecrawlFetcher()
+    os.makedirs(f"./pages/{product}", exist_ok=True)
+    manifest = Manifest(product)
+    todo = manifest.start(start, pages, resume)
+    counts = {"changed": 0, "unchanged": 0, "resumed": pages - start + 1 - len(todo), "failed": 0}
+
+    def fetch(page):
+        text = fetch_with_retry(fetcher, product, page, retries, backoff)
+        path = f"./pages/{product}/page{page}.txt"
+        digest = content_hash(text)
+        changed = manifest.changed(page, digest)
+        if changed or not os.path.exists(path):
+            with open(path + ".tmp", "w") as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+        manifest.update(page, digest)
+        return changed
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(fetch, page): page for page in todo}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Scraping pages"):
+            try:
+                counts["changed" if future.result() else "unchanged"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                tqdm.write(f"page {futures[future]} failed: {str(e).splitlines()[0]}")
+
+    if not counts["failed"]:
+        manifest.finish()
+    return counts
+
+def scrape_one(product, page, fetcher=None):
+    return scrape_all(product, page, start=page, fetcher=fetcher, resume=False)
+
+if __name__ == "__main__":
+    '''
+    python scrape.py internal-hard-drive 64 [--start 1] [--concurrency 4] [--url URL]
+    With --url, pages are fetched from URL (formatted with {product} and {page}) instead of through Firecrawl.
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument("product")
+    parser.add_argument("pages", type=int, help="last page to fetch")
+    parser.add_argument("--start", type=int, default=1, help="first page to fetch")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="seconds before the first retry, doubled for each one after")
+    parser.add_argument("--restart", action="store_true", help="start over instead of resuming an interrupted run")
+    parser.add_argument("--url", help="e.g. http://127.0.0.1:8000/{product}/page{page}.txt")
+    args = parser.parse_args()
+
+    start = time.time()
+    print("Starting to scrape...")
+
+    fetcher = HTTPFetcher(args.url) if args.url else FirecrawlFetcher()
+    counts = scrape_all(args.product, args.pages, args.start, fetcher, args.concurrency, args.retries, args.backoff, resume=not args.restart)
+
+    end = time.time()
+    print(", ".join(f"{count} {kind}" for kind, count in counts.items()))
+    print(f"Done! Time elapsed: {round(end-start, 3)}s")
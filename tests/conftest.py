@@ -0,0 +1,4 @@
+import os
+
+# nothing here calls the model, but the clients need a key to be made
+os.environ.setdefault("GROQ_KEY", "stub")
@@ -0,0 +1,101 @@
+import itertools
+import functools
+import numpy as np
+import pandas as pd
+import pytest
+from api import builds
+from api.builds import best_builds, row_prices, part_scores
+from api.catalog import current
+from api.components import PCRequirements
+from benchmarks.stub_llm import REQUIREMENTS
+
+NAMES = ("cpu", "cooler", "storage", "memory", "motherboard")
+
+@pytest.fixture(scope="module")
+def requirements():
+    return PCRequirements.model_validate(REQUIREMENTS).model_dump()
+
+def compatible(compatibility, cpu: int, board: int, kit: int) -> bool:
+    return bool(compatibility.board_sockets[board] & compatibility.cpu_sockets[cpu]) and bool(compatibility.kits(compatibility.board_groups[board])[kit])
+
+def brute_force(catalog, rows: dict, requirements: dict, budget: float) -> list:
+    '''
+    The score and price of every compatible build within budget, best first.
+    '''
+    prices = {name: row_prices(catalog, name) for name in NAMES}
+    scores = {name: part_scores(catalog, name, requirements.get(name)).astype(np.float64) for name in NAMES}
+    found = []
+    for parts in itertools.product(*(rows[name] for name in NAMES)):
+        build = dict(zip(NAMES, parts))
+        if not compatible(catalog.compatibility, build["cpu"], build["motherboard"], build["memory"]):
+            continue
+        price = sum(prices[name][row] for name, row in build.items())
+        score = sum(scores[name][row] for name, row in build.items())
+        if price <= budget and np.isfinite(score):
+            found.append((score, price))
+    return sorted(found, reverse=True)
+
+def random_rows(catalog, rng: np.random.Generator, size: int) -> dict:
+    '''
+    size random rows of each table, around half of the CPUs, boards and kits drawn to fit one priced board,
+    since rows drawn at random almost never make a build.
+    '''
+    compatibility = catalog.compatibility
+    priced = {name: np.flatnonzero(np.isfinite(row_prices(catalog, name))) for name in NAMES}
+    while True:
+        board = int(rng.choice(priced["motherboard"]))
+        fitting = {
+            "cpu": np.intersect1d(np.flatnonzero(compatibility.cpu_sockets & compatibility.board_sockets[board]), priced["cpu"]),
+            "memory": np.intersect1d(np.flatnonzero(compatibility.kits(compatibility.board_groups[board])), priced["memory"]),
+            "motherboard": np.intersect1d(np.flatnonzero(compatibility.board_groups == compatibility.board_groups[board]), priced["motherboard"]),
+        }
+        if all(len(fits) for fits in fitting.values()):
+            break
+    rows = {}
+    for name in NAMES:
+        drawn = rng.choice(priced[name], size=size, replace=False)
+        if name in fitting:
+            drawn = np.concatenate([rng.choice(fitting[name], size=min(len(fitting[name]), size // 2 + 1), replace=False), drawn])
+        rows[name] = pd.unique(drawn)[:size]
+    return rows
+
+@pytest.mark.parametrize("chunk", [7, builds.TRIPLE_CHUNK])
+def test_top_k_matches_brute_force(requirements, monkeypatch, chunk):
+    # a small chunk splits the triples of one board group, which a large one never does on rows this few
+    monkeypatch.setattr(builds, "triples", functools.partial(builds.triples, chunk=chunk))
+    catalog = current()
+    rng = np.random.default_rng(3)
+    for _ in range(15):
+        rows = random_rows(catalog, rng, 7)
+        budget = float(rng.uniform(400, 2500))
+        expected = brute_force(catalog, rows, requirements, budget)[:5]
+        # a pool as big as the rows searches everything the staircase would otherwise drop
+        found = best_builds(catalog, rows, requirements, budget, k=5, pool=7)
+        assert [score for score, _, _ in found] == pytest.approx([round(score, 4) for score, _ in expected], abs=2e-4)
+
+def test_best_build_is_found_with_the_smallest_pool(requirements):
+    catalog = current()
+    rng = np.random.default_rng(5)
+    for _ in range(15):
+        rows = random_rows(catalog, rng, 7)
+        budget = float(rng.uniform(400, 2500))
+        expected = brute_force(catalog, rows, requirements, budget)[:1]
+        found = best_builds(catalog, rows, requirements, budget, k=1, pool=1)
+        assert [score for score, _, _ in found] == pytest.approx([round(score, 4) for score, _ in expected], abs=2e-4)
+
+def test_builds_fit_together_and_the_budget(requirements):
+    catalog = current()
+    rows = {name: np.arange(len(catalog[name])) for name in NAMES}
+    found = best_builds(catalog, rows, requirements, budget=1000, k=10)
+    assert len(found) == 10
+    assert [score for score, _, _ in found] == sorted((score for score, _, _ in found), reverse=True)
+    assert len({tuple(parts.values()) for _, _, parts in found}) == 10
+    for _, price, parts in found:
+        assert price <= 1000
+        assert price == pytest.approx(sum(float(catalog[name]["price"].iloc[row]) for name, row in parts.items()), abs=0.01)
+        assert compatible(catalog.compatibility, parts["cpu"], parts["motherboard"], parts["memory"])
+
+def test_no_builds_when_nothing_fits_the_budget(requirements):
+    catalog = current()
+    rows = {name: np.arange(len(catalog[name])) for name in NAMES}
+    assert best_builds(catalog, rows, requirements, budget=50, k=5) == []
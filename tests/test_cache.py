@@ -0,0 +1,95 @@
+import json
+import sqlite3
+from api import cache
+from api.cache import LRUCache, make_key
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_make_key_is_stable_and_order_free():
+    assert make_key({"a": 1, "b": 2}, "x") == make_key({"b": 2, "a": 1}, "x")
+    assert make_key("a", "b") != make_key("b", "a")
+
+def test_lru_evicts_the_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert lru.stats()["evictions"] == 1
+
+def test_lru_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    lru = LRUCache(maxsize=4, ttl=60)
+    lru.set("a", 1)
+    clock.now += 59
+    assert lru.get("a") == 1
+    clock.now += 2
+    assert lru.get("a") is None
+    assert lru.stats()["size"] == 0
+
+def test_lru_persists_to_sqlite(tmp_path):
+    path = tmp_path / "cache.db"
+    first = LRUCache(maxsize=4, path=str(path))
+    first.set("a", {"min_capacity_gb": 16})
+
+    # a new process (or worker) opening the same file sees what the first one wrote
+    second = LRUCache(maxsize=4, path=str(path))
+    assert second.get("a") == {"min_capacity_gb": 16}
+    assert second.get("b") is None
+
+def test_lru_persisted_entries_expire(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    path = str(tmp_path / "cache.db")
+    LRUCache(maxsize=4, ttl=60, path=path).set("a", 1)
+    clock.now += 61
+    assert LRUCache(maxsize=4, ttl=60, path=path).get("a") is None
+
+def test_lru_persists_with_custom_encoding(tmp_path):
+    path = str(tmp_path / "cache.db")
+    encode, decode = lambda v: json.dumps(sorted(v)), lambda s: set(json.loads(s))
+    LRUCache(path=path, encode=encode, decode=decode).set("a", {3, 1, 2})
+    assert LRUCache(path=path, encode=encode, decode=decode).get("a") == {1, 2, 3}
+
+def test_lru_clear_empties_the_database(tmp_path):
+    path = str(tmp_path / "cache.db")
+    lru = LRUCache(path=path)
+    lru.set("a", 1)
+    lru.clear()
+    assert LRUCache(path=path).get("a") is None
+
+def rows(path) -> set:
+    with sqlite3.connect(path) as db:
+        return {key for key, in db.execute("SELECT key FROM cache")}
+
+def test_lru_database_keeps_the_newest_maxsize_rows(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    path = str(tmp_path / "cache.db")
+    lru = LRUCache(maxsize=2, path=path)
+    for key in "abc":
+        clock.now += 1
+        lru.set(key, key)
+    assert rows(path) == {"b", "c"}
+    assert lru.get("a") is None
+
+def test_lru_database_drops_expired_rows(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    path = str(tmp_path / "cache.db")
+    lru = LRUCache(maxsize=4, ttl=60, path=path)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    clock.now += 61
+    assert lru.get("a") is None
+    assert rows(path) == {"b"}
+    lru.set("c", 3)
+    assert rows(path) == {"c"}
@@ -0,0 +1,51 @@
+import time
+import asyncio
+import pytest
+from api import extraction, llm, metrics
+from api.components import requirement_models
+from benchmarks.stub_llm import StubLLM, REQUIREMENTS
+
+TIMEOUT = 1.0
+
+def failures(component: str, reason: str) -> float:
+    return metrics.extraction_failures.values.get((component, reason), 0)
+
+@pytest.fixture
+def stub(monkeypatch):
+    '''
+    The stub chat-completions server, where memory requirements never come back and storage requirements come back
+    as broken JSON, with the extraction clients pointed at it through GROQ_BASE_URL.
+    '''
+    stub = StubLLM(latency=0.05, jitter=0, faults={"MemoryRequirements": "hang", "StorageRequirements": "invalid"}).start()
+    monkeypatch.setattr(llm, "GROQ_BASE_URL", stub.url)
+    monkeypatch.setattr(extraction, "client", llm.LazyClient(llm.build_client))
+    monkeypatch.setattr(extraction, "aclient", llm.LazyClient(llm.build_aclient))
+    # built before the clock starts, since importing instructor takes a while
+    extraction.client.get()
+    extraction.aclient.get()
+    yield stub
+    stub.stop()
+
+def check(responses: dict, elapsed: float, before: tuple):
+    assert responses["memory"] is None and responses["storage"] is None
+    for name in ("cpu", "cooler", "motherboard"):
+        assert responses[name] == requirement_models().components[name].model_validate(REQUIREMENTS[name]).model_dump()
+    # every call shares the one deadline, which the hanging call doesn't hold up
+    assert TIMEOUT <= elapsed < TIMEOUT + 0.5
+    assert (failures("memory", "timeout"), failures("storage", "error")) == (before[0] + 1, before[1] + 1)
+
+def test_failed_components_come_back_as_none_by_the_deadline(stub):
+    before = failures("memory", "timeout"), failures("storage", "error")
+    start = time.perf_counter()
+    responses = extraction.call_to_models(extraction.build_messages("a pc"), requirement_models().components, timeout=TIMEOUT)
+    check(responses, time.perf_counter() - start, before)
+
+def test_async_failed_components_come_back_as_none_by_the_deadline(stub):
+    before = failures("memory", "timeout"), failures("storage", "error")
+
+    async def run():
+        start = time.perf_counter()
+        responses = await extraction.acall_to_models(extraction.build_messages("a pc"), requirement_models().components, timeout=TIMEOUT)
+        return responses, time.perf_counter() - start
+
+    check(*asyncio.run(run()), before)
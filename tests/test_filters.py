@@ -0,0 +1,133 @@
+'''
+The indexed filters against the pandas filters they replaced, run on the raw CSVs.
+'''
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from api import filters
+from api.catalog import current
+from api.config import data_path
+from api.utils import convert_to_enum_name
+
+# the filters as they were before the query engine, down to the .astype(float) calls
+
+def baseline_filter_cpu(df, min_cores=0, min_core_clock_ghz=0, min_boost_clock_ghz=0, microarchitecture=None, max_tdp_watts=math.inf, max_price=math.inf):
+    masks = [
+        df["core_count"] >= (min_cores or 0),
+        df["performance_core_clock"] >= (min_core_clock_ghz or 0),
+        df["performance_core_boost_clock"] >= (min_boost_clock_ghz or 0),
+        df["tdp"] <= (max_tdp_watts if max_tdp_watts is not None else math.inf),
+        df["price"].astype(float) <= (max_price if max_price is not None else math.inf),
+    ]
+    if microarchitecture:
+        masks.append(df["microarchitecture"].apply(convert_to_enum_name).isin(microarchitecture))
+    return df.loc[pd.concat(masks, axis=1).all(axis=1)]
+
+def baseline_filter_cooler(df, min_fan_rpm=0, max_noise_level_db=math.inf, max_radiator_size_mm=math.inf, max_price=math.inf):
+    masks = [
+        df["average_fan_rpm"] >= (min_fan_rpm or 0),
+        df["average_noise_level"] <= (max_noise_level_db if max_noise_level_db is not None else math.inf),
+        df["radiator_size"] <= (max_radiator_size_mm if max_radiator_size_mm is not None else math.inf),
+        df["price"].astype(float) <= (max_price if max_price is not None else math.inf),
+    ]
+    return df.loc[pd.concat(masks, axis=1).all(axis=1)]
+
+def baseline_filter_storage(df, min_capacity_gb=0, preferred_type=None, min_cache_gb=0, preferred_form_factor=None, preferred_interface=None, max_price_per_gb=math.inf):
+    masks = [
+        df["capacity_gb"].astype(float) >= (min_capacity_gb or 0),
+        df["cache_gb"].astype(float) >= (min_cache_gb or 0),
+        df["price_per_gb"].astype(float) <= (max_price_per_gb if max_price_per_gb is not None else math.inf),
+    ]
+    for col, values in (("type", preferred_type), ("form_factor", preferred_form_factor), ("interface", preferred_interface)):
+        if values is not None:
+            masks.append(df[col].apply(convert_to_enum_name).isin(values))
+    return df.loc[pd.concat(masks, axis=1).all(axis=1)]
+
+def baseline_filter_memory(df, min_capacity_gb=0, max_module_count=0, max_cas_latency=math.inf, max_price=math.inf):
+    # the baseline had no speed filter yet, so speed is left out of the cases
+    masks = [
+        df["total_ram"] >= (min_capacity_gb or 0),
+        df["module_count"] <= (max_module_count if max_module_count is not None else math.inf),
+        df["cas_latency"] <= (max_cas_latency if max_cas_latency is not None else math.inf),
+        df["price"].astype(float) <= (max_price if max_price is not None else math.inf),
+    ]
+    return df.loc[pd.concat(masks, axis=1).all(axis=1)]
+
+def baseline_filter_motherboard(df, preferred_socket=None, preferred_form_factor=None, min_max_memory_gb=0, min_memory_slots=0, max_price=math.inf):
+    masks = [
+        df["max_memory_gb"].astype(float) >= (min_max_memory_gb or 0),
+        df["memory_slots"] >= (min_memory_slots or 0),
+        df["price"] <= (max_price if max_price is not None else math.inf),
+    ]
+    if preferred_socket:
+        masks.append(df["cpu_socket"].apply(convert_to_enum_name).isin(preferred_socket))
+    if preferred_form_factor:
+        masks.append(df["form_factor"].apply(convert_to_enum_name).isin(preferred_form_factor))
+    return df.loc[pd.concat(masks, axis=1).all(axis=1)]
+
+BASELINES = {
+    "cpu": baseline_filter_cpu,
+    "cooler": baseline_filter_cooler,
+    "storage": baseline_filter_storage,
+    "memory": baseline_filter_memory,
+    "motherboard": baseline_filter_motherboard,
+}
+
+# requirement -> (column, whether it is an enum); ranges are bounded by a value the column has, the hardest case
+REQUIREMENTS = {
+    "cpu": {"min_cores": ("core_count", False), "min_core_clock_ghz": ("performance_core_clock", False),
+            "min_boost_clock_ghz": ("performance_core_boost_clock", False), "microarchitecture": ("microarchitecture", True),
+            "max_tdp_watts": ("tdp", False), "max_price": ("price", False)},
+    "cooler": {"min_fan_rpm": ("average_fan_rpm", False), "max_noise_level_db": ("average_noise_level", False),
+               "max_radiator_size_mm": ("radiator_size", False), "max_price": ("price", False)},
+    "storage": {"min_capacity_gb": ("capacity_gb", False), "preferred_type": ("type", True), "min_cache_gb": ("cache_gb", False),
+                "preferred_form_factor": ("form_factor", True), "preferred_interface": ("interface", True),
+                "max_price_per_gb": ("price_per_gb", False)},
+    "memory": {"min_capacity_gb": ("total_ram", False), "max_module_count": ("module_count", False),
+               "max_cas_latency": ("cas_latency", False), "max_price": ("price", False)},
+    "motherboard": {"preferred_socket": ("cpu_socket", True), "preferred_form_factor": ("form_factor", True),
+                    "min_max_memory_gb": ("max_memory_gb", False), "min_memory_slots": ("memory_slots", False),
+                    "max_price": ("price", False)},
+}
+
+@pytest.fixture(scope="module")
+def raw_tables():
+    return {name: pd.read_csv(data_path / f"{name}.csv") for name in BASELINES}
+
+def random_requirements(name: str, df: pd.DataFrame, rng: np.random.Generator) -> dict:
+    requirements = {}
+    for requirement, (col, is_enum) in REQUIREMENTS[name].items():
+        if rng.random() < 0.5:
+            continue
+        values = df[col].dropna().unique()
+        if is_enum:
+            requirements[requirement] = [convert_to_enum_name(v) for v in rng.choice(values, size=min(len(values), rng.integers(1, 4)), replace=False)]
+        else:
+            requirements[requirement] = float(rng.choice(values))
+    return requirements
+
+@pytest.mark.parametrize("name", list(BASELINES))
+def test_filters_match_the_baseline(name, raw_tables):
+    raw, table = raw_tables[name], current()[name]
+    rng = np.random.default_rng(sum(map(ord, name)))
+    cases = [{}] + [random_requirements(name, raw, rng) for _ in range(150)]
+    for requirements in cases:
+        expected = BASELINES[name](raw, **requirements).index.to_list()
+        got = filters.QUERIES[name](**requirements)
+        assert current().index(table).filter(*got)["item_id"].to_list() == expected, requirements
+
+@pytest.mark.parametrize("name", list(BASELINES))
+def test_limit_takes_the_first_matching_rows(name):
+    table = current()[name]
+    ranges, enums = filters.QUERIES[name]()
+    index = current().index(table)
+    everything = index.filter(ranges, enums)["item_id"].to_list()
+    assert index.filter(ranges, enums, limit=10)["item_id"].to_list() == everything[:10]
+
+def test_enum_members_and_names_select_the_same_rows():
+    members = [m for m in current().enum_values["storage_types"] if m != "SSD"][:2]
+    index = current().index(current()["storage"])
+    by_value = index.select(enums=[("type", members)])
+    by_name = index.select(enums=[("type", [convert_to_enum_name(m) for m in members])])
+    assert len(by_value) and by_value.tolist() == by_name.tolist()
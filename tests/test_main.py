@@ -0,0 +1,94 @@
+import json
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from api import main
+from api.limits import ConcurrencyLimiter
+
+class CountingLimiter(ConcurrencyLimiter):
+    def __init__(self):
+        super().__init__(max_concurrent=4, max_queued=4, timeout=1)
+        self.held = 0
+
+    async def acquire(self):
+        await super().acquire()
+        self.held += 1
+
+    def release(self):
+        self.held -= 1
+        super().release()
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setattr(main, "limiter", limiter)
+    return limiter
+
+@pytest.fixture
+def pipeline(monkeypatch, limiter):
+    '''
+    Stands in for the recommendation pipeline, recording how many limiter slots were held while it ran.
+    '''
+    held = []
+
+    async def astream_recommendation(message, model, budget=None):
+        held.append(limiter.held)
+        yield "requirements", {"message": message}
+        held.append(limiter.held)
+        yield "choices", {"budget": budget}
+
+    async def abatch_recommendations(messages, model, budget=None):
+        for i, message in enumerate(messages):
+            held.append(limiter.held)
+            yield i, {"message": message}, None
+
+    monkeypatch.setattr(main, "astream_recommendation", astream_recommendation)
+    monkeypatch.setattr(main, "abatch_recommendations", abatch_recommendations)
+    return held
+
+def test_stream_holds_a_slot_until_it_is_done(limiter, pipeline):
+    response = TestClient(main.app).get("/recommend/stream", params={"message": "a pc", "budget": 900})
+    assert response.status_code == 200
+    assert "event: choices\ndata: {\"budget\": 900.0}" in response.text
+    assert pipeline == [1, 1]
+    assert limiter.held == 0
+
+def test_batch_holds_a_slot_until_it_is_done(limiter, pipeline):
+    response = TestClient(main.app).post("/recommend/batch", json={"messages": ["a", "b", "c"]})
+    assert response.status_code == 200
+    assert [json.loads(line)["index"] for line in response.text.splitlines()] == [0, 1, 2]
+    assert pipeline == [1, 1, 1]
+    assert limiter.held == 0
+
+def test_oversized_batches_give_their_slot_back(limiter, pipeline):
+    response = TestClient(main.app).post("/recommend/batch", json={"messages": ["a"] * (main.MAX_BATCH_SIZE + 1)})
+    assert response.status_code == 413
+    assert limiter.held == 0
+
+async def held_after_gone_client(limiter, method: str, path: str, query: bytes = b"", body: bytes = b"") -> int:
+    '''
+    Calls the app as a client that has gone before the response starts, so the body is never sent, and returns
+    how many slots are still held once it returns. That is checked before the event loop closes, since closing it
+    finalises abandoned body generators, which a server that keeps running never does.
+    '''
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query, "root_path": "",
+        "headers": [(b"content-type", b"application/json")], "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        raise OSError("client disconnected")
+
+    with pytest.raises(OSError):
+        await main.app(scope, receive, send)
+    return limiter.held
+
+def test_stream_gives_its_slot_back_when_the_body_never_runs(limiter, pipeline):
+    assert asyncio.run(held_after_gone_client(limiter, "GET", "/recommend/stream", query=b"message=a+pc")) == 0
+
+def test_batch_gives_its_slot_back_when_the_body_never_runs(limiter, pipeline):
+    assert asyncio.run(held_after_gone_client(limiter, "POST", "/recommend/batch", body=b'{"messages": ["a"]}')) == 0
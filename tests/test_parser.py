@@ -0,0 +1,52 @@
+'''
+parse_all on saved pages, in the scraper's layout under a temporary directory.
+'''
+import os
+import sys
+import pytest
+
+# the scraper runs as a script from its own directory, importing its parser as a top-level module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scraper"))
+import parser
+
+PRODUCT = "cpu"
+
+def save_page(page: int, name: str):
+    with open(f"./pages/{PRODUCT}/page{page}.txt", "w") as f:
+        f.write(
+            f'<html><table><tr class="tr__product"><td class="td__name"><p>{name}</p></td>'
+            '<td class="td__rating">(0)</td><td class="td__price">$100<button>Add</button></td></tr></table></html>'
+        )
+
+def parsed() -> str:
+    with open(f"./parsed/{PRODUCT}.csv") as f:
+        return f.read()
+
+@pytest.fixture(autouse=True)
+def pages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(f"./pages/{PRODUCT}")
+    os.makedirs("./parsed")
+    save_page(1, "CPU 1")
+    save_page(2, "CPU 2")
+
+def test_parses_every_page_in_order():
+    parser.parse_all({PRODUCT: []}, workers=1)
+    assert [line.split(",")[0] for line in parsed().splitlines()] == ["title", "CPU 1", "CPU 2"]
+
+def test_a_failed_run_leaves_the_last_csv_whole(monkeypatch):
+    parser.parse_all({PRODUCT: []}, workers=1)
+    last = parsed()
+    save_page(1, "CPU 1 v2")
+    save_page(2, "CPU 2 v2")
+    parse_page = parser.parse_page
+
+    def failing(path, spec_headers):
+        if path.endswith("page2.txt"):
+            raise ValueError("unreadable page")
+        return parse_page(path, spec_headers)
+
+    monkeypatch.setattr(parser, "parse_page", failing)
+    with pytest.raises(ValueError):
+        parser.parse_all({PRODUCT: []}, workers=1)
+    assert parsed() == last
@@ -0,0 +1,108 @@
+import asyncio
+import copy
+import pytest
+from types import SimpleNamespace
+from api import recommendation, catalog as catalogs
+from api.components import PCRequirements
+from benchmarks.filters import scaled_catalog
+from benchmarks.stub_llm import REQUIREMENTS
+
+MESSAGES = ["a pc with 1 tb of storage", "boom", "a pc with 16 gb of ram"]
+
+@pytest.fixture
+def batch(monkeypatch):
+    '''
+    Stands in for extraction and the model. Planning "boom" fails, and the catalog is swapped for another
+    partway through planning, as a reload would. Returns the catalog version every pick was made against.
+    '''
+    requirements = PCRequirements.model_validate(REQUIREMENTS).model_dump()
+
+    def get_requirements(message):
+        # a different pick for each message, so the batch doesn't share one
+        stated = copy.deepcopy(requirements)
+        stated["memory"]["min_capacity_gb"] = float(len(message))
+        return stated
+    served = catalogs.current()
+    replacement = scaled_catalog(2)
+    versions = []
+    find_pins = recommendation.message_pins
+
+    def message_pins(message):
+        if message == "boom":
+            monkeypatch.setattr(catalogs, "catalog", replacement)
+            raise ValueError("no pins for you")
+        return find_pins(message)
+
+    def choose_components(message, requirements, candidates, model, builds=None):
+        versions.append(catalogs.current().version)
+        return {"message": message}
+
+    async def achoose_components(message, requirements, candidates, model, builds=None):
+        return choose_components(message, requirements, candidates, model, builds)
+
+    async def aget_requirements(message):
+        return get_requirements(message)
+
+    monkeypatch.setattr(catalogs, "catalog", served)
+    monkeypatch.setattr(recommendation, "get_requirements", get_requirements)
+    monkeypatch.setattr(recommendation, "aget_requirements", aget_requirements)
+    monkeypatch.setattr(recommendation, "message_pins", message_pins)
+    monkeypatch.setattr(recommendation, "choose_components", choose_components)
+    monkeypatch.setattr(recommendation, "achoose_components", achoose_components)
+    return served.version, versions
+
+def check(results, served, versions):
+    assert sorted(results) == [0, 1, 2]
+    assert results[1][0] is None and "no pins for you" in results[1][1]
+    assert results[0] == ({"message": MESSAGES[0]}, None)
+    assert results[2] == ({"message": MESSAGES[2]}, None)
+    # the reload during the batch doesn't reach the items after it
+    assert len(versions) == 2 and set(versions) == {served}
+
+def test_a_failing_item_doesnt_stop_the_batch(batch):
+    results = {i: (recommendation, error) for i, recommendation, error in recommendation.iter_recommendations(MESSAGES, "model")}
+    check(results, *batch)
+
+def test_a_failing_item_doesnt_stop_the_async_batch(batch):
+    async def run():
+        return {i: (recommendation, error) async for i, recommendation, error in recommendation.abatch_recommendations(MESSAGES, "model")}
+    check(asyncio.run(run()), *batch)
+
+def test_candidates_batch_can_return_exceptions(monkeypatch):
+    def get_candidates(requirements, limit, pins=None):
+        if requirements == "bad":
+            raise ValueError("bad requirements")
+        return requirements
+
+    monkeypatch.setattr(recommendation, "get_candidates", get_candidates)
+    found = recommendation.get_candidates_batch(["a", "bad", "a"], 10, return_exceptions=True)
+    assert found[0] == found[2] == "a" and isinstance(found[1], ValueError)
+    with pytest.raises(ValueError):
+        recommendation.get_candidates_batch(["a", "bad"], 10)
+
+def test_stream_reports_a_model_that_streams_nothing(batch, monkeypatch):
+    served, versions = batch
+    find_candidates = recommendation.aget_candidates
+
+    async def aget_candidates(requirements, limit, pins=None):
+        versions.append(catalogs.current().version)
+        return await find_candidates(requirements, limit, pins)
+
+    async def create_partial(**kwargs):
+        return
+        yield
+
+    monkeypatch.setattr(recommendation, "aget_candidates", aget_candidates)
+    monkeypatch.setattr(recommendation, "aclient", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create_partial=create_partial))))
+
+    async def run():
+        stages = []
+        with pytest.raises(ValueError, match="no component choices"):
+            async for stage, result in recommendation.astream_recommendation("a pc", "model"):
+                stages.append(stage)
+                # a reload partway through the stream
+                monkeypatch.setattr(catalogs, "catalog", scaled_catalog(2))
+        return stages
+
+    assert asyncio.run(run()) == ["requirements", "candidates"]
+    assert versions == [served]
@@ -0,0 +1,96 @@
+import pytest
+from api.config import TEST_MESSAGE, LOCAL_EXTRACTION_CONFIDENCE
+from api import catalog as catalogs
+from api.components import requirement_models
+from api.rules import extract_rules, found_fields, read_budget, phrases_of
+from benchmarks.filters import scaled_catalog
+
+def found(message: str) -> dict:
+    requirements, _ = extract_rules(message)
+    # enum members as their values, so cases read like the messages
+    return {name: {k: [v.value for v in value] if isinstance(value, list) else value for k, value in fields.items()}
+            for name, fields in found_fields(requirements).items()}
+
+def confidence(message: str) -> float:
+    return extract_rules(message)[1]
+
+def test_reads_explicit_requirements():
+    message = "I need a Zen 4 CPU with at least 8 cores under $300, 32GB of DDR5-6000 RAM and a 2TB NVMe SSD."
+    requirements = found(message)
+    assert requirements["cpu"] == {"min_cores": 8, "microarchitecture": ["Zen 4"], "max_price": 300.0}
+    assert requirements["memory"] == {"min_capacity_gb": 32.0, "min_speed_mhz": 6000.0}
+    assert requirements["storage"]["min_capacity_gb"] == 2000.0
+    assert requirements["storage"]["preferred_type"] == ["SSD"]
+    assert confidence(message) == 1.0
+
+def test_reads_kits_latencies_and_noise():
+    assert found("A 2 x 16GB kit with CL30, and a cooler under 30 dB") == {
+        "cooler": {"max_noise_level_db": 30.0},
+        "memory": {"min_capacity_gb": 32.0, "max_module_count": 2, "max_cas_latency": 30.0},
+    }
+
+def test_prefers_the_longest_enum_name():
+    assert found("a micro-atx board") == {"motherboard": {"preferred_form_factor": ["Micro ATX"]}}
+
+def test_ties_numbers_to_the_part_named_nearest():
+    assert found("at least 1 TB of storage and 16 GB of RAM") == {
+        "storage": {"min_capacity_gb": 1000.0},
+        "memory": {"min_capacity_gb": 16.0},
+    }
+
+def test_negated_requirements_are_left_to_the_model():
+    message = "I do not want an AM4 board, give me 32GB of RAM."
+    assert found(message) == {"memory": {"min_capacity_gb": 32.0}}
+    assert confidence(message) < LOCAL_EXTRACTION_CONFIDENCE
+
+def test_vague_messages_find_nothing():
+    assert found("I want a compact gaming PC that runs quiet and doesn't cost too much.") == {}
+    assert confidence("I want a compact gaming PC that runs quiet and doesn't cost too much.") == 0.0
+
+def test_sentences_read_nothing_in_lower_the_confidence():
+    # the hints still hold what was read, but the storyboard animator and the costs go to the model
+    assert found(TEST_MESSAGE) == {"storage": {"min_capacity_gb": 1000.0}, "memory": {"min_capacity_gb": 16.0}}
+    assert confidence(TEST_MESSAGE) < LOCAL_EXTRACTION_CONFIDENCE
+    assert confidence("I'm building a PC for video editing and it has to be quiet. 32GB of RAM, 2TB SSD.") < LOCAL_EXTRACTION_CONFIDENCE
+
+def test_short_pleasantries_dont_lower_the_confidence():
+    assert confidence("Hi! I need 32GB of RAM and a 2TB SSD. Thanks!") == 1.0
+
+@pytest.mark.parametrize("message, budget", [
+    ("a PC with 16 GB of RAM and 1 TB storage for $800", 800),
+    ("a PC with 1 TB storage and 16 GB of RAM for $800", 800),
+    ("a gaming PC for $900 with 32GB of RAM", 900),
+    ("$1,200 in total, with a CPU under $300", 1200),
+    ("build me a rig with a Ryzen CPU for around $700", 700),
+    ("keep the whole build under 1500 dollars", 1500),
+    ("I need a CPU under $150", None),
+    ("I need a CPU for $150", None),
+    ("32GB of RAM for $100 and a 2TB SSD", None),
+    ("at least $500 for the build", None),
+    ("storage at $0.05 per GB, for a PC", None),
+    ("16 GB of RAM and 1 TB of storage", None),
+])
+def test_read_budget(message, budget):
+    assert read_budget(message) == budget
+
+def test_a_budget_is_no_parts_price():
+    # the closing price is the whole build's, not the memory's named just before it
+    assert "max_price" not in found("a PC with 1 TB storage and 16 GB of RAM for $800")["memory"]
+
+def test_phrases_and_models_are_kept_for_the_served_catalogs_only(monkeypatch):
+    served = catalogs.current()
+    monkeypatch.setattr(catalogs, "catalog", served)
+    monkeypatch.setattr(phrases_of, "built", {served.version: phrases_of(served)})
+    monkeypatch.setattr(requirement_models, "built", {served.version: requirement_models(served)})
+    for new in (scaled_catalog(2), scaled_catalog(3)):
+        # as reload does: built before the swap, with the catalog being replaced still kept for its requests
+        phrases_of.load(new)
+        requirement_models.load(new)
+        assert set(phrases_of.built) == set(requirement_models.built) == {catalogs.catalog.version, new.version}
+        monkeypatch.setattr(catalogs, "catalog", new)
+    assert phrases_of() is phrases_of.built[new.version]
+    # a request pinned to a catalog two reloads old still reads it, without it being kept again
+    assert phrases_of(served).find("an alder lake cpu")
+    assert served.version not in phrases_of.built
+    # same enum values, so the models aren't rebuilt
+    assert requirement_models() is requirement_models(served)
@@ -0,0 +1,135 @@
+'''
+scrape_all with HTTPFetcher against a local server of product pages.
+'''
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+# the scraper runs as a script from its own directory, importing its parser as a top-level module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scraper"))
+import scrape
+
+PRODUCT = "cpu"
+
+class PageServer:
+    '''
+    Serves /<product>/page<i>.txt. Each page's products come from versions, and failures[page] is how many
+    of its next requests get a 503 (-1 for all of them). The rest of each page changes on every request.
+    '''
+    def __init__(self, pages):
+        self.versions = {page: 1 for page in range(1, pages + 1)}
+        self.failures = {}
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page = int(self.path.rsplit("page", 1)[1].removesuffix(".txt"))
+                with server.lock:
+                    server.requests[page] += 1
+                    failing = server.failures.get(page, 0)
+                    if failing > 0:
+                        server.failures[page] = failing - 1
+                if failing or page not in server.versions:
+                    self.send_response(503 if failing else 404)
+                    self.end_headers()
+                    return
+                body = (
+                    f"<html><p>rendered at {time.time()}</p><table>"
+                    f'<tr class="tr__product"><td class="td__name">CPU {page} v{server.versions[page]}</td></tr>'
+                    "</table></html>"
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/{{product}}/page{{page}}.txt"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # pages and the manifest go to ./pages/<product>
+    monkeypatch.chdir(tmp_path)
+    server = PageServer(pages=4)
+    yield server
+    server.stop()
+
+def run(server, **kwargs):
+    return scrape.scrape_all(PRODUCT, 4, fetcher=scrape.HTTPFetcher(server.url), backoff=0, **kwargs)
+
+def page_text(page):
+    with open(f"pages/{PRODUCT}/page{page}.txt") as f:
+        return f.read()
+
+def manifest():
+    with open(f"pages/{PRODUCT}/{scrape.MANIFEST}") as f:
+        return json.load(f)
+
+def test_retries_server_errors(server):
+    server.failures = {2: 2}
+    counts = run(server, retries=3)
+    assert counts == {"changed": 4, "unchanged": 0, "resumed": 0, "failed": 0}
+    assert server.requests[2] == 3
+    assert "CPU 2 v1" in page_text(2)
+    assert manifest()["run"]["finished"] is not None
+
+def test_gives_up_after_the_last_retry(server):
+    server.failures = {3: -1}
+    counts = run(server, retries=2)
+    assert counts["failed"] == 1 and counts["changed"] == 3
+    assert server.requests[3] == 3
+    assert not os.path.exists(f"pages/{PRODUCT}/page3.txt")
+
+def test_resumes_an_interrupted_run(server):
+    server.failures = {3: -1}
+    run(server, retries=1)
+    assert manifest()["run"]["finished"] is None
+
+    # the next run only fetches what the interrupted one didn't
+    server.failures = {}
+    server.requests.clear()
+    counts = run(server, retries=1)
+    assert counts == {"changed": 1, "unchanged": 0, "resumed": 3, "failed": 0}
+    assert dict(server.requests) == {3: 1}
+    assert manifest()["run"]["finished"] is not None
+
+def test_restarting_fetches_everything_again(server):
+    server.failures = {3: -1}
+    run(server, retries=0)
+    server.failures = {}
+    server.requests.clear()
+    run(server, retries=0, resume=False)
+    assert set(server.requests) == {1, 2, 3, 4}
+
+def test_pages_whose_products_are_unchanged_are_skipped(server):
+    run(server)
+    written = {page: os.stat(f"pages/{PRODUCT}/page{page}.txt").st_ino for page in range(1, 5)}
+    hashes = {page: entry["sha256"] for page, entry in manifest()["pages"].items()}
+
+    # every page comes back with a new render time, but only page 2's products change
+    server.versions[2] = 2
+    counts = run(server)
+    assert counts == {"changed": 1, "unchanged": 3, "resumed": 0, "failed": 0}
+
+    # unchanged pages are left as they are on disk, the changed one is replaced
+    rewritten = {page for page in range(1, 5) if os.stat(f"pages/{PRODUCT}/page{page}.txt").st_ino != written[page]}
+    assert rewritten == {2}
+    assert "CPU 2 v2" in page_text(2)
+    entries = manifest()["pages"]
+    assert {page for page, entry in entries.items() if entry["sha256"] != hashes[page]} == {"2"}
+    assert entries["1"]["changed"] < entries["1"]["fetched"]
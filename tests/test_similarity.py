@@ -0,0 +1,51 @@
+import numpy as np
+from api.similarity import SimilarityCache, ngram_counts
+
+def test_similarity_hits_near_duplicates():
+    similar = SimilarityCache(maxsize=8, threshold=0.8)
+    similar.set("cheap pc for video editing with a 1tb ssd", "editing")
+    similar.set("quiet office pc with 16gb of ram", "office")
+
+    value, score, message = similar.get("cheap pc for video editing with 1tb ssd!")
+    assert (value, message) == ("editing", "cheap pc for video editing with a 1tb ssd")
+    assert score >= 0.8
+    assert similar.get("a gaming rig with lots of rgb") is None
+
+def test_similarity_refuses_hits_whose_numbers_differ():
+    similar = SimilarityCache(maxsize=8, threshold=0.5)
+    similar.set("cheap pc for video editing with a 1tb ssd", "1tb")
+    similar.set("quiet office pc with 16gb of ram", "16gb")
+
+    # close enough by n-grams alone, but asking for other amounts
+    _, vector = similar.embed("cheap pc for video editing with a 2tb ssd")
+    assert float(vector @ similar.vectors[:, 0]) >= 0.5
+    assert similar.get("cheap pc for video editing with a 2tb ssd") is None
+    assert similar.get("quiet office pc with 32gb of ram") is None
+    assert similar.get("quiet office pc with 16 gb of ram")[0] == "16gb"
+
+def test_similarity_keeps_namespaces_apart():
+    similar = SimilarityCache(maxsize=8, threshold=0.8)
+    similar.set("cheap pc with a 1tb ssd", "a", namespace="model a")
+    assert similar.get("cheap pc with a 1tb ssd", namespace="model b") is None
+    assert similar.get("cheap pc with a 1tb ssd", namespace="model a")[0] == "a"
+
+def test_similarity_evicts_the_least_recently_used():
+    similar = SimilarityCache(maxsize=2, threshold=0.9)
+    similar.set("first message about a pc with 1 ssd", 1)
+    similar.set("second message about a rig with 2 drives", 2)
+    assert similar.get("first message about a pc with 1 ssd")[0] == 1
+    similar.set("third message about storage and 3 fans", 3)
+    assert similar.get("second message about a rig with 2 drives") is None
+    assert similar.get("first message about a pc with 1 ssd")[0] == 1
+    assert similar.stats()["evictions"] == 1
+    assert np.isfinite(similar.vectors).all()
+
+def test_similarity_document_counts_cover_the_stored_messages_only():
+    similar = SimilarityCache(maxsize=2)
+    messages = ["cheap pc with a 1tb ssd", "quiet office pc with 16gb of ram", "a gaming rig with lots of rgb", "a small pc for the living room"]
+    for message in messages:
+        similar.set(message, message)
+    stored = [message for message, _, _ in similar.entries]
+    assert sorted(stored) == sorted(messages[2:])
+    assert similar.documents == 2
+    assert np.array_equal(similar.document_counts, sum(ngram_counts(message, similar.dimensions) > 0 for message in stored))